@@ -1,19 +1,37 @@
-import os, sys, subprocess, threading, json, time
-from flask import Flask, render_template, jsonify, request
-import subprocess
-import threading
-import signal
-import os
-import sys
+import os, sys, threading, time, atexit, hmac, signal
+from flask import Flask, render_template, jsonify, request, session
+from main import Config
+from session_manager import SessionManager
 
 app = Flask(__name__)
-process = None  # global process reference
+app.secret_key = os.environ.get("OPENVOICEAGENT_SECRET_KEY") or os.urandom(16)
+
+# Conversations run in this process on models loaded once; each browser drives its own conversation,
+# identified by the session id kept in its cookie.
+manager = SessionManager(max_sessions=int(os.environ.get("OPENVOICEAGENT_MAX_SESSIONS", 4)))
+# stop the conversations and the TTS worker processes when the server exits
+atexit.register(manager.shutdown)
+if threading.current_thread() is threading.main_thread():
+    # SIGTERM would end the process without running atexit
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+# token that unlocks the latency report of every conversation at /stats?all=1, unset disables it
+ADMIN_TOKEN = os.environ.get("OPENVOICEAGENT_ADMIN_TOKEN")
 
 PROMPTS_ROOT = "prompts"
 GENDER_TO_DIR = {"female": "female_char", "male": "male_char"}
 FEMALE_ROOT = "wavs/reference_woman"
 MALE_ROOT = "wavs/reference_man"
 
+def parse_device_index(value):
+    """A pyaudio device index from request JSON: None when omitted, raises ValueError unless a non-negative integer."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool) or not (isinstance(value, int) or (isinstance(value, str) and value.strip().isdigit())):
+        raise ValueError(f"invalid audio device index {value!r}")
+    if int(value) < 0:
+        raise ValueError(f"invalid audio device index {value!r}")
+    return int(value)
+
 def list_scenarios():
     """Return a list of non-hidden directories in the PROMPTS_ROOT folder."""
     if not os.path.isdir(PROMPTS_ROOT):
@@ -88,11 +106,9 @@ def options():
 
 @app.route('/launch', methods=['POST'])
 def launch():
-    """Launch the model for a selected scenario + gender."""
-    global process
-
-    # If already running, short-circuit
-    if process is not None and process.poll() is None:
+    """Launch a conversation for a selected scenario + gender (+ optional input/output audio devices)."""
+    # If this browser's conversation is already running, short-circuit
+    if manager.status(session.get("sid")) in ("loading", "ready", "running"):
         return jsonify({"status": "already running"})
 
     # Parse choices from client
@@ -100,6 +116,12 @@ def launch():
     selected_scenario = data.get("scenario")  # expects folder name like "scenario_1" or "test_example"
     selected_gender = data.get("gender")      # "female" or "male"
     selected_voice = data.get("voice")
+    try:
+        # pyaudio device indices, default devices if omitted
+        input_device = parse_device_index(data.get("input_device"))
+        output_device = parse_device_index(data.get("output_device"))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
 
     # Fallbacks if nothing provided
     available = list_scenarios()
@@ -141,48 +163,23 @@ def launch():
             "wavs_directory": wavs_directory
         }), 400
 
-    cmd = [
-        'python', 'main.py',
-        '--prompt-file', prompt_file,
-        '--output-file', output_file,
-        '--tts-config', 'tts_config_cosyvoice.json',
-        '--wavs-directory', wavs_directory,
-    ]
-
-    # Start the process (Windows vs POSIX)
-    if sys.platform == "win32":
-        process = subprocess.Popen(
-            cmd,
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=1,
-            creationflags=subprocess.CREATE_NEW_PROCESS_GROUP
-        )
-    else:
-        process = subprocess.Popen(
-            cmd,
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=1,
-            preexec_fn=os.setsid
-        )
-
-    # Background thread to continuously read output and save to file
-    def log_reader():
-        """Save to a file."""
-        with open("outputs/web_log.txt", "w", encoding="utf-8") as logf:
-            for line in process.stdout:
-                logf.write(line)
-                logf.flush()
-
-    threading.Thread(target=log_reader, daemon=True).start()
+    config = Config(
+        prompt_file=prompt_file,
+        output_file=output_file,
+        tts_config_file='tts_config_cosyvoice.json',
+        wavs_directory=wavs_directory,
+        start_message="Start scenario? (press Run to begin)",
+        input_device_index=input_device,
+        output_device_index=output_device,
+    )
+    try:
+        session["sid"] = manager.launch(config)
+    except RuntimeError as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
 
     return jsonify({
         "status": "launched",
+        "session": session["sid"],
         "scenario": selected_scenario,
         "gender": selected_gender,
         "prompt_file": prompt_file,
@@ -192,70 +189,42 @@ def launch():
 
 @app.route('/run', methods=['POST'])
 def run_step():
-    """Send a single newline to the running process' stdin to start the conversation."""
-    global process
-    if process is None or process.poll() is not None:
+    """Start this browser's conversation once its models are loaded."""
+    if not manager.start(session.get("sid")):
         return jsonify({"status": "process not running"})
-
-    # Send ENTER to stdin to trigger the next stage
-    process.stdin.write("\n")
-    process.stdin.flush()
     return jsonify({"status": "enter sent"})
 
 @app.route('/stop', methods=['POST'])
 def stop():
-    """Gracefully stop the running process; escalate if it doesn't exit in time."""
-    global process
-    if process is None or process.poll() is not None:
+    """Gracefully stop this browser's conversation; the shared models stay loaded for the others."""
+    sid = session.get("sid")
+    if manager.status(sid) not in ("loading", "ready", "running"):
         return jsonify({"status": "no process running"})
-
     try:
-        if sys.platform == "win32":
-            # Windows: emulate Ctrl-C using CTRL_BREAK_EVENT to the process group
-            process.send_signal(signal.CTRL_BREAK_EVENT)
-        else:
-            # POSIX: send SIGINT to the whole group (like Ctrl-C)
-            os.killpg(process.pid, signal.SIGINT)
-
-        # Optionally close stdin so the app can see EOF if it listens for it
-        try:
-            process.stdin.close()
-        except Exception:
-            pass
-
-        # Give it a moment to exit gracefully; then escalate if needed
-        try:
-            process.wait(timeout=5)
-        except subprocess.TimeoutExpired:
-            # Try a softer terminate, then kill
-            if sys.platform == "win32":
-                process.terminate()
-            else:
-                os.killpg(process.pid, signal.SIGTERM)
-            try:
-                process.wait(timeout=3)
-            except subprocess.TimeoutExpired:
-                if sys.platform == "win32":
-                    process.kill()
-                else:
-                    os.killpg(process.pid, signal.SIGKILL)
-                process.wait()
-
-        status = "stopped"
+        status = "stopped" if manager.stop(sid) else "stopping"
     except Exception as e:
         status = f"error: {e}"
-
-    process = None
     return jsonify({"status": status})
 
 @app.route('/logs', methods=['GET'])
 def get_logs():
-    """Retrieve the current aggregated stdout log from the background process."""
-    try:
-        with open("outputs/web_log.txt", "r", encoding="utf-8") as f:
-            return jsonify({"log": f.read()})
-    except FileNotFoundError:
-        return jsonify({"log": ""})
+    """Retrieve the output of this browser's conversation."""
+    return jsonify({"log": manager.log(session.get("sid"))})
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    """
+    Turn latencies (p50/p95) of this browser's conversation. With ?all=1 and the admin token
+    (X-Admin-Token header) those of every conversation served by this process.
+    """
+    if request.args.get("all"):
+        token = request.headers.get("X-Admin-Token", "")
+        if not ADMIN_TOKEN or not hmac.compare_digest(token, ADMIN_TOKEN):
+            return jsonify({"error": "forbidden"}), 403
+        return jsonify(manager.latency_report())
+    sid = session.get("sid")
+    return jsonify(manager.latency_report(session_ids=[sid] if sid else []))
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    # the reloader would start a second process loading its own copy of the models
+    app.run(debug=True, use_reloader=False, threaded=True)
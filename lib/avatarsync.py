@@ -0,0 +1,171 @@
+import heapq
+import json
+import socket
+import threading
+import time
+from typing import Callable, Optional
+import numpy as np
+
+
+def rms_envelope(samples: np.ndarray, hop: int) -> np.ndarray:
+    """RMS level (0..1) of every hop samples of int16 audio; a shorter last block gets a value of its own."""
+    n = len(samples)
+    full = n // hop
+    out = np.empty(full + (1 if n % hop else 0), dtype=np.float32)
+    if full:
+        blocks = samples[:full * hop].reshape(full, hop).astype(np.float32)
+        np.sqrt(np.einsum("ij,ij->i", blocks, blocks) / hop, out=out[:full])
+    if n % hop:
+        tail = samples[full * hop:].astype(np.float32)
+        out[full] = np.sqrt(np.dot(tail, tail) / len(tail))
+    out /= 32768.0
+    return out
+
+
+class AvatarSyncEmitter:
+    """
+    Sends word and mouth-opening events to an avatar on this machine, each at the moment its audio is heard.
+    Events are placed on the turn's audio timeline (seconds of real audio since the first chunk). A sender
+    thread sleeps until the playhead reaches the earliest one and sends it as a JSON datagram over UDP, so the
+    avatar only has to read its socket:
+        {"type": "word", "time": 1.42, "word": "valve", "duration": 0.3}
+        {"type": "envelope", "time": 1.40, "hop_ms": 10, "rms": [0.02, 0.11, ...]}
+        {"type": "stop"}  (playback was cut off, close the mouth)
+
+    Internal States:
+    - address: (host, port) the datagrams go to
+    - rate: sample rate of the audio passed to add_envelope
+    - hop / hop_ms: samples and milliseconds per envelope value
+    - block: envelope values per datagram
+    - playhead: callable returning the timeline position being heard, None while nothing is playing
+    - sent: datagrams sent
+    - max_late: latest a datagram was sent after its time, in seconds
+    - _events: heap of (time, sequence number, datagram)
+    - _seq: tie breaker keeping events of the same time in order
+    - _cond: condition around _events, notified when an earlier event arrives or the schedule changes
+    - _running: False once close() was called
+    - _socket: the UDP socket
+    - _thread: the sender thread
+    """
+    def __init__(self, port: int = 5005, host: str = "127.0.0.1", rate: int = 24000, hop_ms: float = 10,
+                 block_ms: float = 50):
+        self.address = (host, port)
+        self.rate = rate
+        self.hop = max(1, int(rate * hop_ms / 1000))
+        self.hop_ms = round(1000 * self.hop / rate, 3)
+        self.block = max(1, int(round(block_ms / hop_ms)))
+        self.playhead: Optional[Callable[[], Optional[float]]] = None
+        self.sent = 0
+        self.max_late = 0.0
+        self._events = []
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._running = False
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._thread = None
+
+    def start(self, playhead: Callable[[], Optional[float]]):
+        """Start the sender thread; playhead() returns the timeline position being heard, or None."""
+        self.playhead = playhead
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def schedule(self, at: float, event: dict):
+        """Send event once the playhead reaches at (timeline seconds)."""
+        event["time"] = round(at, 4)
+        data = json.dumps(event, separators=(",", ":")).encode("utf-8")
+        with self._cond:
+            seq = self._seq
+            self._seq += 1
+            heapq.heappush(self._events, (at, seq, data))
+            if self._events[0][1] == seq:  # new earliest event: the sender must wake up sooner
+                self._cond.notify()
+
+    def add_word(self, timing):
+        """Schedule a word (a TimingInfo on the timeline)."""
+        self.schedule(timing.start_time, {"type": "word", "word": timing.word,
+                                          "duration": round(timing.end_time - timing.start_time, 4)})
+
+    def add_envelope(self, at: float, samples: np.ndarray):
+        """Schedule the level envelope of int16 samples starting at at, one datagram per block of values."""
+        envelope = np.round(rms_envelope(samples, self.hop), 3)
+        step = self.block * self.hop / self.rate
+        for i in range(0, len(envelope), self.block):
+            self.schedule(at + (i // self.block) * step,
+                          {"type": "envelope", "hop_ms": self.hop_ms, "rms": envelope[i:i + self.block].tolist()})
+
+    def clear(self, notify: bool = True):
+        """Drop every scheduled event; with notify the avatar is told at once that speech stopped."""
+        with self._cond:
+            self._events = []
+            self._cond.notify()
+        if notify:
+            self._send(b'{"type":"stop"}')
+
+    def close(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        self._socket.close()
+
+    def _send(self, data: bytes):
+        try:
+            self._socket.sendto(data, self.address)
+            self.sent += 1
+        except OSError:
+            pass  # nobody listening: the avatar is optional
+
+    def _run(self):
+        with self._cond:
+            while self._running:
+                if not self._events:
+                    self._cond.wait()
+                    continue
+                now = self.playhead() if self.playhead is not None else None
+                if now is None:
+                    # no audio is playing yet; the playhead starts with the first chunk of the turn
+                    self._cond.wait(0.02)
+                    continue
+                at, _, data = self._events[0]
+                if at > now:
+                    self._cond.wait(at - now)
+                    continue
+                heapq.heappop(self._events)
+                self.max_late = max(self.max_late, now - at)
+                self._send(data)
+
+
+if __name__ == "__main__":
+    # Listener stand-in for the avatar: how far from the audio's time do the events arrive?
+    # The playhead here is a wall clock that starts when the first chunk "plays", as the output's would.
+    rate = 24000
+    listener = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.settimeout(1.0)
+
+    started = time.perf_counter()
+    emitter = AvatarSyncEmitter(port=listener.getsockname()[1], rate=rate)
+    emitter.start(lambda: time.perf_counter() - started)
+
+    t = np.arange(rate * 2, dtype=np.float32) / rate
+    speech = (0.3 * np.sin(2 * np.pi * 160 * t) * np.abs(np.sin(2 * np.pi * 2 * t)) * 32767).astype(np.int16)
+    chunk = rate // 2
+    for i in range(0, len(speech), chunk):
+        emitter.add_envelope(i / rate, speech[i:i + chunk])
+
+    errors, kinds = [], {}
+    while True:
+        try:
+            data = listener.recv(65536)
+        except socket.timeout:
+            break
+        event = json.loads(data)
+        kinds[event["type"]] = kinds.get(event["type"], 0) + 1
+        errors.append(time.perf_counter() - started - event["time"])
+    emitter.close()
+    errors.sort()
+    print(f"{len(errors)} datagrams {kinds}: arrival - audio time median {errors[len(errors) // 2] * 1000:.2f} ms, "
+          f"max {errors[-1] * 1000:.2f} ms")
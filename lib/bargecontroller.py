@@ -1,19 +1,47 @@
 import threading
 import queue
 
+
+class NotifyingEvent(threading.Event):
+    """
+    threading.Event that also calls listeners when it is set, so a thread blocked on some other condition
+    (a queue, the end of playback) can be woken by it instead of polling it.
+
+    Internal States:
+    - _listeners: callables run (in the setting thread) every time set() is called
+    """
+    def __init__(self):
+        super().__init__()
+        self._listeners = []
+
+    def add_listener(self, listener):
+        """Call listener() on every set(); adding the same listener twice has no effect."""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def set(self):
+        super().set()
+        for listener in list(self._listeners):
+            listener()
+
+
 class BargeInController:
     """
     Central place for cooperative cancellation and barge-in signaling.
 
     Internal states:
-    - barge_event: set as soon as mic detects user voice activity
-    - cancel_event: set when we must abort current AI generation + TTS
+    - barge_event: set as soon as mic detects user voice activity (a NotifyingEvent)
+    - cancel_event: set when we must abort current AI generation + TTS (a NotifyingEvent)
     - input_queue: finalized user utterances (strings)
     - ai_speaking: set as soon as ai is speaking (used for cancelling ai speech if user interrupts)
     """
     def __init__(self):
-        self.barge_event = threading.Event()
-        self.cancel_event = threading.Event()
+        self.barge_event = NotifyingEvent()
+        self.cancel_event = NotifyingEvent()
         self.input_queue = queue.Queue(maxsize=16)
         self.ai_speaking = threading.Event()  # set while AI is speaking/playing
 
@@ -0,0 +1,106 @@
+import logging
+import random
+import threading
+from typing import Dict, List, Optional
+import numpy as np
+from lib.voicereferences import list_emotions, load_reference
+
+# Used for every emotion that has no phrases of its own in the config.
+DEFAULT_FILLER_PHRASES = {
+    "default": ["Hm.", "Well...", "Uhm..."],
+}
+
+
+def to_int16(audio_bytes: bytes, sample_format: str) -> np.ndarray:
+    """Engine wire audio -> int16 samples, the format the TTSHandler plays."""
+    if sample_format == "int16":
+        return np.frombuffer(audio_bytes, dtype=np.int16)
+    audio = np.frombuffer(audio_bytes, dtype=np.float32)
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+
+
+def crossfade(outgoing: np.ndarray, incoming: np.ndarray) -> np.ndarray:
+    """
+    Overlap the end of a filler with the start of the real audio (both int16).
+    outgoing fades out while incoming fades in over len(outgoing) samples; the rest of incoming follows unchanged.
+    """
+    n = min(len(outgoing), len(incoming))
+    if n == 0:
+        return incoming
+    ramp = np.linspace(0.0, 1.0, n, dtype=np.float32)
+    mixed = outgoing[:n].astype(np.float32) * (1.0 - ramp) + incoming[:n].astype(np.float32) * ramp
+    head = np.clip(mixed, -32768, 32767).astype(np.int16)
+    return np.concatenate((head, incoming[n:]))
+
+
+class FillerBank:
+    """
+    Short filler and backchannel clips ("Hm.", "Well...") rendered with the voice's own emotion references,
+    held in memory so the TTSHandler can play one instantly when the first real audio of a turn is late.
+
+    Internal States:
+    - references_folder: voice directory with <emotion>.wav / <emotion>.txt cloning references
+    - phrases: emotion -> filler phrases, "default" is used for emotions without their own list
+    - clips: emotion -> list of int16 clips, filled while building
+    - ready_event: set once every clip was rendered (or building gave up)
+    - stop_event: set by stop(), building ends before the next clip
+    - lock: lock around clips
+    - _idle_event: the idle_event building waits on, released by stop()
+    """
+    def __init__(self, references_folder: str, phrases: Optional[Dict[str, List[str]]] = None):
+        self.references_folder = references_folder
+        self.phrases = phrases or DEFAULT_FILLER_PHRASES
+        self.clips: Dict[str, List[np.ndarray]] = {}
+        self.ready_event = threading.Event()
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        self._idle_event = None
+
+    def phrases_for(self, emotion: str) -> List[str]:
+        return self.phrases.get(emotion) or self.phrases.get("default", [])
+
+    def build(self, engine, idle_event: Optional[threading.Event] = None):
+        """
+        Render every filler phrase for every emotion of the voice with the engine.
+        If idle_event is given, each clip waits for it, so building never competes with a running turn.
+        """
+        self._idle_event = idle_event
+        try:
+            for emotion in list_emotions(self.references_folder):
+                path, prompt_text = load_reference(self.references_folder, emotion)
+                for phrase in self.phrases_for(emotion):
+                    if idle_event is not None:
+                        idle_event.wait()
+                    if self.stop_event.is_set():
+                        return
+                    audio = engine.render_clip(phrase, path, prompt_text)
+                    if not audio:
+                        continue  # cancelled by a barge-in, the bank just has one clip less
+                    clip = to_int16(audio, engine.sample_format)
+                    with self.lock:
+                        self.clips.setdefault(emotion, []).append(clip)
+            logging.debug(f"filler bank ready: {sum(len(c) for c in self.clips.values())} clips for {self.references_folder}")
+        except Exception as e:
+            logging.warning(f"filler bank could not be built: {e}")
+        finally:
+            self.ready_event.set()
+
+    def build_async(self, engine, idle_event: Optional[threading.Event] = None) -> threading.Thread:
+        """Build the bank on a background thread."""
+        thread = threading.Thread(target=self.build, args=(engine, idle_event), name="FillerBankBuilder", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        """Stop building (the clip being rendered still finishes, or ends when the engine is stopped)."""
+        self.stop_event.set()
+        if self._idle_event is not None:
+            self._idle_event.set()  # wake a build waiting for the end of a turn; the conversation is over anyway
+
+    def pick(self, emotion: Optional[str]) -> Optional[np.ndarray]:
+        """A random clip for emotion (falling back to neutral), None if nothing is rendered yet."""
+        with self.lock:
+            clips = self.clips.get(emotion or "neutral") or self.clips.get("neutral")
+            if not clips:
+                return None
+            return random.choice(clips)
@@ -0,0 +1,83 @@
+"""
+Import-time profile of the OpenVoiceAgent subsystems.
+
+Every subsystem is imported in a fresh interpreter with `-X importtime`, so the numbers do not depend on
+what an earlier subsystem already imported. For each one the total import time and the heaviest packages
+it pulls in are reported: the self time of every imported module, at any nesting depth, is added up under its
+top-level package (torch.nn.modules counts as torch), so the package times add up to the total.
+
+Run from the repository root:
+    python -m lib.importprofile [--top 8]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# subsystem -> code that imports it the way the program does
+SUBSYSTEMS: Dict[str, str] = {
+    "main (parent process)": "import main",
+    "stt": "from RealtimeSTT import AudioToTextRecorder",
+    "llm": "from llm_lmstudio.llm_handler import LLMHandler",
+    "tts handler (parent)": "import tts_handler_cosyvoice",
+    "tts worker": (
+        "from realtimetts_clone.engines.cosyvoice_engine import CosyvoiceEngine\n"
+        "CosyvoiceEngine._prepare_worker_imports()\n"
+        "from cosyvoice.cli.cosyvoice import CosyVoice2"
+    ),
+}
+
+
+def parse_importtime(stderr: str) -> List[Tuple[int, int, str]]:
+    """Rows of `-X importtime` output as (self us, cumulative us, package name keeping its nesting indent)."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            rows.append((int(self_us), int(cumulative_us), name[1:].rstrip()))
+        except ValueError:
+            continue
+    return rows
+
+
+def profile(code: str) -> Tuple[float, List[Tuple[float, str]], str]:
+    """Import code in a fresh interpreter; return (total seconds, [(seconds, top-level package)], error)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=REPO_ROOT, capture_output=True, text=True,
+    )
+    rows = parse_importtime(result.stderr)
+    # nested imports are indented by two spaces per level, their time is part of their parent's cumulative time
+    total = sum(cumulative for _, cumulative, name in rows if not name.startswith("  ")) / 1e6
+    packages: Dict[str, float] = {}
+    for self_us, _, name in rows:
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0.0) + self_us / 1e6
+    error = ""
+    if result.returncode != 0:
+        error = (result.stderr.strip().splitlines() or ["failed"])[-1]
+    return total, sorted(((seconds, name) for name, seconds in packages.items()), reverse=True), error
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time profile per subsystem")
+    parser.add_argument("--top", type=int, default=8, help="number of heaviest packages shown per subsystem")
+    args = parser.parse_args()
+
+    for subsystem, code in SUBSYSTEMS.items():
+        total, packages, error = profile(code)
+        print(f"{subsystem}: {total:.2f}s")
+        for seconds, name in packages[:args.top]:
+            print(f"    {seconds:7.3f}s  {name}")
+        if error:
+            print(f"    (import failed: {error})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+
+class AdaptivePrebuffer:
+    """
+    Adaptive jitter buffer for the TTS playback path.
+
+    When the output has run dry (start of a turn, a pause between sentences, an underrun) playback only (re)starts
+    once enough audio is queued that synthesis can keep ahead of it for the rest of the sentence being rendered.
+    With B seconds queued, R seconds still to be synthesized and a streaming real-time factor rtf
+    (synthesis seconds per audio second), playback catches up with synthesis unless B >= R * (rtf - 1).
+    To cover jitter the rtf used is the measured mean plus `safety` standard deviations of the per-chunk rtf,
+    so a steady, fast engine starts on its first chunk while one near rtf 1 buffers just enough.
+    R comes from the sentence length and the measured audio seconds per character, rtf from the previous
+    sentences and the chunks of the current one.
+
+    Internal States:
+    - rtf: smoothed streaming real-time factor of the finished sentences
+    - chunk_rtf_var: smoothed variance of the real-time factor of single chunks
+    - safety: standard deviations of chunk rtf added to rtf when planning
+    - seconds_per_char: smoothed audio seconds per character of text
+    - margin: seconds queued on top of the estimate before playback starts
+    - max_prebuffer: upper bound of the seconds playback waits for
+    - smoothing: weight of the newest sentence in the smoothed values
+    - clock: time source (perf_counter, replaceable for simulations)
+    - sentences: (characters, audio seconds, rtf) of every sentence rendered this turn
+    - holds / held_seconds: how often and how long playback start was delayed this turn
+    - _chars: characters of the sentence being rendered, None when no sentence is in progress
+    - _started_at: when the current sentence was handed to the engine
+    - _audio_seconds: audio received for the current sentence so far
+    - _first_chunk: (arrival time, audio seconds) of the first chunk of the current sentence
+    - _last_chunk_at: arrival time of the latest chunk
+    - _holding_since: start of the current hold, None when not holding
+    - lock: lock around the state, the producer and the play thread both use it
+    """
+    def __init__(self, rtf: float = 0.5, seconds_per_char: float = 0.065, margin: float = 0.1, max_prebuffer: float = 3.0,
+                 smoothing: float = 0.3, safety: float = 2.0, clock: Callable[[], float] = time.perf_counter):
+        self.rtf = rtf
+        self.chunk_rtf_var = 0.0
+        self.safety = safety
+        self.seconds_per_char = seconds_per_char
+        self.margin = margin
+        self.max_prebuffer = max_prebuffer
+        self.smoothing = smoothing
+        self.clock = clock
+        self.sentences: List[Tuple[int, float, float]] = []
+        self.holds = 0
+        self.held_seconds = 0.0
+        self._chars: Optional[int] = None
+        self._started_at = 0.0
+        self._audio_seconds = 0.0
+        self._first_chunk: Optional[Tuple[float, float]] = None
+        self._last_chunk_at = 0.0
+        self._holding_since: Optional[float] = None
+        self.lock = threading.Lock()
+
+    def reset_turn(self):
+        """Forget the per-turn counters; the learned rtf and seconds_per_char are kept."""
+        with self.lock:
+            self.sentences = []
+            self.holds = 0
+            self.held_seconds = 0.0
+            self._chars = None
+            self._holding_since = None
+
+    def begin_sentence(self, chars: int):
+        """Producer: a sentence of chars characters was handed to the engine."""
+        with self.lock:
+            self._chars = max(1, chars)
+            self._started_at = self.clock()
+            self._audio_seconds = 0.0
+            self._first_chunk = None
+
+    def on_audio(self, seconds: float):
+        """Producer: seconds of audio of the current sentence arrived."""
+        with self.lock:
+            if self._chars is None:
+                return
+            now = self.clock()
+            if self._first_chunk is None:
+                self._first_chunk = (now, seconds)
+            elif seconds > 0:
+                deviation = (now - self._last_chunk_at) / seconds - self.rtf
+                self.chunk_rtf_var = (1 - self.smoothing) * self.chunk_rtf_var + self.smoothing * deviation * deviation
+            self._last_chunk_at = now
+            self._audio_seconds += seconds
+
+    def _streaming_rtf_locked(self) -> Optional[float]:
+        """rtf of the current sentence measured from its chunk arrivals, None before the second chunk."""
+        if self._first_chunk is None:
+            return None
+        first_at, first_seconds = self._first_chunk
+        streamed = self._audio_seconds - first_seconds
+        if streamed <= 0:
+            return None
+        return (self._last_chunk_at - first_at) / streamed
+
+    def end_sentence(self):
+        """Producer: every chunk of the current sentence arrived; learn from it."""
+        with self.lock:
+            if self._chars is None:
+                return
+            audio_seconds = self._audio_seconds
+            if audio_seconds > 0:
+                rtf = self._streaming_rtf_locked()
+                if rtf is None:  # single chunk: the whole synthesis time is all we know
+                    rtf = (self._last_chunk_at - self._started_at) / audio_seconds
+                a = self.smoothing
+                self.rtf = (1 - a) * self.rtf + a * rtf
+                self.seconds_per_char = (1 - a) * self.seconds_per_char + a * audio_seconds / self._chars
+                self.sentences.append((self._chars, audio_seconds, rtf))
+            self._chars = None
+
+    def required_seconds(self) -> float:
+        """Seconds of audio that should be queued before playback starts."""
+        with self.lock:
+            return self._required_locked()
+
+    def _required_locked(self) -> float:
+        if self._chars is None:
+            return 0.0  # nothing more is coming, play what there is
+        expected = max(self._audio_seconds, self._chars * self.seconds_per_char)
+        remaining = expected - self._audio_seconds
+        rtf = self.rtf
+        live = self._streaming_rtf_locked()
+        if live is not None:
+            rtf = max(rtf, live)
+        rtf += self.safety * self.chunk_rtf_var ** 0.5
+        return min(self.max_prebuffer, self.margin + max(0.0, remaining * (rtf - 1.0)))
+
+    def should_hold(self, queued_seconds: float) -> bool:
+        """
+        Play thread, called while the output is dry: True while playback should keep waiting for more audio.
+        Hold time is accumulated for the turn report.
+        """
+        with self.lock:
+            now = self.clock()
+            hold = queued_seconds < self._required_locked()
+            if hold and self._holding_since is None:
+                self._holding_since = now
+                self.holds += 1
+            elif not hold and self._holding_since is not None:
+                self.held_seconds += now - self._holding_since
+                self._holding_since = None
+            return hold
+
+    def report(self) -> str:
+        with self.lock:
+            rtfs = [rtf for _, _, rtf in self.sentences]
+            line = f"prebuffer: held {self.holds}x for {self.held_seconds * 1000:.0f} ms"
+            if rtfs:
+                line += f", sentence rtf mean {sum(rtfs) / len(rtfs):.2f} max {max(rtfs):.2f} ({len(rtfs)} sentences)"
+            return line
+
+
+if __name__ == "__main__":
+    # Simulated turns: chunks of 0.5 s arrive at a jittery real-time factor. Playback either starts on the
+    # first chunk (old behaviour) or when the prebuffer allows it, and continues as soon as audio is back
+    # after an underrun. Reports underruns, stalled time and the added start delay.
+    import random
+
+    class _Clock:
+        now = 0.0
+
+        def __call__(self):
+            return self.now
+
+    def simulate(rtf_mean, adaptive, seed=3, sentences=30, chunk=0.5, ttfa=0.3):
+        rng = random.Random(seed)
+        clock = _Clock()
+        prebuffer = AdaptivePrebuffer(clock=clock)
+        underruns, stalled, start_delay = 0, 0.0, 0.0
+        t = 0.0
+        for _ in range(sentences):
+            chars = rng.randint(20, 140)
+            duration = chars * 0.065 * rng.uniform(0.8, 1.2)
+            rtf = rtf_mean * rng.uniform(0.85, 1.15)
+            arrivals, produced, arrival = [], 0.0, t + ttfa
+            while produced < duration:
+                seconds = min(chunk, duration - produced)
+                arrival += seconds * rtf * rng.uniform(0.8, 1.2)
+                arrivals.append((arrival, seconds))
+                produced += seconds
+
+            clock.now = t
+            prebuffer.begin_sentence(chars)
+            start = None
+            queued = 0.0
+            for i, (arrival, seconds) in enumerate(arrivals):
+                clock.now = arrival
+                prebuffer.on_audio(seconds)
+                queued += seconds
+                if i == len(arrivals) - 1:
+                    prebuffer.end_sentence()
+                if start is None and (not adaptive or not prebuffer.should_hold(queued)):
+                    start = arrival
+            start_delay += start - arrivals[0][0]
+
+            play = start
+            for arrival, seconds in arrivals:
+                if arrival > play:
+                    underruns += 1
+                    stalled += arrival - play
+                    play = arrival
+                play += seconds
+            t = play  # next sentence is requested once this one played out
+        return underruns, stalled, start_delay / sentences
+
+    for rtf_mean in (0.6, 0.9, 1.1, 1.3):
+        for adaptive in (False, True):
+            underruns, stalled, delay = simulate(rtf_mean, adaptive)
+            name = "adaptive prebuffer" if adaptive else "start on first chunk"
+            print(f"rtf {rtf_mean:.1f} {name:>21}: {underruns:3d} underruns, {stalled * 1000:7.0f} ms stalled, "
+                  f"start delay {delay * 1000:5.0f} ms per sentence")
@@ -0,0 +1,75 @@
+import bisect
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Stages text passes on its way from the llm to the synthesis engine, in order.
+STAGES = ("text_ready", "segmenter_in", "segmented", "synthesis_start")
+
+
+class LatencyProbe:
+    """
+    Measures how long text waits at every hop of the llm -> synthesis path.
+
+    Text is identified by its character position in the turn: each stage records the cumulative number of characters
+    it has passed on, and when. The delay of a hop for some text is the time the later stage passed position p minus
+    the time the earlier stage first reached p.
+
+    Internal States:
+    - positions: stage -> list of cumulative character positions, increasing
+    - times: stage -> perf_counter time of each position
+    - lock: lock around positions and times
+    """
+    def __init__(self):
+        self.positions: Dict[str, List[int]] = {stage: [] for stage in STAGES}
+        self.times: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+        self.lock = threading.Lock()
+
+    def record(self, stage: str, chars: int):
+        """stage passed on chars more characters."""
+        with self.lock:
+            previous = self.positions[stage][-1] if self.positions[stage] else 0
+            self.positions[stage].append(previous + chars)
+            self.times[stage].append(time.perf_counter())
+
+    def mark(self, stage: str, position: int):
+        """stage has passed on everything up to the absolute character position."""
+        with self.lock:
+            self.positions[stage].append(position)
+            self.times[stage].append(time.perf_counter())
+
+    def position(self, stage: str) -> int:
+        """Characters stage has passed on so far."""
+        with self.lock:
+            return self.positions[stage][-1] if self.positions[stage] else 0
+
+    def _reached_locked(self, stage: str, position: int) -> Optional[float]:
+        index = bisect.bisect_left(self.positions[stage], position)
+        if index == len(self.positions[stage]):
+            return None
+        return self.times[stage][index]
+
+    def _delays_locked(self, earlier: str, later: str) -> List[float]:
+        delays = []
+        for position, t in zip(self.positions[later], self.times[later]):
+            reached = self._reached_locked(earlier, position)
+            if position > 0 and reached is not None:
+                delays.append(max(0.0, t - reached))
+        return delays
+
+    def summary(self) -> Dict[str, Tuple[int, float, float]]:
+        """hop name -> (samples, mean seconds, max seconds), including the end-to-end text_ready -> synthesis_start."""
+        hops = list(zip(STAGES, STAGES[1:])) + [(STAGES[0], STAGES[-1])]
+        result = {}
+        with self.lock:
+            for earlier, later in hops:
+                delays = self._delays_locked(earlier, later)
+                if delays:
+                    result[f"{earlier} -> {later}"] = (len(delays), sum(delays) / len(delays), max(delays))
+        return result
+
+    def report(self) -> str:
+        lines = ["text path latency (mean / max):"]
+        for hop, (count, mean, worst) in self.summary().items():
+            lines.append(f"  {hop:<36} {mean * 1000:8.2f} ms / {worst * 1000:8.2f} ms  ({count} samples)")
+        return "\n".join(lines)
@@ -0,0 +1,36 @@
+import importlib
+import os
+
+# modules that hold their own reference to snapshot_download
+_MODULES_TO_PATCH = [
+    "modelscope",
+    "modelscope.hub",
+    "modelscope.hub.snapshot_download",
+    "modelscope.utils.hub",
+]
+
+
+def offline_snapshot_download(model_id, *args, **kwargs):
+    """Replacement for modelscope's snapshot_download that only looks in MODELSCOPE_HOME."""
+    base = os.environ["MODELSCOPE_HOME"]
+    local_path = os.path.join(base, model_id.replace("/", os.sep))
+    if not os.path.exists(local_path):
+        raise RuntimeError(f"[OFFLINE] Model not found locally: {local_path}")
+    print(f"[OFFLINE] Using local model: {local_path}")
+    return local_path
+
+
+def install_offline_modelscope(modelscope_home: str):
+    """
+    Override modelscope's snapshot_download so the local wetext model in third_party/pengzhendong/wetext
+    is loaded instead of fetching it online.
+    Only the process that runs CosyVoice needs this (modelscope is imported here, not at program start).
+    """
+    os.environ["MODELSCOPE_OFFLINE"] = "1"
+    os.environ["MODELSCOPE_HOME"] = modelscope_home
+    for mod in _MODULES_TO_PATCH:
+        try:
+            module = importlib.import_module(mod)
+            setattr(module, "snapshot_download", offline_snapshot_download)
+        except (ImportError, AttributeError):
+            pass
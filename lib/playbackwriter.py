@@ -0,0 +1,195 @@
+import queue
+import time
+from typing import Callable, Optional
+
+# put into the chunk queue by wake() so a blocked writer re-checks should_stop() at once
+_WAKE = object()
+
+
+class PlaybackWriter:
+    """
+    Blocking consumer that moves audio chunks from a queue to an output stream.
+    It sleeps in queue.get() until data (or a wake-up) arrives and coalesces chunks that are already queued
+    until at least one period is pending, so small chunks do not cost a write call each. Very large chunks are
+    split into writes of at most max_periods periods, which bounds how late a stop is noticed.
+    A callable put into the queue is a marker: it is called once everything queued before it was written.
+    An optional hold() callback can keep the writer collecting audio instead of writing it (jitter buffering).
+
+    Internal States:
+    - chunk_queue: queue of audio byte chunks
+    - write: blocking write function of the output stream
+    - period_bytes: target minimum size of one write
+    - max_write_bytes: upper bound of one write
+    - frame_bytes: size of one frame, writes are kept frame aligned
+    - should_stop: returns True once playback must end
+    - on_idle: optional callable returning bytes to play while no chunk is queued (e.g. a filler), or None
+    - transform: optional callable applied to every chunk taken from the queue
+    - hold: optional callable(pending bytes) -> bool, audio is only collected while it returns True
+    - idle_timeout: how long a get() blocks before should_stop() / on_idle() are consulted again
+    - writes / bytes_written: write calls and audio bytes written so far
+    - _pending: audio taken from the queue but not written yet
+    - _markers: [byte offset in _pending, callable] of markers waiting for the audio before them
+    """
+    def __init__(self, chunk_queue: queue.Queue, write: Callable[[bytes], None], period_bytes: int, frame_bytes: int = 2,
+                 max_periods: int = 4, should_stop: Callable[[], bool] = lambda: False,
+                 on_idle: Optional[Callable[[], Optional[bytes]]] = None,
+                 transform: Optional[Callable[[bytes], bytes]] = None, idle_timeout: float = 0.05,
+                 hold: Optional[Callable[[int], bool]] = None):
+        self.chunk_queue = chunk_queue
+        self.write = write
+        self.frame_bytes = frame_bytes
+        self.period_bytes = max(frame_bytes, period_bytes - period_bytes % frame_bytes)
+        self.max_write_bytes = self.period_bytes * max(1, max_periods)
+        self.should_stop = should_stop
+        self.on_idle = on_idle
+        self.transform = transform
+        self.hold = hold
+        self.idle_timeout = idle_timeout
+        self.writes = 0
+        self.bytes_written = 0
+        self._pending = bytearray()
+        self._markers = []
+
+    def wake(self):
+        """Wake a writer blocked on an empty queue."""
+        self.chunk_queue.put(_WAKE)
+
+    def idle(self) -> bool:
+        """Whether everything handed to the writer was written."""
+        return len(self._pending) < self.frame_bytes and self.chunk_queue.empty()
+
+    def pending_bytes(self) -> int:
+        """Audio taken from the queue but not written yet."""
+        return len(self._pending)
+
+    def stream_position(self) -> int:
+        """Byte offset in the written stream at which the next chunk taken from the queue will start."""
+        return self.bytes_written + len(self._pending)
+
+    def _take(self, pending: bytearray, chunk) -> None:
+        if chunk is _WAKE:
+            return
+        if callable(chunk):
+            if len(pending) == 0 and not self._markers:
+                chunk()
+            else:
+                self._markers.append([len(pending), chunk])
+            return
+        pending += self.transform(chunk) if self.transform is not None else chunk
+
+    def run(self):
+        """Play until should_stop() returns True."""
+        pending = self._pending
+        while not self.should_stop():
+            if len(pending) < self.frame_bytes:
+                try:
+                    chunk = self.chunk_queue.get_nowait()
+                except queue.Empty:
+                    idle_audio = self.on_idle() if self.on_idle is not None else None
+                    if idle_audio:
+                        self._write(idle_audio)
+                        continue
+                    try:
+                        chunk = self.chunk_queue.get(timeout=self.idle_timeout)
+                    except queue.Empty:
+                        continue
+                self._take(pending, chunk)
+
+            # coalesce whatever is already queued, up to one period
+            while len(pending) < self.period_bytes:
+                try:
+                    chunk = self.chunk_queue.get_nowait()
+                except queue.Empty:
+                    break
+                self._take(pending, chunk)
+
+            if self.hold is not None and len(pending) >= self.frame_bytes and self.hold(len(pending)):
+                # keep collecting; hold() is asked again after every chunk (or idle_timeout)
+                try:
+                    self._take(pending, self.chunk_queue.get(timeout=self.idle_timeout))
+                except queue.Empty:
+                    pass
+                continue
+
+            n = min(len(pending), self.max_write_bytes)
+            n -= n % self.frame_bytes
+            if n == 0 or self.should_stop():
+                continue
+            self._write(bytes(pending[:n]))
+            del pending[:n]
+            if self._markers:
+                self._fire_markers(n)
+
+    def _fire_markers(self, written: int):
+        """Call the markers whose audio was just written, shift the others."""
+        waiting = []
+        for offset, marker in self._markers:
+            if offset <= written:
+                marker()
+            else:
+                waiting.append([offset - written, marker])
+        self._markers = waiting
+
+    def _write(self, data: bytes):
+        self.write(data)
+        self.writes += 1
+        self.bytes_written += len(data)
+
+
+if __name__ == "__main__":
+    # Compare the old play loop (1 ms sleep poll, one write per chunk) with PlaybackWriter:
+    # CPU of the playing thread (mostly idle waiting) and write calls per second of audio.
+    import random
+    import threading
+
+    rate, frame_bytes = 24000, 2
+    bytes_per_second = rate * frame_bytes
+
+    def fake_device_write(data):
+        time.sleep(len(data) / bytes_per_second)  # pyaudio's blocking write returns once the device took the data
+
+    def producer(chunk_queue, done):
+        rng = random.Random(1)
+        time.sleep(1.0)  # idle start of the turn
+        for _ in range(120):
+            # engine chunks mixed with many tiny pieces (silence, stream tails, resampled fragments)
+            size = rng.choice((bytes_per_second // 5, bytes_per_second // 50, bytes_per_second // 100, bytes_per_second // 100))
+            chunk_queue.put(b"\0" * (size - size % frame_bytes))
+            time.sleep(rng.uniform(0.0, 0.02))
+        time.sleep(1.0)  # idle end of the turn
+        done.set()
+
+    def old_loop(chunk_queue, done, stats):
+        while not (done.is_set() and chunk_queue.empty()):
+            if chunk_queue.empty():
+                time.sleep(0.001)
+                continue
+            chunk = chunk_queue.get()
+            fake_device_write(chunk)
+            stats["writes"] += 1
+            stats["bytes"] += len(chunk)
+
+    def new_loop(chunk_queue, done, stats):
+        writer = PlaybackWriter(chunk_queue, fake_device_write, period_bytes=bytes_per_second * 50 // 1000,
+                                frame_bytes=frame_bytes, should_stop=lambda: done.is_set() and writer.idle())
+        writer.run()
+        stats["writes"], stats["bytes"] = writer.writes, writer.bytes_written
+
+    for name, loop in (("1 ms poll", old_loop), ("PlaybackWriter", new_loop)):
+        chunk_queue, done = queue.Queue(), threading.Event()
+        stats = {"writes": 0, "bytes": 0}
+
+        def run():
+            start = time.thread_time()
+            loop(chunk_queue, done, stats)
+            stats["cpu"] = time.thread_time() - start
+
+        threading.Thread(target=producer, args=(chunk_queue, done), daemon=True).start()
+        thread = threading.Thread(target=run)
+        wall = time.time()
+        thread.start()
+        thread.join()
+        audio_seconds = stats["bytes"] / bytes_per_second
+        print(f"{name:>15}: cpu {stats['cpu'] * 1000:6.1f} ms over {time.time() - wall:.1f}s, "
+              f"{stats['writes']} writes for {audio_seconds:.2f}s audio "
+              f"({stats['writes'] / audio_seconds:.1f} writes per audio second)")
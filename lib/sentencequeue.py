@@ -1,70 +1,158 @@
+import collections
+import itertools
 import threading
-from typing import Optional
-import uuid
+import time
+from typing import Callable, Iterator, Optional
+
+# Cheap, process-unique sentence ids (only used for logging)
+_sentence_ids = itertools.count(1)
+
 
 class Sentence:
     """
     Singular sentence for the TTS handler.
+
+    Internal States:
+    - emotion: emotion the sentence is spoken with
+    - is_finished: whether the llm finished this sentence
+    - retrieved: whether the sentence was handed to the TTS worker while still being written
+    - popped: whether the sentence was handed to the TTS worker from the queue
+    - id: sequence number of the sentence
+    - ready_at: when the sentence became available to the TTS worker (first text, or finished)
+    - _parts: text fragments in arrival order
+    - _length: total length of _parts
+    - _text / _text_parts: get_text()'s join of the first _text_parts parts, extended with the newer ones
+    - _cond: condition around the state, notified on every append, when finished and by wake()
     """
     def __init__(self, emotion: Optional[str] = None):
-        self.text = ""
+        self._parts = []
+        self._length = 0
+        self._text = ""
+        self._text_parts = 0
         self.emotion = emotion
         self.is_finished = False
         self.retrieved = False
         self.popped = False
-        self.lock = threading.Lock()
-        self.id: str = str(uuid.uuid4())
+        self.ready_at: Optional[float] = None
+        self._cond = threading.Condition()
+        self.id: int = next(_sentence_ids)
 
     def add_text(self, text: str):
-        with self.lock:
-            self.text += text
+        with self._cond:
+            self._parts.append(text)
+            self._length += len(text)
+            if self.ready_at is None:
+                self.ready_at = time.perf_counter()
+            self._cond.notify_all()
 
     def get_text(self):
-        with self.lock:
-            return self.text
+        with self._cond:
+            if self._text_parts < len(self._parts):
+                self._text += "".join(self._parts[self._text_parts:])
+                self._text_parts = len(self._parts)
+            return self._text
+
+    def __len__(self):
+        with self._cond:
+            return self._length
+
+    def wait_for_text(self, known_length: int, timeout: Optional[float] = None) -> bool:
+        """
+        Block until the sentence is longer than known_length or finished.
+        Returns False if the timeout expired first.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: self._length > known_length or self.is_finished, timeout)
+
+    def iter_text(self, should_stop: Optional[Callable[[], bool]] = None,
+                  timeout: Optional[float] = None) -> Iterator[str]:
+        """
+        Yield the sentence's text fragments as they are appended, until it is finished.
+        Wakes on every append and on wake(), which is how a stop reaches it; timeout only bounds how late
+        should_stop() is noticed when whatever makes it true cannot call wake().
+        """
+        index = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._parts) > index or self.is_finished
+                                    or (should_stop is not None and should_stop()), timeout)
+                fragment = "".join(self._parts[index:])  # only the parts not yielded yet
+                index = len(self._parts)
+                finished = self.is_finished
+            if fragment:
+                yield fragment
+            elif finished:
+                return
+            if should_stop is not None and should_stop():
+                return
+
+    def wake(self):
+        """Wake iter_text() so it checks its should_stop()."""
+        with self._cond:
+            self._cond.notify_all()
 
     def mark_finished(self):
-        with self.lock:
+        with self._cond:
             self.is_finished = True
+            if self.ready_at is None:
+                self.ready_at = time.perf_counter()
+            self._cond.notify_all()
 
     def get_finished(self):
-        with self.lock:
+        with self._cond:
             return self.is_finished
 
     def __str__(self):
-        with self.lock:
-            return f"Sentence(text='{self.text}', emotion='{self.emotion}', is_finished={self.is_finished})"
+        return f"Sentence(text='{self.get_text()}', emotion='{self.emotion}', is_finished={self.get_finished()})"
+
 
 class ThreadSafeSentenceQueue:
     """
     Sentence queue for the TTS handler before it gets played.
+    Consumers block in get_sentence() until a sentence is available instead of polling.
 
     Internal States:
-    - queue: queue of Sentence objects to be played.
-    - current_sentence: current sentence to be played
+    - queue: deque of finished Sentence objects to be played.
+    - current_sentence: sentence the llm is still writing
     - lock: lock for the sentence queue
+    - not_empty: condition on lock, notified whenever get_sentence() may have something to return
+    - handoffs / handoff_total / handoff_max: count, sum and maximum of the seconds between a sentence
+      becoming available and a consumer receiving it
+    - latency_probe: optional LatencyProbe, told about every piece of text that becomes ready for speech
     """
-    def __init__(self):
-        self.queue = []
+    def __init__(self, latency_probe=None):
+        self.latency_probe = latency_probe
+        self.queue = collections.deque()
         self.current_sentence = None
         self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+        self.handoffs = 0
+        self.handoff_total = 0.0
+        self.handoff_max = 0.0
+
+    def _finish_current_locked(self):
+        """Mark the current sentence finished and queue it unless the TTS worker already has it (caller holds lock)."""
+        self.current_sentence.mark_finished()
+        if not self.current_sentence.retrieved:
+            self.queue.append(self.current_sentence)
+        self.current_sentence = None
+        self.not_empty.notify_all()
 
     def finish_current_sentence(self):
         """Put the current sentence on the to be played queue."""
         with self.lock:
             if self.current_sentence and not self.current_sentence.is_finished:
-                self.current_sentence.mark_finished()
-                if not self.current_sentence.retrieved:
-                    self.queue.append(self.current_sentence)
-                self.current_sentence = None
+                self._finish_current_locked()
 
     def add_emotion(self, emotion: str):
         """Finish the current sentence by adding it to the queue, create a new sentence with a new emotion."""
         with self.lock:
-            if self.current_sentence and self.current_sentence.get_text():
-                self.current_sentence.mark_finished()
-                if not self.current_sentence.retrieved:
-                    self.queue.append(self.current_sentence)
+            if self.current_sentence:
+                if len(self.current_sentence):
+                    self._finish_current_locked()
+                else:
+                    # never spoken; finish it so a worker that already holds it does not wait forever
+                    self.current_sentence.mark_finished()
             self.current_sentence = Sentence(emotion)
 
     def add_text(self, text: str):
@@ -73,26 +161,68 @@ class ThreadSafeSentenceQueue:
             if not text.strip():
                 if not self.current_sentence:
                     return
-                if not self.current_sentence.get_text():
+                if not len(self.current_sentence):
                     return
 
             if not self.current_sentence:
                 self.current_sentence = Sentence()
-            
+
+            was_empty = not len(self.current_sentence)
             self.current_sentence.add_text(text)
+            if self.latency_probe is not None:
+                self.latency_probe.record("text_ready", len(text))
+            if was_empty:
+                # the sentence just became playable
+                self.not_empty.notify_all()
+
+    def _available_locked(self) -> bool:
+        if self.queue:
+            return True
+        current = self.current_sentence
+        return current is not None and not current.retrieved and len(current) > 0
+
+    def get_sentence(self, timeout: Optional[float] = None,
+                     should_stop: Optional[Callable[[], bool]] = None) -> Optional[Sentence]:
+        """
+        Get the next sentence to be played, waiting up to timeout seconds (forever if None) for one.
+        Returns None if nothing became available, or once should_stop() is true; whoever makes it true has to
+        call wake() for a waiting consumer to notice.
+        """
+        def ready():
+            return self._available_locked() or (should_stop is not None and should_stop())
 
-    def get_sentence(self) -> Optional[Sentence]:
-        """Get the next sentence to be played."""
         with self.lock:
+            if not self.not_empty.wait_for(ready, timeout) or not self._available_locked():
+                return None
             if self.queue:
-                sentence = self.queue.pop(0)
+                sentence = self.queue.popleft()
                 sentence.popped = True
-                return sentence
-            elif self.current_sentence:
-                self.current_sentence.retrieved = True
-                return self.current_sentence
             else:
-                return None
+                sentence = self.current_sentence
+                sentence.retrieved = True
+            if sentence.ready_at is not None:
+                handoff = time.perf_counter() - sentence.ready_at
+                self.handoffs += 1
+                self.handoff_total += handoff
+                self.handoff_max = max(self.handoff_max, handoff)
+            return sentence
+
+    def wake(self):
+        """Wake every consumer blocked in get_sentence(), e.g. so it can notice a stop request."""
+        with self.lock:
+            self.not_empty.notify_all()
+
+    def clear(self):
+        """Drop every queued sentence."""
+        with self.lock:
+            self.queue.clear()
+            self.not_empty.notify_all()
+
+    def handoff_stats(self) -> dict:
+        """Mean and max seconds from a sentence becoming available until a consumer received it."""
+        with self.lock:
+            mean = self.handoff_total / self.handoffs if self.handoffs else 0.0
+            return {"count": self.handoffs, "mean": mean, "max": self.handoff_max}
 
     def is_empty(self) -> bool:
         """Returns whether the current queue is empty."""
@@ -102,4 +232,49 @@ class ThreadSafeSentenceQueue:
     def __len__(self):
         """Returns length of current queue."""
         with self.lock:
-            return len(self.queue)
\ No newline at end of file
+            return len(self.queue)
+
+
+if __name__ == "__main__":
+    # Compare the old 2 ms polling consumer with the blocking one: idle CPU and handoff latency.
+    def polling_consumer(q, stop, received):
+        while not stop.is_set():
+            with q.lock:
+                sentence = q.queue.popleft() if q.queue else None
+            if sentence:
+                received.append(time.perf_counter() - sentence.ready_at)
+            time.sleep(0.002)
+
+    def blocking_consumer(q, stop, received):
+        while not stop.is_set():
+            sentence = q.get_sentence(timeout=0.1)
+            if sentence:
+                received.append(time.perf_counter() - sentence.ready_at)
+
+    for name, consumer in (("polling (2 ms)", polling_consumer), ("blocking", blocking_consumer)):
+        q = ThreadSafeSentenceQueue()
+        stop = threading.Event()
+        received = []
+        cpu = {}
+
+        def run():
+            start = time.thread_time()
+            consumer(q, stop, received)
+            cpu["seconds"] = time.thread_time() - start
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        idle_seconds = 2.0
+        time.sleep(idle_seconds)
+        for i in range(50):
+            q.add_text(f"Sentence number {i}.")
+            q.finish_current_sentence()
+            time.sleep(0.01)
+        time.sleep(0.2)
+        stop.set()
+        q.wake()
+        thread.join()
+        latencies = sorted(received)
+        print(f"{name:>15}: consumer cpu {cpu['seconds'] * 1000:6.1f} ms over {idle_seconds + 0.7:.1f}s, "
+              f"handoff mean {sum(latencies) / len(latencies) * 1000:.3f} ms, "
+              f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.3f} ms")
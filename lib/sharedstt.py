@@ -0,0 +1,271 @@
+import logging
+import queue
+import threading
+import time
+from typing import Optional
+import numpy as np
+
+
+class SharedTranscriber:
+    """
+    One faster-whisper model for every conversation of the process. RealtimeSTT's AudioToTextRecorder loads
+    its own model (in its own process) per recorder, so conversations served side by side transcribe their
+    utterances here instead, at most `concurrency` at a time. Like RealtimeSTT it also holds the Silero VAD
+    that confirms an utterance is speech before it is transcribed (see speech_seconds()).
+
+    Internal States:
+    - model: the faster_whisper WhisperModel
+    - device: device the model runs on, "cuda" falls back to "cpu" when no GPU is usable (as in RealtimeSTT)
+    - language: language of the speech
+    - beam_size: beam size of the decoding
+    - silero_sensitivity: Silero VAD sensitivity (0-1), a window is speech above a probability of 1 - sensitivity;
+      0 disables the Silero check
+    - vad_model: the Silero VAD model, None when disabled
+    - calls / busy_seconds: transcriptions done and the time they took
+    - _slots: semaphore bounding the transcriptions running at once
+    - _vad_lock: lock around vad_model, which keeps state between windows
+    - _lock: lock around the counters
+    """
+    def __init__(self, model: str = "small.en", language: str = "en", device: str = "cuda",
+                 compute_type: str = "default", concurrency: int = 2, beam_size: int = 5,
+                 silero_sensitivity: float = 0.4, silero_use_onnx: bool = False):
+        # heavy (ctranslate2, torch), keep them off the import path
+        import ctranslate2
+        from faster_whisper import WhisperModel
+        if device == "cuda" and ctranslate2.get_cuda_device_count() == 0:
+            device = "cpu"
+        self.device = device
+        self.model = WhisperModel(model, device=device, compute_type=compute_type, num_workers=max(1, concurrency))
+        self.language = language
+        self.beam_size = beam_size
+        self.silero_sensitivity = silero_sensitivity
+        self.vad_model = None
+        if silero_sensitivity > 0:
+            import torch
+            self.vad_model, _ = torch.hub.load(repo_or_dir="snakers4/silero-vad", model="silero_vad",
+                                               verbose=False, onnx=silero_use_onnx)
+        self.calls = 0
+        self.busy_seconds = 0.0
+        self._slots = threading.Semaphore(max(1, concurrency))
+        self._vad_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+    def speech_seconds(self, audio: np.ndarray, rate: int = 16000) -> float:
+        """Seconds of an utterance (float32 samples) Silero counts as speech; all of it with Silero disabled."""
+        if self.vad_model is None:
+            return len(audio) / rate
+        import torch
+        window = 512 if rate == 16000 else 256
+        voiced = 0
+        with self._vad_lock:
+            self.vad_model.reset_states()
+            for start in range(0, len(audio) - window + 1, window):
+                probability = self.vad_model(torch.from_numpy(audio[start:start + window]), rate).item()
+                if probability > 1 - self.silero_sensitivity:
+                    voiced += 1
+        return voiced * window / rate
+
+    def transcribe(self, audio: np.ndarray) -> str:
+        """Text of an utterance (float32 samples at 16 kHz)."""
+        with self._slots:
+            start = time.perf_counter()
+            segments, _ = self.model.transcribe(audio, language=self.language, beam_size=self.beam_size)
+            text = " ".join(segment.text.strip() for segment in segments)
+            elapsed = time.perf_counter() - start
+        with self._lock:
+            self.calls += 1
+            self.busy_seconds += elapsed
+        return text.strip()
+
+
+class SessionRecorder:
+    """
+    Utterance endpointing of one conversation in front of a SharedTranscriber, used in place of RealtimeSTT's
+    AudioToTextRecorder (text() / shutdown()) when several conversations share the process.
+    Audio comes from the conversation's own input device, or from feed_audio() with use_microphone=False.
+    Detection follows RealtimeSTT: WebRTC VAD decides frame by frame whether there is voice, an utterance starts
+    once start_ms of voiced frames came in a row and ends after post_speech_silence_duration without voice, with
+    pre_roll_ms of audio before the start kept. The finished utterance is then checked by the transcriber's
+    Silero VAD, and dropped (counted in rejected) unless min_speech_ms of it is speech, so noise and breathing
+    that got past WebRTC VAD do not reach the transcriber.
+
+    Internal States:
+    - transcriber: the SharedTranscriber (anything with speech_seconds(samples) and transcribe(samples) -> str)
+    - input_device_index: pyaudio input device, None for the default one
+    - rate / frame_samples: sample rate and samples per analysed frame (10, 20 or 30 ms, what WebRTC VAD takes)
+    - vad: the webrtcvad.Vad, webrtc_sensitivity 0 (least aggressive) to 3 (most aggressive filtering of non-speech)
+    - start_frames / end_frames / pre_roll_frames / max_frames: frame counts of start_ms, the silence ending an
+      utterance, pre_roll_ms and the longest utterance
+    - min_speech_seconds: speech an utterance needs according to Silero to be transcribed
+    - rejected: utterances dropped by the Silero check
+    - last_transcribe_seconds: time the last text() spent in the transcriber
+    - last_utterance_end: perf_counter time the last utterance ended (its trailing silence detected)
+    - _utterances: queue of finished utterances (int16 arrays), None wakes text() at shutdown
+    - _pre_roll: recent frames before an utterance
+    - _frames: frames of the utterance being recorded, None while none is
+    - _voiced / _silent: consecutive frames with / without voice
+    - _pending: fed audio not analysed yet (less than one frame)
+    - _stop: set by shutdown()
+    - _thread: microphone capture thread, None with use_microphone=False
+    """
+    def __init__(self, transcriber, input_device_index: Optional[int] = None, use_microphone: bool = True,
+                 rate: int = 16000, frame_ms: int = 30, webrtc_sensitivity: int = 3, start_ms: int = 90,
+                 post_speech_silence_duration: float = 0.4, pre_roll_ms: int = 300, min_speech_ms: int = 250,
+                 max_utterance_s: float = 30.0, logger=None):
+        import webrtcvad
+        if frame_ms not in (10, 20, 30):
+            raise ValueError(f"WebRTC VAD takes 10, 20 or 30 ms frames, not {frame_ms} ms")
+        self.transcriber = transcriber
+        self.input_device_index = input_device_index
+        self.rate = rate
+        self.frame_samples = rate * frame_ms // 1000
+        self.vad = webrtcvad.Vad(webrtc_sensitivity)
+        self.start_frames = max(1, start_ms // frame_ms)
+        self.end_frames = max(1, int(post_speech_silence_duration * 1000) // frame_ms)
+        self.pre_roll_frames = max(0, pre_roll_ms // frame_ms)
+        self.max_frames = int(max_utterance_s * 1000) // frame_ms
+        self.min_speech_seconds = min_speech_ms / 1000
+        self.rejected = 0
+        self.last_transcribe_seconds = None
+        self.last_utterance_end = None
+        self.log = logger or logging.getLogger(__name__)
+        self._utterances = queue.Queue()
+        self._pre_roll = []
+        self._frames = None
+        self._voiced = 0
+        self._silent = 0
+        self._pending = np.zeros(0, dtype=np.int16)
+        self._stop = threading.Event()
+        self._thread = None
+        if use_microphone:
+            self._thread = threading.Thread(target=self._capture, daemon=True)
+            self._thread.start()
+
+    def _capture(self):
+        """Read the input device and feed it frame by frame."""
+        import pyaudio
+        pa = pyaudio.PyAudio()
+        try:
+            stream = pa.open(format=pyaudio.paInt16, channels=1, rate=self.rate, input=True,
+                             frames_per_buffer=self.frame_samples, input_device_index=self.input_device_index)
+        except Exception as e:
+            self.log.error(f"SessionRecorder: opening input device {self.input_device_index} failed: {e}")
+            pa.terminate()
+            return
+        try:
+            while not self._stop.is_set():
+                self.feed_audio(stream.read(self.frame_samples, exception_on_overflow=False))
+        finally:
+            stream.stop_stream()
+            stream.close()
+            pa.terminate()
+
+    def feed_audio(self, data: bytes):
+        """Add int16 mono audio at the recorder's rate."""
+        samples = np.frombuffer(data, dtype=np.int16)
+        if len(self._pending):
+            samples = np.concatenate((self._pending, samples))
+        n = len(samples) - len(samples) % self.frame_samples
+        for start in range(0, n, self.frame_samples):
+            self._on_frame(samples[start:start + self.frame_samples])
+        self._pending = samples[n:].copy()
+
+    def _on_frame(self, frame: np.ndarray):
+        voiced = self.vad.is_speech(frame.tobytes(), self.rate)
+        if self._frames is None:
+            self._voiced = self._voiced + 1 if voiced else 0
+            self._pre_roll.append(frame)
+            if self._voiced >= self.start_frames:
+                self._frames = self._pre_roll
+                self._pre_roll = []
+                self._silent = 0
+            elif len(self._pre_roll) > self.pre_roll_frames + self.start_frames:
+                del self._pre_roll[0]
+            return
+        self._frames.append(frame)
+        self._silent = 0 if voiced else self._silent + 1
+        if self._silent >= self.end_frames or len(self._frames) >= self.max_frames:
+            self.last_utterance_end = time.perf_counter()
+            self._utterances.put(np.concatenate(self._frames))
+            self._frames = None
+            self._voiced = 0
+
+    def text(self) -> Optional[str]:
+        """Block until the next utterance with speech ended and return its text (None after shutdown())."""
+        while True:
+            audio = self._utterances.get()
+            if audio is None:
+                self._utterances.put(None)  # later calls return at once too
+                return None
+            samples = audio.astype(np.float32) / 32768.0
+            if self.transcriber.speech_seconds(samples, self.rate) < self.min_speech_seconds:
+                self.rejected += 1
+                continue
+            start = time.perf_counter()
+            text = self.transcriber.transcribe(samples)
+            self.last_transcribe_seconds = time.perf_counter() - start
+            if text:
+                return text
+
+    def shutdown(self):
+        """Stop capturing and wake a caller blocked in text()."""
+        self._stop.set()
+        self._utterances.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+
+if __name__ == "__main__":
+    # Endpointing check on the repository's voice references: three real utterances with pauses, plus a burst of
+    # loud noise and a breath-like hiss that must not become utterances, over background noise, fed in 20 ms
+    # pieces like a network client would. The transcriber only reports lengths; with faster-whisper installed,
+    # pass --whisper to transcribe for real (Silero then checks the utterances as well).
+    import sys
+    import wave
+
+    rate = 16000
+    rng = np.random.default_rng(1)
+
+    def clip(name, seconds):
+        with wave.open(f"wavs/reference_woman/Standard/{name}.wav") as w:
+            samples = np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16).astype(np.float64)
+        return samples[:int(seconds * rate)]
+
+    events = [("speech", clip("neutral", 2.5)), ("noise", rng.normal(0, 3000, int(0.8 * rate))),
+              ("speech", clip("happy", 2.0)), ("breath", np.convolve(rng.normal(0, 1500, int(0.6 * rate)),
+                                                                     np.ones(8) / 8, "same")),
+              ("speech", clip("sad", 3.0))]
+    parts, expected = [rng.normal(0, 60, rate)], []
+    position = 1.0
+    for kind, samples in events:
+        parts.append(samples + rng.normal(0, 60, len(samples)))
+        if kind == "speech":
+            expected.append((round(position, 1), round(position + len(samples) / rate, 1)))
+        position += len(samples) / rate + 1.0
+        parts.append(rng.normal(0, 60, rate))
+    audio = np.clip(np.concatenate(parts), -32768, 32767).astype(np.int16)
+
+    if "--whisper" in sys.argv:
+        transcriber = SharedTranscriber(device="cpu")
+    else:
+        class _Lengths:
+            def speech_seconds(self, samples, rate=16000):
+                return len(samples) / rate
+
+            def transcribe(self, samples):
+                return f"<{len(samples) / rate:.2f}s>"
+        transcriber = _Lengths()
+
+    recorder = SessionRecorder(transcriber, use_microphone=False, rate=rate)
+    step = rate // 50
+    for i in range(0, len(audio), step):
+        recorder.feed_audio(audio[i:i + step].tobytes())
+    recorder.shutdown()
+    cuts = []
+    while True:
+        text = recorder.text()
+        if text is None:
+            break
+        cuts.append(text)
+    print(f"speech at {expected} s (noise and breath in between) -> {len(cuts)} utterances {cuts}, "
+          f"{recorder.rejected} rejected by Silero")
@@ -0,0 +1,80 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+
+class StartupTimeline:
+    """
+    Records when each startup step (model loads, warm-ups) began and ended, across threads,
+    and prints them as a timeline relative to process start.
+
+    Internal States:
+    - started_at: reference time of the timeline
+    - steps: list of (name, start, end) tuples, end is None while running
+    - lock: lock around steps
+    """
+    def __init__(self, started_at: Optional[float] = None):
+        self.started_at = started_at if started_at is not None else time.time()
+        self.steps: List[Tuple[str, float, Optional[float]]] = []
+        self.lock = threading.Lock()
+
+    def add(self, name: str, start: float, end: float):
+        """Record a step that was timed elsewhere (e.g. the imports before the timeline existed)."""
+        with self.lock:
+            self.steps.append((name, start, end))
+
+    @contextmanager
+    def step(self, name: str):
+        """Time the body of a with-block as one step."""
+        start = time.time()
+        with self.lock:
+            index = len(self.steps)
+            self.steps.append((name, start, None))
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.steps[index] = (name, start, time.time())
+
+    def run_parallel(self, *steps):
+        """
+        Run (name, function) pairs on their own threads and wait for all of them.
+        The first exception raised by a step is re-raised here once every step ended.
+        """
+        errors = []
+
+        def run(name, function):
+            try:
+                with self.step(name):
+                    function()
+            except BaseException as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run, args=step, name=f"Startup_{step[0]}", daemon=True) for step in steps]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+
+    def time_to_ready(self) -> float:
+        with self.lock:
+            ends = [end for _, _, end in self.steps if end is not None]
+        return (max(ends) if ends else time.time()) - self.started_at
+
+    def report(self, width: int = 40) -> str:
+        """One line per step: offset, duration and a bar placing it on the timeline."""
+        with self.lock:
+            steps = list(self.steps)
+        total = max(self.time_to_ready(), 1e-6)
+        lines = [f"Startup timeline (ready after {total:.2f}s):"]
+        for name, start, end in steps:
+            end = end if end is not None else time.time()
+            offset, duration = start - self.started_at, end - start
+            begin_col = int(offset / total * width)
+            bar_len = max(1, int(duration / total * width))
+            bar = " " * begin_col + "#" * min(bar_len, width - begin_col)
+            lines.append(f"  {name:<20} {offset:6.2f}s +{duration:6.2f}s |{bar:<{width}}|")
+        return "\n".join(lines)
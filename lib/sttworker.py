@@ -1,8 +1,11 @@
 import logging
 import threading
 import time
+from typing import TYPE_CHECKING
 from lib.bargecontroller import BargeInController
-from RealtimeSTT import AudioToTextRecorder
+
+if TYPE_CHECKING:
+    from RealtimeSTT import AudioToTextRecorder
 
 class STTWorker(threading.Thread):
     """
@@ -15,7 +18,7 @@ class STTWorker(threading.Thread):
     - _stop: threading event that indicates when STT should stop
     - log: logger to be used for statments
     """
-    def __init__(self, recorder: AudioToTextRecorder, ctrl: BargeInController, logger=None):
+    def __init__(self, recorder: "AudioToTextRecorder", ctrl: BargeInController, logger=None):
         super().__init__(daemon=True)
         self.recorder = recorder
         self.ctrl = ctrl
@@ -0,0 +1,23 @@
+import os
+from typing import List, Optional, Tuple
+
+
+def list_emotions(references_folder: str) -> List[str]:
+    """Emotions that have a <emotion>.wav cloning reference in the voice directory."""
+    try:
+        files = os.listdir(references_folder)
+    except FileNotFoundError:
+        return []
+    return sorted(os.path.splitext(f)[0] for f in files if f.endswith(".wav"))
+
+
+def load_reference(references_folder: str, emotion: str) -> Tuple[str, Optional[str]]:
+    """(wav path, prompt text) of an emotion reference; the text is None if <emotion>.txt is missing."""
+    path = os.path.join(references_folder, emotion + ".wav")
+    prompt_text = None
+    try:
+        with open(os.path.join(references_folder, emotion + ".txt"), "r", encoding="utf-8") as f:
+            prompt_text = f.read().strip()
+    except OSError:
+        pass
+    return path, prompt_text
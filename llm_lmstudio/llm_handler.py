@@ -15,12 +15,14 @@ class LLMHandler:
     - max_tokens: max_tokens to be stored in the conversation history
     - conversation: Conversation object that stores history
     - log_stats: whether to log statistics of operation or not.
+    - session: requests.Session used for the requests, may be shared by the handlers of several conversations
     """
     def __init__(
             self,
             completion_params_file: str = "llm_lmstudio/completion_params.json",
             max_tokens: int = 1000,
-            log_stats: bool = False):
+            log_stats: bool = False,
+            http_session: requests.Session = None):
 
         self.completion_params = self.load_completion_params(completion_params_file)
         self.max_tokens = max_tokens
@@ -31,7 +33,8 @@ class LLMHandler:
         self.api_url = "http://localhost:1234/v1/chat/completions"
 
         # Variables that support streaming abort during user interruption
-        self.session = requests.Session()
+        # (a shared session only shares its connection pool, every handler aborts its own response)
+        self.session = http_session or requests.Session()
         self._active_response = None
         self._abort = threading.Event()
 
@@ -123,6 +126,25 @@ class LLMHandler:
                 print(f"A finally error occured: {e}")
             self._active_response = None
 
+    def warm_up(self, timeout: float = 60.0) -> bool:
+        """
+        Sends a one token request so LMStudio loads the model (and its prompt cache) before the first turn.
+        Returns whether the server answered; a missing server is reported but not fatal at startup.
+        """
+        payload = {
+            "model": self.completion_params["model"],
+            "messages": [{"role": "user", "content": "Hi"}],
+            "stream": False,
+            "max_tokens": 1,
+        }
+        try:
+            response = self.session.post(self.api_url, json=payload, timeout=(3.05, timeout))
+            response.raise_for_status()
+            return True
+        except Exception as e:
+            print(f"LLM warm-up failed: {e}")
+            return False
+
     def abort(self):
         """Aborts the currently active response during user interruption."""
         self._abort.set()
@@ -1,3 +1,6 @@
+import time
+_process_started_at = time.time()
+
 import string
 import os, sys
 conda = os.environ.get("CONDA_PREFIX") or sys.prefix
@@ -9,67 +12,19 @@ extra = [
 ]
 os.environ["PATH"] = os.pathsep.join(extra + [os.environ.get("PATH","")])
 
-# Override modelscope's snapshot_download to load the local wetext model from third_party\pengzhendong\wetext 
-# instead of fetching it online
-import importlib
-import modelscope
-import modelscope.hub
-
-os.environ["MODELSCOPE_OFFLINE"] = "1"
-os.environ["MODELSCOPE_HOME"] = os.path.join(os.getcwd(), "third_party")
-
-def offline_snapshot_download(model_id, *args, **kwargs):
-    base = os.environ["MODELSCOPE_HOME"]
-    local_path = os.path.join(base, model_id.replace("/", os.sep))
-    if not os.path.exists(local_path):
-        raise RuntimeError(f"[OFFLINE] Model not found locally: {local_path}")
-    print(f"[OFFLINE] Using local model: {local_path}")
-    return local_path
-
-modules_to_patch = [
-    "modelscope",
-    "modelscope.hub",
-    "modelscope.hub.snapshot_download",
-    "modelscope.utils.hub",
-]
-
-for mod in modules_to_patch:
-    try:
-        module = importlib.import_module(mod)
-        setattr(module, "snapshot_download", offline_snapshot_download)
-    except (ImportError, AttributeError):
-        pass
-
-# prevent flash attention warnings
-import warnings
-
-warnings.filterwarnings(
-    "ignore",
-    category=UserWarning,
-    module=r"transformers\.integrations\.sdpa_attention",
-    message=r".*not compiled with flash attention.*",
-)
-
-warnings.filterwarnings(
-    "ignore",
-    category=FutureWarning,
-    module=r"cosyvoice\.cli\.model",
-    message=r".*is deprecated. Please use.*",
-)
-
 import os
 import re
 import time
 import json
 import logging
 import argparse
-from typing import List
+from typing import List, Optional
 from dataclasses import dataclass
-from RealtimeSTT import AudioToTextRecorder
 from llm_lmstudio.llm_handler import LLMHandler
 from lib.bargecontroller import BargeInController
 from lib.sttworker import STTWorker
 from lib.micenergywatcher import MicEnergyWatcher
+from lib.startuptimeline import StartupTimeline
 
 # Imports for barge-in controller/workers
 import threading
@@ -84,6 +39,8 @@ class Config:
     Internal States:
     - stt_model: faster whisper model to use (default: small.en)
     - stt_language: language for faster whisper model
+    - stt_device: device faster whisper runs on, "cuda" falls back to "cpu" without a GPU
+    - stt_compute_type: faster whisper compute type (e.g. float16, int8; default picks one for the device)
     - stt_silence_duration: how long to wait after user stops speaking to start processing
     - tts_config_file: path to json file for tts config; can be overriden via --tts-config
     - output_file: file to store output transcripts; can be overriden via --output-file
@@ -95,9 +52,13 @@ class Config:
     - print_llm_text: whether to print llm text during processing
     - dgb_log: whether to log debugging statements or not
     - log_level_nondebug: if dbg_log is false what log level should be used
+    - input_device_index: pyaudio device the user is heard on, None for the default one
+    - output_device_index: pyaudio device the character is played on, None for the default one
     """
     stt_model: str = "small.en"
     stt_language: str = "en"
+    stt_device: str = "cuda"
+    stt_compute_type: str = "default"
     stt_silence_duration: float = 0.2
     prompt_file: str = "prompts/scenario_1/female_char/prompt.json"
     tts_config_file: str = "tts_config_cosyvoice.json" # default; can be overridden via --tts-config
@@ -110,6 +71,8 @@ class Config:
     print_llm_text: bool = True
     dbg_log: bool = False
     log_level_nondebug = logging.WARNING
+    input_device_index: Optional[int] = None
+    output_device_index: Optional[int] = None
 
 
 def color_text(text, color_code):
@@ -117,9 +80,21 @@ def color_text(text, color_code):
     return f"\033[{color_code}m{text}\033[0m"
 
 class Main:
-    """Main function for OpenVoiceAgent"""
-    def __init__(self, config: Config):
+    """
+    Main function for OpenVoiceAgent
+
+    With shared models (session_manager.SharedModels) the conversation is one of several served by the process:
+    it transcribes on the shared whisper model, renders on the shared TTS workers and queries the LLM over the
+    shared HTTP session, while its conversation, barge-in controller and audio devices stay its own.
+    Its output then goes to echo (a print-like function) and turn_stats collects the latency of each turn.
+    """
+    def __init__(self, config: Config, shared=None, echo=None):
+        self._created_at = time.time()
         self.config = config
+        self.shared = shared
+        self._echo = echo or print
+        self.turn_stats = []
+        self._first_token_at = None
         self.setup_logging()
         self.char_gender = "female" if "female_char" in config.prompt_file else "male"
         self.valid_emotions = self.get_valid_emotions(self.char_gender)
@@ -128,14 +103,7 @@ class Main:
         with open(config.prompt_file, 'r') as f:
             self.chat_params = json.load(f)
 
-        print("Loading STT")
-        self.recorder = AudioToTextRecorder(
-            model=config.stt_model,
-            language=config.stt_language,
-            spinner=False,
-            post_speech_silence_duration=config.stt_silence_duration,
-        )
-        self.llm_handler = LLMHandler()
+        self.llm_handler = LLMHandler(http_session=shared.http_session if shared else None)
 
         # set up correct tts engine according to config
         with open(config.tts_config_file, 'r') as f:
@@ -143,9 +111,46 @@ class Main:
         if tts_config['engine'] == "cosyvoice":
             from tts_handler_cosyvoice import TTSHandler
         else:
-            print(f"ERROR: invalid engine chosen in tts_config file {tts_config['engine']} resorting to default engine.")
+            self._echo(f"ERROR: invalid engine chosen in tts_config file {tts_config['engine']} resorting to default engine.")
             from tts_handler_cosyvoice import TTSHandler
-        self.tts_handler = TTSHandler(config.tts_config_file, config.wavs_directory)      
+
+        # STT, TTS (worker spawn + warm-up) and the LLM warm-up are independent, so load them side by side
+        self.startup_timeline = StartupTimeline(_process_started_at)
+        self.startup_timeline.add("imports", _process_started_at, self._created_at)
+        self.recorder = None
+        self.tts_handler = None
+
+        def load_stt():
+            if shared is not None:
+                from lib.sharedstt import SessionRecorder
+                self.recorder = SessionRecorder(
+                    shared.transcriber,
+                    input_device_index=config.input_device_index,
+                    post_speech_silence_duration=config.stt_silence_duration,
+                    logger=logging.getLogger("SessionRecorder"),
+                )
+                return
+            self._echo("Loading STT")
+            from RealtimeSTT import AudioToTextRecorder  # heavy (torch, faster-whisper), keep it off the import path
+            self.recorder = AudioToTextRecorder(
+                model=config.stt_model,
+                language=config.stt_language,
+                device=config.stt_device,
+                compute_type=config.stt_compute_type,
+                spinner=False,
+                post_speech_silence_duration=config.stt_silence_duration,
+            )
+
+        def load_tts():
+            self.tts_handler = TTSHandler(config.tts_config_file, config.wavs_directory,
+                                          engine=shared.tts_engine if shared else None,
+                                          output_device_index=config.output_device_index)
+
+        loaders = [("stt", load_stt), ("tts", load_tts)]
+        if shared is None:
+            loaders.append(("llm warm-up", self.llm_handler.warm_up))  # shared models warmed the LLM already
+        self.startup_timeline.run_parallel(*loaders)
+        self._echo(self.startup_timeline.report())
         
         # Token processing state
         self.plain_text = ""
@@ -159,7 +164,8 @@ class Main:
         self.ctrl = BargeInController()
         self.stt_worker = STTWorker(self.recorder, self.ctrl, logger=logging.getLogger("STTWorker"))
         # mic watcher for early barge-in
-        self.mic_watcher = MicEnergyWatcher(self.ctrl, mode="high_thresh_while_tts", logger=logging.getLogger("MicWatcher"))
+        self.mic_watcher = MicEnergyWatcher(self.ctrl, mode="high_thresh_while_tts", device_index=config.input_device_index,
+                                            logger=logging.getLogger("MicWatcher"))
 
         # Global shutdown variables
         self.shutdown_event = threading.Event() # global exit application flag
@@ -168,7 +174,9 @@ class Main:
         # Start gate variable for silence timeout
         self._first_turn = True
 
-        self._install_signal_handlers()
+        # signals reach the process, not a conversation: the session manager stops shared conversations instead
+        if shared is None:
+            self._install_signal_handlers()
     
     def setup_logging(self):
         """Function to set up logging."""
@@ -183,22 +191,22 @@ class Main:
     def print_available_emotions(self):
         """Print to cmd line list of emotions."""
         emotions_str = ', '.join(f'(\033[0;91m{emotion.lower()}\033[0m)' for emotion in self.valid_emotions)
-        print(f"Available emotions: {emotions_str}\n")
+        self._echo(f"Available emotions: {emotions_str}\n")
 
     def print_character_info(self):
         """Print information of conversation."""
         char_name = color_text(self.chat_params['char'], '96')  # Light Cyan
         user_name = color_text(self.chat_params['user'], '93')  # Light Yellow
         system_prompt = self.get_system_prompt()
-        print(f"Assistant Name: {char_name}")
-        print(f"\nUser Name: {user_name}")
-        print(f"\nSystem Prompt: {system_prompt}")
-        print()  # Extra line for spacing
+        self._echo(f"Assistant Name: {char_name}")
+        self._echo(f"\nUser Name: {user_name}")
+        self._echo(f"\nSystem Prompt: {system_prompt}")
+        self._echo()  # Extra line for spacing
 
     def _print_listen_prompt(self, first: bool = False):
         """Function that prints blocking wait call before conversation."""
         user_name = color_text(self.chat_params['user'], '93')
-        print(f"\n>>> {user_name}: ", end="", flush=True)
+        self._echo(f"\n>>> {user_name}: ", end="", flush=True)
 
     def get_system_prompt(self) -> str:
         """Gets the system prompt based on inputs."""
@@ -241,7 +249,7 @@ class Main:
         """Process the buffer text, adding it to the sentence queue."""
         new_text = self.process_plain_text(self.buffer)
         if self.tts_handler:
-            self.tts_handler.sentence_queue.add_text(new_text)
+            self.tts_handler.add_text(new_text)
         self.buffer = ""
 
     def process_plain_text(self, text: str) -> str:
@@ -253,7 +261,7 @@ class Main:
         new_text = self.plain_text[len(self.last_plain_text):]
         self.last_plain_text = self.plain_text
         if self.config.print_llm_text:
-            print(f"\033[96m{new_text}\033[0m", end='', flush=True)
+            self._echo(f"\033[96m{new_text}\033[0m", end='', flush=True)
         return new_text
 
     def process_emotion(self):
@@ -261,25 +269,33 @@ class Main:
         emotion = self.buffer[1:-1].lower()
         current_emotion = "neutral" if emotion not in self.valid_emotions else emotion
         if self.config.print_emotions:
-            print(f"(\033[0;91m{current_emotion.lower()}\033[0m) ", end='', flush=True)
+            self._echo(f"(\033[0;91m{current_emotion.lower()}\033[0m) ", end='', flush=True)
         if self.tts_handler:
             self.tts_handler.sentence_queue.add_emotion(current_emotion)
 
     def _announce_ai_turn(self):
         """Print ai turn starter."""
         char_name = color_text(self.chat_params['char'], '96')
-        print(f"<<< {char_name}: ", end="", flush=True)
+        self._echo(f"<<< {char_name}: ", end="", flush=True)
 
-    def run(self):
-        """Central function to run the conversation."""
+    def run(self, start_event: threading.Event = None):
+        """Central function to run the conversation. With a start_event it waits for the event instead of Enter."""
         self.print_available_emotions()
         self.print_character_info()
         system_prompt = self.get_system_prompt()
 
         # Prompt user to start scenario (models are already loaded in __init__)
         try:
-            print("\nModels are loaded and ready.", flush=True)
-            input(color_text(config.start_message, "32"))
+            self._echo("\nModels are loaded and ready.", flush=True)
+            if start_event is None:
+                input(color_text(self.config.start_message, "32"))
+            else:
+                self._echo(color_text(self.config.start_message, "32"))
+                while not (start_event.wait(0.1) or self.shutdown_event.is_set()):
+                    pass
+                if self.shutdown_event.is_set():
+                    self.cleanup()
+                    return
         except KeyboardInterrupt:
             # Allow clean exit BEFORE any background threads start
             if hasattr(self, "_begin_shutdown"):
@@ -303,10 +319,13 @@ class Main:
         try:
             while not self.shutdown_event.is_set():
                 # wait for finalized user utterance
-                user_text = self._get_and_drain_input(config.silence_timeout, config.silence_token) # drains + merges (empty in batches instead of single items)
+                user_text = self._get_and_drain_input(self.config.silence_timeout, self.config.silence_token) # drains + merges (empty in batches instead of single items)
+                if self.shutdown_event.is_set():
+                    break  # woken by the shutdown sentinel, not by the user
+                turn_received_at = time.time()
 
                 # print user text
-                print(f"{color_text(user_text, '93')}")
+                self._echo(f"{color_text(user_text, '93')}")
 
                 # Change first turn variable
                 if self._first_turn: self._first_turn = False
@@ -317,6 +336,7 @@ class Main:
 
                 # Run one AI turn cooperatively cancellable
                 self._run_ai_turn(user_text, system_prompt)
+                self._record_turn_stats(turn_received_at, silent=user_text == self.config.silence_token)
 
                 # prompt the user again for the next turn
                 self._print_listen_prompt()
@@ -390,6 +410,18 @@ class Main:
         self.in_emotion = False
         self.last_char = ""
         self.assistant_text = ""
+        self._first_token_at = None
+
+    def _record_turn_stats(self, received_at: float, silent: bool = False):
+        """Adds the latencies of the turn just played to turn_stats, in seconds after the user text arrived."""
+        first_audio_at = self.tts_handler.first_audio_at if self.tts_handler else None
+        self.turn_stats.append({
+            "at": received_at,
+            "stt": None if silent else getattr(self.recorder, "last_transcribe_seconds", None),
+            "llm_first_token": self._first_token_at - received_at if self._first_token_at else None,
+            "first_audio": first_audio_at - received_at if first_audio_at else None,
+            "cancelled": self.ctrl.cancel_event.is_set(),
+        })
     
     def _run_ai_turn(self, user_text: str, system_prompt: str):
         """Function that does an AI turn."""
@@ -414,6 +446,8 @@ class Main:
                 if self.ctrl.barge_event.is_set() or self.ctrl.cancel_event.is_set():
                     self.ctrl.request_cancel()
                     raise RuntimeError("CancelledByBargeIn")
+                if self._first_token_at is None:
+                    self._first_token_at = time.time()
                 self.process_llm_token(tok)
 
             self.llm_handler.generate_response(system_prompt, on_token=_on_tok)
@@ -435,7 +469,7 @@ class Main:
             if self.tts_handler:
                 if not (self.ctrl.cancel_event.is_set() or self.shutdown_event.is_set()):
                     self.tts_handler.sentence_queue.finish_current_sentence()
-                self.llm_handler.write_payload(file_path=config.output_file)
+                self.llm_handler.write_payload(file_path=self.config.output_file)
                 # If we were cancelled, we already stopped TTS in _cancel_ai_now()
                 if not (self.ctrl.cancel_event.is_set() or self.shutdown_event.is_set()):
                     self.wait_for_tts_completion()
@@ -465,7 +499,7 @@ class Main:
                 finished_playout = (
                     not self.tts_handler.stream.is_playing() and
                     self.tts_handler.sentence_queue.is_empty() and
-                    self.tts_handler.chunk_queue.empty()
+                    not self.tts_handler.audio_pending()
                 )
                 if finished_playout:
                     if not_playing_start_time is None:
@@ -478,25 +512,31 @@ class Main:
         logging.debug("All sentences processed and TTS playback completed.")
 
     def cleanup(self):
-        """Function to shutdown the Cosyvoice engine within the tts handler"""
+        """Function to shutdown the tts handler (its threads, filler bank, avatar sync and Cosyvoice engine)"""
         if self.tts_handler:
             logging.debug("Shutting down TTS engine...")
-            self.tts_handler.engine.shutdown()
+            self.tts_handler.shutdown()
             logging.debug("TTS shutdown complete.")
+        if self.shared is not None and self.recorder:
+            self.recorder.shutdown()  # the shared model stays loaded, only this conversation's audio stops
 
     def _install_signal_handlers(self):
         """Function to set up signal handlers for Ctrl+C"""
         def _handler(signum, frame):
             self._sigint_count += 1
             if self._sigint_count == 1:
-                print("\n^C received — shutting down gracefully...")
+                self._echo("\n^C received — shutting down gracefully...")
                 self._begin_shutdown()
             else:
-                print("\n^C again — forcing exit.")
+                self._echo("\n^C again — forcing exit.")
                 os._exit(1)  # last resort; avoid hanging forever
         signal.signal(signal.SIGINT, _handler)
         signal.signal(signal.SIGTERM, _handler)
 
+    def stop(self):
+        """End the conversation, also from another thread: run() stops waiting, cleans up and returns."""
+        self._begin_shutdown()
+
     def _begin_shutdown(self):
         """Graceful shutdown: cancel everything and unblock any waits."""
         if self.shutdown_event.is_set():
@@ -548,7 +588,7 @@ if __name__ == '__main__':
     try:
         main.run()
     except KeyboardInterrupt:
-        main._begin_shutdown()
+        main.stop()
     finally:
         # if some 3rd-party thread refuses to die, force the process to exit
         if main.shutdown_event.is_set():
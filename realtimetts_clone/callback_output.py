@@ -0,0 +1,313 @@
+"""
+Callback-mode PyAudio output fed from a preallocated sample ring.
+
+PortAudio calls the stream callback on its own thread once per device period. The callback copies the next
+samples out of a SampleRing (silence if there are not enough) and advances an exact played-frame counter,
+so the playhead, the buffered duration and underruns are known to the sample. Producers only copy into
+the ring with write(); they never touch the device. Each ring counter has exactly one writer (write_pos
+the producer, read_pos the callback), so the audio path takes no lock.
+
+Stopping is a flag the next callback acts on: flush() drops everything queued within one device period.
+
+Running this module directly plays a short tone through the default output and reports the
+playhead accuracy, underruns and the flush latency.
+"""
+
+import threading
+import time
+from typing import Callable, Optional
+import numpy as np
+import pyaudio
+
+# PyAudio sample formats the ring can hold
+_DTYPES = {
+    pyaudio.paInt16: np.int16,
+    pyaudio.paFloat32: np.float32,
+    pyaudio.paInt32: np.int32,
+    pyaudio.paInt8: np.int8,
+    pyaudio.paUInt8: np.uint8,
+}
+
+
+class SampleRing:
+    """
+    Single-producer / single-consumer ring of samples in a preallocated numpy array.
+
+    Internal States:
+    - capacity: number of samples the ring can hold
+    - buffer: the preallocated sample array
+    - write_pos: total samples written, only advanced by the producer
+    - read_pos: total samples consumed, only advanced by the consumer
+    """
+    def __init__(self, capacity: int, dtype):
+        self.capacity = int(capacity)
+        self.buffer = np.zeros(self.capacity, dtype=dtype)
+        self.write_pos = 0
+        self.read_pos = 0
+
+    def available(self) -> int:
+        """Samples written but not consumed yet."""
+        return self.write_pos - self.read_pos
+
+    def free(self) -> int:
+        """Samples the producer can write without overwriting unread data."""
+        return self.capacity - self.available()
+
+    def write(self, samples: np.ndarray) -> int:
+        """Copy as many samples as fit; returns how many were written."""
+        n = min(len(samples), self.free())
+        if n <= 0:
+            return 0
+        offset = self.write_pos % self.capacity
+        first = min(n, self.capacity - offset)
+        self.buffer[offset:offset + first] = samples[:first]
+        if first < n:
+            self.buffer[:n - first] = samples[first:n]
+        # publish only after the samples are in place
+        self.write_pos += n
+        return n
+
+    def read_into(self, out: np.ndarray) -> int:
+        """Copy up to len(out) samples into out; returns how many were read."""
+        n = min(len(out), self.available())
+        if n <= 0:
+            return 0
+        offset = self.read_pos % self.capacity
+        first = min(n, self.capacity - offset)
+        out[:first] = self.buffer[offset:offset + first]
+        if first < n:
+            out[first:n] = self.buffer[:n - first]
+        self.read_pos += n
+        return n
+
+    def skip(self) -> int:
+        """Drop everything queued (consumer side); returns how many samples were dropped."""
+        n = self.available()
+        self.read_pos += n
+        return n
+
+
+class CallbackOutputStream:
+    """
+    PyAudio output stream in callback mode, fed through a SampleRing.
+
+    Internal States:
+    - format: PyAudio sample format
+    - channels: number of interleaved channels
+    - rate: sample rate in Hz
+    - frames_per_buffer: device period in frames
+    - max_buffered_frames: write() blocks while this many frames are queued ahead of the device
+    - ring: SampleRing between write() and the callback
+    - played_frames: frames handed to the device so far (real audio only, not the silence of underruns)
+    - underruns: number of times the ring ran dry while more audio was expected
+    - underrun_frames: frames of silence played during those underruns
+    - stream: the PyAudio stream, None until open()
+    - _expecting: True between a write() and end_of_audio(); an empty ring only counts as an underrun then
+    - _starved: whether the current dry stretch was already counted
+    - _flush: set by flush(), the callback drops everything queued at its next period
+    - _space: set by the callback whenever it consumed audio, write() and drain() wait on it
+    - _out: preallocated output block of the callback
+    - _period: (ring frame at its start, frames of real audio, perf_counter time) of the latest period handed to the device
+    - _silence: value of a silent sample in this format
+    """
+    def __init__(self, format: int = pyaudio.paInt16, channels: int = 1, rate: int = 24000, frames_per_buffer: int = 480,
+                 max_buffered_seconds: float = 0.1, capacity_seconds: float = 2.0):
+        if format not in _DTYPES:
+            raise ValueError(f"Unsupported sample format for callback output: {format}")
+        self.format = format
+        self.channels = channels
+        self.rate = rate
+        self.frames_per_buffer = max(1, int(frames_per_buffer))
+        self.max_buffered_frames = max(self.frames_per_buffer, int(rate * max_buffered_seconds))
+        capacity_frames = max(2 * self.max_buffered_frames, int(rate * capacity_seconds))
+        self.ring = SampleRing(capacity_frames * channels, _DTYPES[format])
+        self.played_frames = 0
+        self.underruns = 0
+        self.underrun_frames = 0
+        self.stream = None
+        self._expecting = False
+        self._starved = False
+        self._flush = False
+        self._space = threading.Event()
+        self._out = np.zeros(self.frames_per_buffer * channels, dtype=_DTYPES[format])
+        self._silence = 128 if format == pyaudio.paUInt8 else 0
+        self._period = (0, 0, 0.0)
+
+    def open(self, pyaudio_instance: pyaudio.PyAudio, output_device_index=None, start: bool = True):
+        """Open (and by default start) the callback stream on the given PyAudio instance."""
+        self.stream = pyaudio_instance.open(
+            format=self.format,
+            channels=self.channels,
+            rate=self.rate,
+            output=True,
+            output_device_index=output_device_index,
+            frames_per_buffer=self.frames_per_buffer,
+            stream_callback=self._callback,
+            start=start,
+        )
+        return self.stream
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        """PortAudio thread: hand the next frame_count frames to the device."""
+        if self._flush:
+            self._flush = False
+            self.ring.skip()
+            self._expecting = False
+            self._starved = False
+        samples = frame_count * self.channels
+        if len(self._out) != samples:
+            self._out = np.zeros(samples, dtype=self._out.dtype)
+        out = self._out
+        start = self.ring.read_pos // self.channels
+        n = self.ring.read_into(out)
+        # one tuple assignment, so readers on other threads never see a half-updated period
+        self._period = (start, n // self.channels, time.perf_counter())
+        if n < samples:
+            out[n:] = self._silence
+            if self._expecting:
+                if not self._starved:
+                    self.underruns += 1
+                    self._starved = True
+                self.underrun_frames += (samples - n) // self.channels
+        else:
+            self._starved = False
+        if n:
+            self.played_frames += n // self.channels
+            self._space.set()
+        return out.tobytes(), pyaudio.paContinue
+
+    def write(self, data, should_stop: Optional[Callable[[], bool]] = None) -> bool:
+        """
+        Queue audio (bytes or ndarray in the stream's format), blocking while max_buffered_frames are already
+        queued. Returns False if should_stop() became True before everything was queued.
+        """
+        samples = np.frombuffer(data, dtype=self.ring.buffer.dtype) if not isinstance(data, np.ndarray) else data.reshape(-1)
+        if len(samples) == 0:
+            return True
+        self._expecting = True
+        limit = self.max_buffered_frames * self.channels
+        period = self.frames_per_buffer / self.rate
+        offset = 0
+        while offset < len(samples):
+            if should_stop is not None and should_stop():
+                return False
+            room = limit - self.ring.available()
+            if room <= 0:
+                self._space.clear()
+                if limit - self.ring.available() <= 0:
+                    self._space.wait(period)
+                continue
+            offset += self.ring.write(samples[offset:offset + room])
+        return True
+
+    def end_of_audio(self):
+        """Nothing more is coming for now: the ring running dry from here on is not an underrun."""
+        self._expecting = False
+
+    def flush(self):
+        """Drop every queued frame; takes effect at the next device period."""
+        self._expecting = False
+        self._flush = True
+        self._space.set()
+
+    def buffered_frames(self) -> int:
+        """Frames queued in the ring and not handed to the device yet."""
+        return self.ring.available() // self.channels
+
+    def buffered_seconds(self) -> float:
+        return self.buffered_frames() / self.rate
+
+    def played_seconds(self) -> float:
+        """Audio handed to the device so far."""
+        return self.played_frames / self.rate
+
+    def output_latency(self) -> float:
+        """Seconds between the callback handing over a frame and it becoming audible."""
+        try:
+            return self.stream.get_output_latency() if self.stream is not None else 0.0
+        except Exception:
+            return 0.0
+
+    def playhead_seconds(self) -> float:
+        """Position of the audio being heard right now."""
+        return max(0.0, self.played_seconds() - self.output_latency())
+
+    def written_frames(self) -> int:
+        """Ring frame the next written sample lands on (the scale of playhead_frame)."""
+        return self.ring.write_pos // self.channels
+
+    def playhead_frame(self) -> int:
+        """
+        Ring frame being heard right now: the latest period's start, advanced with the clock while that period
+        plays (never beyond it), minus the output latency. Unlike played_frames this also counts frames dropped
+        by flush(), so it stays comparable with written_frames().
+        """
+        start, frames, at = self._period
+        elapsed = min(frames, int((time.perf_counter() - at) * self.rate)) if frames else 0
+        return max(0, start + elapsed - int(self.output_latency() * self.rate))
+
+    def drain(self, timeout: Optional[float] = None, should_stop: Optional[Callable[[], bool]] = None) -> bool:
+        """Wait until the ring was played out; returns False on timeout or stop."""
+        deadline = None if timeout is None else time.time() + timeout
+        period = self.frames_per_buffer / self.rate
+        while self.ring.available() > 0:
+            if should_stop is not None and should_stop():
+                return False
+            if deadline is not None and time.time() > deadline:
+                return False
+            if self.stream is None or not self.stream.is_active():
+                return False
+            self._space.clear()
+            self._space.wait(period)
+        return True
+
+    def is_active(self) -> bool:
+        return self.stream is not None and self.stream.is_active()
+
+    def close(self):
+        """Stop and close the stream; queued audio that was not played is dropped."""
+        self.flush()
+        if self.stream is not None:
+            try:
+                self.stream.stop_stream()
+                self.stream.close()
+            except Exception:
+                pass
+            self.stream = None
+
+
+if __name__ == "__main__":
+    rate = 24000
+    pa = pyaudio.PyAudio()
+    output = CallbackOutputStream(pyaudio.paInt16, 1, rate, frames_per_buffer=rate // 50)
+    output.open(pa)
+    t = np.arange(rate, dtype=np.float32) / rate
+    tone = (0.1 * np.sin(2 * np.pi * 440.0 * t) * 32767).astype(np.int16)
+
+    start = time.time()
+    for piece in np.array_split(tone, 20):
+        output.write(piece)
+    output.end_of_audio()
+    output.drain(timeout=2.0)
+    print(f"played {output.played_seconds():.3f}s of 1.000s in {time.time() - start:.3f}s, "
+          f"output latency {output.output_latency() * 1000:.1f} ms, {output.underruns} underruns")
+
+    # a producer that is too slow: 50 ms pieces every 80 ms
+    for piece in np.array_split(tone, 20):
+        output.write(piece)
+        time.sleep(0.08)
+    output.end_of_audio()
+    output.drain(timeout=2.0)
+    print(f"slow producer: {output.underruns} underruns, {output.underrun_frames / rate * 1000:.0f} ms of silence")
+
+    output.write(np.tile(tone, 2)[:int(0.1 * rate)])
+    before = output.played_frames
+    flushed_at = time.time()
+    output.flush()
+    while output.buffered_frames() > 0:
+        time.sleep(0.001)
+    print(f"flush: queue dropped after {(time.time() - flushed_at) * 1000:.1f} ms "
+          f"(one period is {output.frames_per_buffer / rate * 1000:.0f} ms), "
+          f"{output.played_frames - before} frames played after flush()")
+    output.close()
+    pa.terminate()
@@ -4,12 +4,13 @@ This module defines a base framework for speech synthesis engines. It includes:
 - A BaseEngine abstract class (using a custom metaclass) that sets up default properties and common audio processing methods (such as applying fade-ins/outs and trimming silence) along with abstract methods for voice management and synthesis.
 """
 
-import torch.multiprocessing as mp
+import multiprocessing as mp
 from abc import ABCMeta, ABC
 from typing import Union
 import numpy as np
 import shutil
 import queue
+from .streaming_dsp import fade_ramp, first_above, last_above
 
 class TimingInfo:
     def __init__(self, start_time, end_time, word):
@@ -78,8 +79,7 @@ class BaseEngine(ABC, metaclass=BaseInitMeta):
         fade_samples = int(sample_rate * fade_duration_ms / 1000)
         if fade_samples == 0 or len(audio) < fade_samples:
             fade_samples = len(audio)
-        fade_in = np.linspace(0.0, 1.0, fade_samples)
-        audio[:fade_samples] *= fade_in
+        audio[:fade_samples] *= fade_ramp(fade_samples)
         return audio
 
     def apply_fade_out(self, audio: np.ndarray, sample_rate: int = -1, fade_duration_ms: int = 15) -> np.ndarray:
@@ -92,8 +92,8 @@ class BaseEngine(ABC, metaclass=BaseInitMeta):
         fade_samples = int(sample_rate * fade_duration_ms / 1000)
         if fade_samples == 0 or len(audio) < fade_samples:
             fade_samples = len(audio)
-        fade_out = np.linspace(1.0, 0.0, fade_samples)
-        audio[-fade_samples:] *= fade_out
+        if fade_samples:
+            audio[-fade_samples:] *= fade_ramp(fade_samples)[::-1]
         return audio
 
     def trim_silence_start(
@@ -116,10 +116,9 @@ class BaseEngine(ABC, metaclass=BaseInitMeta):
         """
         sample_rate = self.verify_sample_rate(sample_rate)
         trimmed = False
-        audio_data = audio_data.copy()
-        non_silent = np.where(np.abs(audio_data) > silence_threshold)[0]
-        if len(non_silent) > 0:
-            start_index = non_silent[0]
+        # slices are views; the only copy is the one apply_fade_in makes (or the final one below)
+        start_index = first_above(audio_data, silence_threshold)
+        if start_index is not None:
             if start_index > 0:
                 trimmed = True
             audio_data = audio_data[start_index:]
@@ -130,8 +129,8 @@ class BaseEngine(ABC, metaclass=BaseInitMeta):
             trimmed = True
 
         if trimmed:
-            audio_data = self.apply_fade_in(audio_data, sample_rate, fade_in_ms)
-        return audio_data
+            return self.apply_fade_in(audio_data, sample_rate, fade_in_ms)
+        return audio_data.copy()
 
     def trim_silence_end(
         self,
@@ -153,10 +152,9 @@ class BaseEngine(ABC, metaclass=BaseInitMeta):
         """
         sample_rate = self.verify_sample_rate(sample_rate)
         trimmed = False
-        audio_data = audio_data.copy()
-        non_silent = np.where(np.abs(audio_data) > silence_threshold)[0]
-        if len(non_silent) > 0:
-            end_index = non_silent[-1] + 1
+        last_index = last_above(audio_data, silence_threshold)
+        if last_index is not None:
+            end_index = last_index + 1
             if end_index < len(audio_data):
                 trimmed = True
             audio_data = audio_data[:end_index]
@@ -167,8 +165,8 @@ class BaseEngine(ABC, metaclass=BaseInitMeta):
             trimmed = True
 
         if trimmed:
-            audio_data = self.apply_fade_out(audio_data, sample_rate, fade_out_ms)
-        return audio_data
+            return self.apply_fade_out(audio_data, sample_rate, fade_out_ms)
+        return audio_data.copy()
 
     def verify_sample_rate(self, sample_rate: int) -> int:
         """
@@ -229,6 +227,21 @@ class BaseEngine(ABC, metaclass=BaseInitMeta):
         """
         self.stop_synthesis_event.clear()
 
+    def prefetch(self, text: str) -> bool:
+        """
+        Announces text that will be passed to synthesize() later, in the same order.
+
+        Engines that can render ahead (e.g. with several worker processes) start on it
+        right away; the default implementation does nothing.
+
+        Args:
+            text (str): Text that will be synthesized.
+
+        Returns:
+            bool: True if the engine started rendering the text ahead.
+        """
+        return False
+
     def get_voices(self):
         """
         Retrieves the voices available from the specific voice source.
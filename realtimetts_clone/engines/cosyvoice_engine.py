@@ -1,128 +1,469 @@
 import sys
 import os
-sys.path.append('third_party/CosyVoice')
-
-matcha_path = os.path.join(os.path.dirname(__file__), '..', '..', 'third_party', 'CosyVoice', 'third_party', 'Matcha-TTS')
-sys.path.append(matcha_path)
-
-print('\n'.join(sys.path))
 
 from .base_engine import BaseEngine
-import torch.multiprocessing as mp
+import multiprocessing as mp
 from threading import Lock
-from .safepipe import SafePipe
-from cosyvoice.cli.cosyvoice import CosyVoice2
-from cosyvoice.utils.file_utils import load_wav
+import collections
+import hashlib
+import logging
+import time
+from .shm_ring import SharedAudioRing, WireFormatConverter
+from .streaming_dsp import StreamingPostProcessor
+from .synthesis_pool import SynthesisPool, SynthesisJob
+from .phrase_cache import PhraseAudioCache
+from .word_timing import WordTimingEstimator
 import numpy as np
 import pyaudio
 
 os.environ["TQDM_DISABLE"] = "1"
 
+_REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
 class CosyvoiceEngine(BaseEngine):
     """
     Class to handle the TTS model CosyVoice2.
     Internal States:
-    - model_path: path to local model
-    - prompt_speech_16k: the wav file to be used for voice cloning
+    - model_path: path to local model ("fake:rtf=<x>" runs the CPU stand-in from fake_cosyvoice.py)
+    - prompt_speech: the wav file to be used for voice cloning
     - prompt_text: text to be voiced
+    - reference_id: id of the cloning reference used for the next generation
+    - _references: reference id -> (wav path, prompt text) for every reference seen so far
+    - sample_format: "int16" or "float32", the format chunks are written in by the worker
+    - postprocess: StreamingPostProcessor keyword arguments for the workers (trim, fades, loudness), None disables it
+    - word_timing: WordTimingEstimator filling self.timings while chunks arrive, None when word timings are off
+    - worker_sample_rate: shared value, set by the workers to the model's sample rate once it is loaded
+    - _stream_info: (format, channels, rate) tuple, fixed once the workers are up
+    - ring_capacity: size in bytes of the shared-memory ring that carries the audio chunks
+    - num_workers: number of synthesis processes, each with its own copy of the model
+    - pool: the SynthesisPool running the worker processes (shared with the engines made by new_session())
+    - session: this engine's session slot in the pool
+    - max_sessions: number of engines that can share the pool
+    - _shared: the engine whose pool, phrase cache and counters are used, None for the engine that owns them
+    - hang_timeout: seconds a busy worker may stay silent before the pool's watchdog replaces it
+    - standby: whether the pool keeps an extra loaded worker to take over a failed one at once
+    - phrase_cache: PhraseAudioCache for short repeated phrases, None when disabled
+    - use_phrase_cache: False makes synthesize() and prefetch() bypass the phrase cache (neither look up nor store),
+      for warm-ups that must reach a worker
+    - cancel_generation: shared array of one counter per session, the worker abandons every generation id of
+      session s <= cancel_generation[s]
+    - last_cancel_latency: seconds from the last stop() until the worker was free again
+    - _generation: id of the most recent synthesize request
+    - _prefetched: jobs submitted ahead by prefetch(), in the order they will be played
+    - _jobs_lock: lock around the generation counter and _prefetched
     - _synthesize_lock: lock that controls so theres only one generation at a time?
     """
-    def __init__(self, model_path, prompt_speech, prompt_text):
+    def __init__(self, model_path, prompt_speech, prompt_text, sample_format="int16", ring_capacity=8 * 1024 * 1024, num_workers=1,
+                 phrase_cache_dir=None, phrase_cache_max_mb=64, phrase_cache_max_chars=40, postprocess=None,
+                 word_timings=False, hang_timeout=10.0, standby=False, max_sessions=8, shared=None):
         super().__init__()
         self.model_path = model_path
-        # load prompt audio at 16k
-        self.prompt_speech_16k = load_wav(prompt_speech, 16000)
+        if sample_format not in ("float32", "int16"):
+            raise ValueError(f"Unsupported sample format: {sample_format}")
+        self.sample_format = sample_format
+        self.postprocess = dict(postprocess) if postprocess is not None else None
+        # CosyVoice reports no token durations: words are placed by an estimate (only when someone consumes them)
+        self.word_timing = WordTimingEstimator() if word_timings else None
+        self.ring_capacity = ring_capacity
+        self.num_workers = max(1, int(num_workers))
+        self.hang_timeout = hang_timeout
+        self.standby = standby
+        self.max_sessions = max_sessions
+        self._shared = shared
+        self.session = 0
+        self.phrase_cache = None
+        self.use_phrase_cache = True
+        if shared is not None:
+            self.phrase_cache = shared.phrase_cache
+        elif phrase_cache_dir:
+            model_version = f"{os.path.basename(os.path.normpath(model_path))}-{sample_format}"
+            if self.postprocess is not None:
+                # cached audio is post-processed, so other settings must not reuse it
+                settings = repr(sorted(self.postprocess.items())).encode("utf-8")
+                model_version += f"-pp{hashlib.sha1(settings).hexdigest()[:8]}"
+            self.phrase_cache = PhraseAudioCache(
+                phrase_cache_dir, model_version,
+                max_bytes=int(phrase_cache_max_mb * 1024 * 1024),
+                max_chars=phrase_cache_max_chars,
+            )
+        if shared is not None:
+            self.cancel_generation = shared.cancel_generation
+            self.worker_sample_rate = shared.worker_sample_rate
+        else:
+            self.cancel_generation = mp.Array('q', max(1, int(max_sessions)), lock=False)
+            self.worker_sample_rate = mp.Value('i', 0, lock=False)
+        self._stream_info = None
+        self.last_cancel_latency = None
+        self._generation = 0
+        self._cancel_requested_at = None
+        self._prefetched = collections.deque()
+        self._jobs_lock = Lock()
+        self.prompt_speech = prompt_speech
         self.prompt_text = prompt_text
+        self._references = {}
+        self.default_reference_id = self._add_reference(prompt_speech, prompt_text)
+        self.reference_id = self.default_reference_id
         self._synthesize_lock = Lock()
-        self.post_init()
+        # post_init() (which spawns the workers) is called by BaseInitMeta once __init__ returned
+
+    @staticmethod
+    def make_reference_id(path, prompt_text=None):
+        """
+        Stable id for a cloning reference, e.g. 'angry-1a2b3c4d'. The wav's size and modification time are part
+        of it, so a voice file replaced in place gets a new id (and no audio cached for the old one).
+        """
+        name = os.path.splitext(os.path.basename(path))[0]
+        try:
+            stat = os.stat(path)
+            version = f"{stat.st_size}-{stat.st_mtime_ns}"
+        except OSError:
+            version = ""  # the worker reports the missing file when it loads the reference
+        key = f"{os.path.normpath(path)}|{version}|{prompt_text or ''}"
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return f"{name}-{digest[:8]}"
+
+    def _add_reference(self, path, prompt_text=None):
+        """Remember a cloning reference and return its id."""
+        reference_id = self.make_reference_id(path, prompt_text)
+        self._references[reference_id] = (path, prompt_text or "")
+        return reference_id
+
+    def _reference_payload(self, reference_id):
+        """What a worker needs to register a reference it has not seen yet."""
+        path, prompt_text = self._references[reference_id]
+        return {"path": path, "prompt_text": prompt_text}
 
     def set_cloning_reference(self, path, prompt_text=None):
-        """Set the voice cloning path and prompt text for new generation."""
-        self.prompt_speech_16k = load_wav(path, 16000)
-        if prompt_text:
-            self.prompt_text = prompt_text
-        else:
-            self.prompt_text = ""  # fallback
+        """
+        Set the voice cloning path and prompt text for new generation.
+        The prompt audio is only loaded (and its features extracted) by the worker,
+        the first time a generation uses this reference.
+        """
+        self.reference_id = self._add_reference(path, prompt_text)
+        self.prompt_speech = path
+        self.prompt_text = prompt_text or ""  # fallback
 
     def post_init(self):
-        """Start the engine."""
+        """Start the engine (an engine made by new_session() uses the running pool)."""
         self.engine_name = "cosyvoice"
-        self.create_worker_process()
+        if self._shared is not None:
+            self.pool = self._shared.pool
+            self._stream_info = self._shared.get_stream_info()
+        else:
+            self.create_worker_process()
+        self.session = self.pool.open_session()
+
+    def new_session(self, word_timings=False):
+        """
+        Another engine for one more conversation in this process. It renders on the same worker pool (and
+        phrase cache), with its own audio queue, cloning reference, prefetched jobs and cancellation.
+        """
+        default_path, default_text = self._references[self.default_reference_id]
+        return CosyvoiceEngine(self.model_path, default_path, default_text, sample_format=self.sample_format,
+                               num_workers=self.num_workers, postprocess=self.postprocess, word_timings=word_timings,
+                               shared=self)
 
     def get_stream_info(self):
         """Get the information needed by the TextToAudioStream playback function."""
-        # fallback if cosvoice not initialised
-        sr = 16000
-        if hasattr(self, "cosyvoice") and hasattr(self.cosyvoice, "sample_rate"):
-            sr = self.cosyvoice.sample_rate
-        return pyaudio.paFloat32, 1, sr
+        if self._stream_info is None:
+            # CosyVoice2 renders 24 kHz, used until a worker reported the model's rate
+            sr = self.worker_sample_rate.value or 24000
+            format = pyaudio.paInt16 if self.sample_format == "int16" else pyaudio.paFloat32
+            return format, 1, sr
+        return self._stream_info
 
 
     def create_worker_process(self):
-        """Create the worker thread for cosyvoice."""
-        self.parent_synthesize_pipe, child_pipe = SafePipe()
-        self.main_ready_event = mp.Event()
-        self.synthesize_process = mp.Process(
+        """Create the worker processes for cosyvoice (loaded in parallel)."""
+        default_path, default_text = self._references[self.default_reference_id]
+        self.pool = SynthesisPool(
             target=CosyvoiceEngine._synthesize_worker,
-            args=(child_pipe, self.main_ready_event,
-                  self.model_path, self.prompt_speech_16k, self.prompt_text)
+            worker_args=(self.model_path, self.default_reference_id, default_path, default_text, self.sample_format,
+                         self.postprocess, self.worker_sample_rate),
+            initial_references=[self.default_reference_id],
+            num_workers=self.num_workers,
+            ring_capacity=self.ring_capacity,
+            cancel_generation=self.cancel_generation,
+            reference_payload=self._reference_payload,
+            hang_timeout=self.hang_timeout,
+            standby=self.standby,
+        )
+        self.pool.start()
+        self._stream_info = self.get_stream_info()
+
+    @staticmethod
+    def _prepare_worker_imports():
+        """
+        Make CosyVoice, Matcha-TTS and the offline modelscope models importable. Only the worker processes
+        need them, so the parent never pays for torch / CosyVoice imports.
+        """
+        for path in (os.path.join(_REPO_ROOT, 'third_party', 'CosyVoice'),
+                     os.path.join(_REPO_ROOT, 'third_party', 'CosyVoice', 'third_party', 'Matcha-TTS')):
+            if path not in sys.path:
+                sys.path.append(path)
+        from lib.offline_modelscope import install_offline_modelscope
+        install_offline_modelscope(os.path.join(_REPO_ROOT, 'third_party'))
+
+        import warnings
+        warnings.filterwarnings(
+            "ignore",
+            category=UserWarning,
+            module=r"transformers\.integrations\.sdpa_attention",
+            message=r".*not compiled with flash attention.*",
+        )
+        warnings.filterwarnings(
+            "ignore",
+            category=FutureWarning,
+            module=r"cosyvoice\.cli\.model",
+            message=r".*is deprecated. Please use.*",
         )
-        self.synthesize_process.start()
-        self.main_ready_event.wait()
 
     @staticmethod
-    def _synthesize_worker(conn, ready_event, model_path, prompt_speech_16k, prompt_text):
-        """Synthesize worker thread for cosyvoice."""
+    def _load_model(model_path):
+        """Load CosyVoice2 (or the CPU stand-in for "fake:" paths) inside the worker process."""
+        if model_path.startswith("fake:"):
+            from .fake_cosyvoice import FakeCosyVoice2
+            return FakeCosyVoice2.from_model_path(model_path)
+        CosyvoiceEngine._prepare_worker_imports()
+        from cosyvoice.cli.cosyvoice import CosyVoice2
+        return CosyVoice2(model_path, load_jit=False, load_trt=False, load_vllm=False, fp16=True)
+
+    @staticmethod
+    def _register_reference(model, reference_id, path, prompt_text):
+        """Extract the prompt features (speech tokens, speaker embedding, mel) once and cache them in the model."""
+        if getattr(model, "is_fake", False):
+            prompt_speech_16k = path
+        else:
+            from cosyvoice.utils.file_utils import load_wav
+            prompt_speech_16k = load_wav(path, 16000)
+        model.add_zero_shot_spk(prompt_text, prompt_speech_16k, reference_id)
+
+    @staticmethod
+    def _synthesize_worker(conn, ready_event, model_path, reference_id, prompt_speech, prompt_text, sample_format,
+                           postprocess, sample_rate, ring_name, ring_capacity, cancel_generation):
+        """
+        Synthesize worker thread for cosyvoice.
+        Every message sent back is (status, generation, payload) so the parent can drop
+        leftovers of generations it has already abandoned.
+        """
+        ring = SharedAudioRing.attach(ring_name, ring_capacity)
         # instantiate CosyVoice2 once in worker
-        model = CosyVoice2(model_path, load_jit=False, load_trt=False, load_vllm=False, fp16=True)
+        model = CosyvoiceEngine._load_model(model_path)
+        CosyvoiceEngine._register_reference(model, reference_id, prompt_speech, prompt_text)
+        sample_rate.value = int(model.sample_rate)
+        # converts into buffers reused for every chunk; the ring copies each result out right away
+        converter = WireFormatConverter(sample_format)
+        # trims, fades and levels each sentence chunk by chunk; it learns every reference's loudness as it goes
+        post = StreamingPostProcessor(model.sample_rate, **postprocess) if postprocess is not None else None
         ready_event.set()
 
         while True:
             msg = conn.recv()
             if msg["command"] == "shutdown":
+                ring.close()
                 break
             elif msg["command"] == "synthesize":
                 text = msg["data"]["text"]
-                updatedSpeech = msg["data"]["prompt_speech_16k"]
-                updatedText = msg["data"]["prompt_text"]
+                reference_id = msg["data"]["reference_id"]
+                generation = msg["data"]["generation"]
+                session = msg["data"].get("session", 0)
+
+                def cancelled():
+                    return cancel_generation[session] >= generation
+
+                if cancelled():  # stopped before we got to it
+                    conn.send(("cancelled", generation, ""))
+                    continue
+
+                # First use of this reference: cache its prompt features under its id
+                reference = msg["data"].get("reference")
+                if reference is not None:
+                    CosyvoiceEngine._register_reference(model, reference_id, reference["path"], reference["prompt_text"])
 
-                # Streaming inference
-                for output in model.inference_zero_shot(
+                # Streaming inference on the cached prompt features
+                outputs = model.inference_zero_shot(
                     tts_text=text,
-                    prompt_text=updatedText,
-                    prompt_speech_16k=updatedSpeech,
+                    prompt_text="",
+                    prompt_speech_16k="",
+                    zero_shot_spk_id=reference_id,
                     stream=True
-                ):
-                    audio_tensor = output['tts_speech']
-                    audio = audio_tensor.numpy().astype(np.float32)  # (1, n_samples)
-                    audio_bytes = audio.tobytes()
-                    conn.send(("chunk", audio_bytes))  # send each chunk immediately
+                )
+                def send(samples):
+                    """Convert and send one chunk; False if the generation was cancelled meanwhile."""
+                    if len(samples) == 0:
+                        return True
+                    audio = converter.convert(samples)  # flat view of the converter's buffer
+                    descriptor = ring.write(audio, should_abort=cancelled)
+                    if descriptor is not None:
+                        conn.send(("chunk", generation, descriptor))  # send each chunk immediately
+                    elif cancelled():
+                        return False
+                    else:
+                        conn.send(("chunk_bytes", generation, audio.tobytes()))  # larger than the ring or consumer stalled
+                    return True
+
+                if post is not None:
+                    post.begin(reference_id)
+                status = "finished"
+                for output in outputs:
+                    # cancellation point between streamed chunks
+                    if cancelled():
+                        status = "cancelled"
+                        break
+                    samples = output['tts_speech']
+                    if post is not None:
+                        samples = post.process(samples)
+                    if not send(samples):
+                        status = "cancelled"
+                        break
+                # stop the remaining flow/vocoder steps of an abandoned generation
+                outputs.close()
+                if status == "finished" and post is not None and not send(post.finish()):
+                    status = "cancelled"
 
                 # after loop ends
-                conn.send(("finished", ""))
+                conn.send((status, generation, ""))
     
 
+    def _submit(self, text, reference_id=None, use_cache=True):
+        """
+        Create a job for text with the current (or the given) reference (caller holds _jobs_lock).
+        Phrases found in the phrase cache are answered right away, everything else is queued in the pool.
+        """
+        self._generation = self.pool.next_generation()
+        job = SynthesisJob(self._generation, text, reference_id or self.reference_id, self.session)
+        use_cache = use_cache and self.use_phrase_cache and self.phrase_cache is not None
+        cached = self.phrase_cache.get(text, job.reference_id) if use_cache else None
+        if cached is not None:
+            job.from_cache = True
+            job.chunks.put(("chunk", cached))
+            job.chunks.put(("finished", None))
+        else:
+            self.pool.submit(job)
+        return job
+
+    def prefetch(self, text: str) -> bool:
+        """Start rendering text ahead of its synthesize() call, on the next idle worker."""
+        with self._jobs_lock:
+            self._prefetched.append(self._submit(text))
+        return True
+
+    def _take_job(self, text):
+        """Return the prefetched job for text, or submit a new one."""
+        with self._jobs_lock:
+            if self._prefetched:
+                job = self._prefetched.popleft()
+                if job.text == text and job.reference_id == self.reference_id:
+                    return job
+                # the caller went out of order (or switched voice): nothing prefetched is usable
+                self._prefetched.clear()
+                self.cancel_generation[self.session] = self._generation
+                self.pool.drop_pending(self.session)
+            return self._submit(text)
+
     def synthesize(self, text: str):
         """Synthesize audio without a worker."""
+        super().synthesize(text)
         try:
-            # streaming inference
+            # streaming inference; jobs are consumed in order so audio stays in order
             with self._synthesize_lock:
-                self.parent_synthesize_pipe.send({
-                    "command": "synthesize",
-                    "data": {
-                        "text": text,
-                        "prompt_speech_16k": self.prompt_speech_16k,
-                        "prompt_text": self.prompt_text
-                    }
-                })
+                job = self._take_job(text)
+                # keep a copy of short phrases so the next occurrence skips the GPU
+                rendered = [] if self.phrase_cache and self.use_phrase_cache and not job.from_cache \
+                    and self.phrase_cache.accepts(text) else None
+                format, channels, rate = self.get_stream_info()
+                bytes_per_second = rate * channels * (2 if format == pyaudio.paInt16 else 4)
+                if self.word_timing is not None:
+                    self.word_timing.begin(text, self.audio_duration)
                 while True:
-                    status, result = self.parent_synthesize_pipe.recv()
+                    status, chunk = job.chunks.get()
                     if status == "chunk":
-                        self.queue.put(result)  # streaming audio chunk
+                        if self.cancel_generation[self.session] < job.generation:
+                            seconds = len(chunk) / bytes_per_second
+                            if self.word_timing is not None:
+                                # timings go out before the chunk they start in, so players see them in time
+                                for timing in self.word_timing.on_audio(seconds):
+                                    self.timings.put(timing)
+                            self.audio_duration += seconds
+                            self.queue.put(chunk)  # streaming audio chunk
+                            if rendered is not None:
+                                rendered.append(chunk)
+                        else:
+                            rendered = None
                     elif status == "finished":
+                        if self.word_timing is not None:
+                            for timing in self.word_timing.finish():
+                                self.timings.put(timing)
+                        if rendered:
+                            self.phrase_cache.put(text, job.reference_id, b"".join(rendered), job.synthesis_seconds() or 0.0)
                         break
+                    elif status == "cancelled":
+                        self._on_generation_cancelled(job.generation)
+                        break
+                    elif status == "failed":
+                        # the worker died or hung after part of the audio was played; the rest is lost
+                        logging.warning(f"cosyvoice worker failed while rendering \"{text}\"")
+                        return False
         except Exception as e:
             return False # needs to return False on failure.
 
-        # Needs to return True on success!
+        # Needs to return True on success! (a cancelled generation is not a failure)
         return True
+
+    def render_clip(self, text, path=None, prompt_text=None, use_cache=True):
+        """
+        Synthesize text completely, without going through the playback queue, and return the audio bytes
+        in the wire sample format (None if the generation was cancelled).
+        Used for short clips held in memory, e.g. the filler bank. path/prompt_text select the cloning
+        reference, the current one is used by default; the current reference is not changed.
+        use_cache=False always renders on a worker and leaves the phrase cache alone (warm-ups).
+        """
+        reference_id = self._add_reference(path, prompt_text) if path else self.reference_id
+        with self._jobs_lock:
+            job = self._submit(text, reference_id, use_cache)
+        rendered = []
+        while True:
+            status, chunk = job.chunks.get()
+            if status == "chunk":
+                rendered.append(chunk)
+            elif status == "finished":
+                break
+            else:
+                return None
+        audio = b"".join(rendered)
+        if self.phrase_cache and use_cache and not job.from_cache:
+            self.phrase_cache.put(text, reference_id, audio, job.synthesis_seconds() or 0.0)
+        return audio
+
+    def _on_generation_cancelled(self, generation):
+        """Record how long the worker took to become free after stop()."""
+        if self._cancel_requested_at is None:
+            return
+        self.last_cancel_latency = time.time() - self._cancel_requested_at
+        self._cancel_requested_at = None
+        logging.debug(f"cosyvoice generation {generation} cancelled, worker free after {self.last_cancel_latency * 1000:.1f} ms")
+
+    def stop(self):
+        """Abandon every generation in flight or prefetched; workers stop at the next chunk boundary."""
+        super().stop()
+        with self._jobs_lock:
+            self._cancel_requested_at = time.time()
+            self.cancel_generation[self.session] = self._generation
+            self._prefetched.clear()
+            self.pool.drop_pending(self.session)
+
+    def shutdown(self):
+        """Stop the worker processes and free the shared audio rings (an engine made by new_session() only leaves the pool)."""
+        self.stop()
+        if self._shared is not None:
+            self.pool.close_session(self.session)
+            return
+        self.pool.shutdown()
+        for failover in self.pool.failovers:
+            print(f"Synthesis worker {failover['worker']} failed ({failover['reason']}), serving again after "
+                  f"{failover['recovery_seconds'] * 1000:.0f} ms{' (standby)' if failover['standby'] else ''}")
+        if self.phrase_cache:
+            self.phrase_cache.close()
+            stats = self.phrase_cache.stats()
+            print(f"Phrase cache: {stats['hits']} hits / {stats['hits'] + stats['misses']} lookups "
+                  f"({stats['hit_rate'] * 100:.0f}%), {stats['gpu_seconds_saved']:.1f} GPU seconds saved")
@@ -0,0 +1,152 @@
+"""
+CPU stand-in for CosyVoice2, used to exercise the synthesis worker pool without a GPU or model weights.
+
+It mimics the parts of the CosyVoice2 API the engine uses (sample_rate, add_zero_shot_spk,
+inference_zero_shot with stream=True) and renders a quiet tone whose length follows the text,
+sleeping so that rendering runs at a chosen real-time factor (rtf = synthesis time / audio time).
+
+Select it with a model path of the form "fake:rtf=0.8" (see CosyvoiceEngine), or run this module
+to compare playback stalls of a 1-worker and a 3-worker pool, and the recovery from a crashed or hung
+worker with and without a standby ("fake:rtf=0.5,crash_at=3" kills the process at its third call).
+"""
+
+import os
+import numpy as np
+import time
+
+
+class FakeCosyVoice2:
+    """
+    Fake CosyVoice2 model.
+
+    Internal States:
+    - rtf: simulated real-time factor
+    - sample_rate: output sample rate
+    - chunk_seconds: audio duration of one streamed chunk
+    - seconds_per_char: audio duration rendered per input character
+    - spk2info: registered zero-shot speakers (ids only)
+    - crash_at / hang_at: inference call (counted per process) that exits the process / never returns, 0 for none
+    - load_seconds: simulated model loading time
+    - calls: inference calls so far
+    """
+    is_fake = True
+
+    def __init__(self, rtf: float = 0.5, sample_rate: int = 24000, chunk_seconds: float = 0.5, seconds_per_char: float = 0.065,
+                 crash_at: int = 0, hang_at: int = 0, load_seconds: float = 0.0):
+        self.rtf = rtf
+        self.sample_rate = sample_rate
+        self.chunk_seconds = chunk_seconds
+        self.seconds_per_char = seconds_per_char
+        self.crash_at = crash_at
+        self.hang_at = hang_at
+        self.calls = 0
+        self.spk2info = {}
+        time.sleep(load_seconds)
+
+    @classmethod
+    def from_model_path(cls, model_path: str) -> "FakeCosyVoice2":
+        """Build from a "fake:key=value,key=value" model path."""
+        kwargs = {}
+        spec = model_path.split(":", 1)[1] if ":" in model_path else ""
+        for item in filter(None, spec.split(",")):
+            key, value = item.split("=", 1)
+            kwargs[key.strip()] = float(value)
+        for key in ("sample_rate", "crash_at", "hang_at"):
+            if key in kwargs:
+                kwargs[key] = int(kwargs[key])
+        return cls(**kwargs)
+
+    def add_zero_shot_spk(self, prompt_text, prompt_speech_16k, zero_shot_spk_id):
+        self.spk2info[zero_shot_spk_id] = prompt_text
+        return True
+
+    def inference_zero_shot(self, tts_text, prompt_text, prompt_speech_16k, zero_shot_spk_id="", stream=False, speed=1.0, text_frontend=True):
+        self.calls += 1
+        if self.calls == self.crash_at:
+            os._exit(1)  # like a process killed by a CUDA error
+        if self.calls == self.hang_at:
+            while True:
+                time.sleep(3600)
+        total = max(self.chunk_seconds, len(tts_text) * self.seconds_per_char)
+        chunk_samples = int(self.chunk_seconds * self.sample_rate)
+        total_samples = int(total * self.sample_rate)
+        t = np.arange(total_samples, dtype=np.float32) / self.sample_rate
+        audio = (0.1 * np.sin(2 * np.pi * 220.0 * t)).astype(np.float32)
+        step = chunk_samples if stream else total_samples
+        for start in range(0, total_samples, step):
+            chunk = audio[start:start + step]
+            time.sleep(len(chunk) / self.sample_rate * self.rtf)
+            yield {"tts_speech": chunk.reshape(1, -1)}
+
+
+def _playback_stalls(engine, sentences, sample_rate):
+    """Play the engine's output in real time while it synthesizes; return (wall seconds, stalled seconds)."""
+    import queue
+    import threading
+
+    bytes_per_sample = 2 if engine.sample_format == "int16" else 4
+    done = threading.Event()
+    stalled = 0.0
+    start = time.time()
+
+    def player():
+        nonlocal stalled
+        started = False
+        wait_start = time.time()
+        while True:
+            try:
+                chunk = engine.queue.get(timeout=0.05)
+            except queue.Empty:
+                if done.is_set():
+                    return
+                continue
+            if started:
+                stalled += time.time() - wait_start
+            started = True
+            time.sleep(len(chunk) / bytes_per_sample / sample_rate)
+            wait_start = time.time()
+
+    thread = threading.Thread(target=player, daemon=True)
+    thread.start()
+    for sentence in sentences:
+        engine.prefetch(sentence)
+    for sentence in sentences:
+        engine.synthesize(sentence)
+    done.set()
+    thread.join()
+    return time.time() - start, stalled
+
+
+if __name__ == "__main__":
+    import sys
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+    from realtimetts_clone.engines.cosyvoice_engine import CosyvoiceEngine
+
+    # Rendering slower than real time (rtf 1.3): one worker falls behind on every sentence, while a pool
+    # renders the next sentences during playback and keeps ahead of the player.
+    rtf = 1.3
+    sentences = [
+        "I have been waiting here for over an hour and nobody has told me anything at all.",
+        "Where is my brother?",
+        "You keep saying you are looking into it, but what does that actually mean for us right now?",
+        "Please, just tell me the truth.",
+    ]
+    for num_workers in (1, 2, 3):
+        engine = CosyvoiceEngine(f"fake:rtf={rtf}", "wavs/reference_woman/Standard/neutral.wav", "", num_workers=num_workers)
+        wall, stalled = _playback_stalls(engine, sentences, FakeCosyVoice2().sample_rate)
+        print(f"workers={num_workers} rtf={rtf}: wall {wall:.2f}s, playback stalled {stalled:.2f}s")
+        engine.shutdown()
+
+    # Every worker fails at its second sentence: the watchdog notices (at once for a crash, after hang_timeout
+    # for a hang) and the sentence is rendered again by the standby or by a new worker once its model loaded
+    # (3 s here, tens of seconds for CosyVoice2), playback stalls meanwhile.
+    for fault in ("crash_at=2", "hang_at=2"):
+        for standby in (False, True):
+            engine = CosyvoiceEngine(f"fake:rtf=0.9,load_seconds=3,{fault}", "wavs/reference_woman/Standard/neutral.wav",
+                                     "", hang_timeout=1.0, standby=standby)
+            wall, stalled = _playback_stalls(engine, sentences, FakeCosyVoice2().sample_rate)
+            failovers = engine.pool.failovers
+            recovery = ", ".join(f"{f['reason']}: silent {f['silent_seconds']:.2f}s, serving again after "
+                                 f"{f['recovery_seconds'] * 1000:.0f} ms" for f in failovers)
+            print(f"{fault} standby={standby!s:>5}: wall {wall:.2f}s, playback stalled {stalled:.2f}s; {recovery}")
+            engine.shutdown()
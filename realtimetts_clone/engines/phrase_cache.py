@@ -0,0 +1,155 @@
+"""
+Persistent cache of synthesized audio for short, often repeated phrases ("What?", "Hello?").
+
+Entries are keyed on the normalized text, the cloning reference id and the model version
+(which includes the wire sample format), and stored as raw PCM files next to an index.json.
+The index keeps the entries in least-recently-used order; once the store grows past max_bytes
+the oldest entries are evicted.
+"""
+
+import collections
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class PhraseAudioCache:
+    """
+    On-disk LRU store of phrase audio.
+
+    Internal States:
+    - directory: folder holding index.json and the <key>.pcm files
+    - max_bytes: size bound of the stored audio
+    - max_chars: only phrases up to this many (normalized) characters are cached
+    - model_version: part of every key, so a model or format change never serves stale audio
+    - hits / misses: lookups since start
+    - gpu_seconds_saved: synthesis time recorded for the entries that were served from the cache
+    - _index: key -> {"bytes", "synthesis_seconds"}, in LRU order (oldest first)
+    - _total_bytes: sum of the stored entry sizes
+    - _lock: lock around the index and the counters
+    """
+    def __init__(self, directory: str, model_version: str, max_bytes: int = 64 * 1024 * 1024, max_chars: int = 40):
+        self.directory = directory
+        self.model_version = model_version
+        self.max_bytes = max_bytes
+        self.max_chars = max_chars
+        self.hits = 0
+        self.misses = 0
+        self.gpu_seconds_saved = 0.0
+        self._index = collections.OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Case and whitespace do not change the rendered audio; punctuation does, so it is kept."""
+        return _WHITESPACE.sub(" ", text).strip().lower()
+
+    def accepts(self, text: str) -> bool:
+        """Whether text is short enough to be cached."""
+        normalized = self.normalize(text)
+        return 0 < len(normalized) <= self.max_chars
+
+    def _key(self, text: str, reference_id: str) -> str:
+        raw = f"{self.model_version}|{reference_id}|{self.normalize(text)}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pcm")
+
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, "index.json")
+
+    def _load_index(self):
+        try:
+            with open(self._index_path(), "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        for key, entry in entries:
+            if os.path.exists(self._path(key)):
+                self._index[key] = entry
+                self._total_bytes += entry["bytes"]
+
+    def _save_index(self):
+        tmp_path = self._index_path() + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(list(self._index.items()), f)
+        os.replace(tmp_path, self._index_path())
+
+    def get(self, text: str, reference_id: str):
+        """Return the stored audio bytes for text rendered with reference_id, or None."""
+        if not self.accepts(text):
+            return None
+        key = self._key(text, reference_id)
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            try:
+                with open(self._path(key), "rb") as f:
+                    audio = f.read()
+            except OSError:
+                self._total_bytes -= entry["bytes"]
+                del self._index[key]
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+            self.hits += 1
+            self.gpu_seconds_saved += entry["synthesis_seconds"]
+            return audio
+
+    def put(self, text: str, reference_id: str, audio: bytes, synthesis_seconds: float):
+        """Store the audio of a complete rendering, evicting least recently used entries if needed."""
+        if not self.accepts(text) or not audio or len(audio) > self.max_bytes:
+            return
+        key = self._key(text, reference_id)
+        with self._lock:
+            try:
+                with open(self._path(key), "wb") as f:
+                    f.write(audio)
+            except OSError as e:
+                logging.warning(f"phrase cache: could not store '{text}': {e}")
+                return
+            old = self._index.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old["bytes"]
+            self._index[key] = {"bytes": len(audio), "synthesis_seconds": synthesis_seconds}
+            self._total_bytes += len(audio)
+            while self._total_bytes > self.max_bytes and self._index:
+                evicted_key, evicted = self._index.popitem(last=False)
+                self._total_bytes -= evicted["bytes"]
+                try:
+                    os.remove(self._path(evicted_key))
+                except OSError:
+                    pass
+            self._save_index()
+
+    def stats(self) -> dict:
+        """Hit rate, GPU seconds saved and store size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "gpu_seconds_saved": self.gpu_seconds_saved,
+                "entries": len(self._index),
+                "bytes": self._total_bytes,
+            }
+
+    def close(self):
+        """Persist the LRU order."""
+        with self._lock:
+            try:
+                self._save_index()
+            except OSError:
+                pass
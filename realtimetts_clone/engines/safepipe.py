@@ -23,154 +23,92 @@ except RuntimeError as e:
 class ParentPipe:
     """
     A thread-safe wrapper around the 'parent end' of a multiprocessing pipe.
-    All actual pipe operations happen in a dedicated worker thread, so it's safe
-    for multiple threads to call send(), recv(), or poll() on the same ParentPipe
-    without interfering.
+    Threads call the pipe directly: one lock serializes send() and another serializes recv() / poll(), so
+    several threads can share the ParentPipe without interleaving messages, while a thread waiting for data
+    never holds up a send. The two directions of a Connection are independent, so a send can go out while
+    another thread is blocked in poll() or recv().
+
+    Internal States:
+    - _pipe: the raw parent end
+    - _send_lock: held while a message is written
+    - _recv_lock: held while the pipe is polled or a message is read
+    - _closed: set once close() was called or the other end went away
     """
     def __init__(self, parent_synthesize_pipe):
         self.name = "ParentPipe"
         self._pipe = parent_synthesize_pipe  # The raw pipe.
         self._closed = False  # A flag to mark if close() has been called.
-
-        # The request queue for sending operations to the worker.
-        self._request_queue = queue.Queue()
-
-        # This event signals the worker thread to stop.
-        self._stop_event = threading.Event()
-
-        # Worker thread that executes actual .send(), .recv(), .poll() calls.
-        self._worker_thread = threading.Thread(
-            target=self._pipe_worker,
-            name=f"{self.name}_Worker",
-            daemon=True
-        )
-        self._worker_thread.start()
-
-    def _pipe_worker(self):
-        while not self._stop_event.is_set():
-            try:
-                request = self._request_queue.get(timeout=0.1)
-            except queue.Empty:
-                continue
-
-            if request["type"] == "CLOSE":
-                # Exit worker loop on CLOSE request.
-                break
-
-            try:
-                if request["type"] == "SEND":
-                    data = request["data"]
-                    logger.debug("[%s] Worker: sending => %s", self.name, data)
-                    self._pipe.send(data)
-                    request["result_queue"].put(None)
-
-                elif request["type"] == "RECV":
-                    logger.debug("[%s] Worker: receiving...", self.name)
-                    data = self._pipe.recv()
-                    request["result_queue"].put(data)
-
-                elif request["type"] == "POLL":
-                    timeout = request.get("timeout", 0.1)
-                    logger.debug("[%s] Worker: poll() with timeout: %s", self.name, timeout)
-                    result = self._pipe.poll(timeout)
-                    request["result_queue"].put(result)
-
-            except (EOFError, BrokenPipeError, OSError) as e:
-                # When the other end has closed or an error occurs,
-                # log and notify the waiting thread.
-                logger.debug("[%s] Worker: pipe closed or error occurred (%s). Shutting down.", self.name, e)
-                request["result_queue"].put(None)
-                break
-
-            except Exception as e:
-                logger.exception("[%s] Worker: unexpected error.", self.name)
-                request["result_queue"].put(e)
-                break
-
-        logger.debug("[%s] Worker: stopping.", self.name)
-        try:
-            self._pipe.close()
-        except Exception as e:
-            logger.debug("[%s] Worker: error during pipe close: %s", self.name, e)
+        self._send_lock = threading.Lock()
+        self._recv_lock = threading.Lock()
 
     def send(self, data):
         """
-        Synchronously asks the worker thread to perform .send().
+        Sends data; does nothing once the pipe is closed.
         """
         if self._closed:
             logger.debug("[%s] send() called but pipe is already closed", self.name)
             return
-        logger.debug("[%s] send() requested with: %s", self.name, data)
-        result_queue = queue.Queue()
-        request = {
-            "type": "SEND",
-            "data": data,
-            "result_queue": result_queue
-        }
-        self._request_queue.put(request)
-        result_queue.get()  # Wait until sending completes.
-        logger.debug("[%s] send() completed", self.name)
+        logger.debug("[%s] send() with: %s", self.name, data)
+        with self._send_lock:
+            try:
+                self._pipe.send(data)
+            except (EOFError, BrokenPipeError, OSError) as e:
+                logger.debug("[%s] send(): pipe closed or error occurred (%s).", self.name, e)
+                self._closed = True
 
     def recv(self):
         """
-        Synchronously asks the worker to perform .recv() and returns the data.
+        Blocks until a message arrives and returns it; None once the pipe is closed.
         """
         if self._closed:
             logger.debug("[%s] recv() called but pipe is already closed", self.name)
             return None
-        logger.debug("[%s] recv() requested", self.name)
-        result_queue = queue.Queue()
-        request = {
-            "type": "RECV",
-            "result_queue": result_queue
-        }
-        self._request_queue.put(request)
-        data = result_queue.get()
-
-        # Log a preview for huge byte blobs.
-        if isinstance(data, tuple) and len(data) == 2 and isinstance(data[1], bytes):
-            data_preview = (data[0], f"<{len(data[1])} bytes>")
-        else:
-            data_preview = data
-        logger.debug("[%s] recv() returning => %s", self.name, data_preview)
+        with self._recv_lock:
+            try:
+                data = self._pipe.recv()
+            except (EOFError, BrokenPipeError, OSError) as e:
+                logger.debug("[%s] recv(): pipe closed or error occurred (%s).", self.name, e)
+                self._closed = True
+                return None
+
+        if logger.isEnabledFor(logging.DEBUG):
+            # Log a preview for huge byte blobs.
+            if isinstance(data, tuple) and len(data) == 3 and isinstance(data[2], bytes):
+                data_preview = (data[0], data[1], f"<{len(data[2])} bytes>")
+            else:
+                data_preview = data
+            logger.debug("[%s] recv() returning => %s", self.name, data_preview)
         return data
 
     def poll(self, timeout=0.05):
         """
-        Synchronously checks whether data is available.
-        Returns True if data is ready, or False otherwise.
+        Returns True if a message is ready within timeout seconds, False otherwise.
+        Like Connection.poll(), a closed pipe polls True: the following recv() reports the end (None).
         """
         if self._closed:
-            return False
-        logger.debug("[%s] poll() requested with timeout: %s", self.name, timeout)
-        result_queue = queue.Queue()
-        request = {
-            "type": "POLL",
-            "timeout": timeout,
-            "result_queue": result_queue
-        }
-        self._request_queue.put(request)
-        try:
-            # Use a slightly longer timeout to give the worker a chance.
-            result = result_queue.get(timeout=timeout + 0.05)
-        except queue.Empty:
-            result = False
-        logger.debug("[%s] poll() returning => %s", self.name, result)
-        return result
+            return True
+        with self._recv_lock:
+            try:
+                return self._pipe.poll(timeout)
+            except (EOFError, BrokenPipeError, OSError) as e:
+                logger.debug("[%s] poll(): pipe closed or error occurred (%s).", self.name, e)
+                self._closed = True
+                return True
 
     def close(self):
         """
-        Closes the pipe and stops the worker thread. The _closed flag makes
-        sure no further operations are attempted.
+        Closes the pipe. The _closed flag makes sure no further operations are attempted;
+        a thread still blocked in recv() should be stopped before (poll() returns within its timeout).
         """
-        if self._closed:
+        if self._closed and self._pipe.closed:
             return
         logger.debug("[%s] close() called", self.name)
         self._closed = True
-        stop_request = {"type": "CLOSE", "result_queue": queue.Queue()}
-        self._request_queue.put(stop_request)
-        self._stop_event.set()
-        self._worker_thread.join()
+        with self._send_lock:
+            try:
+                self._pipe.close()
+            except Exception as e:
+                logger.debug("[%s] error during pipe close: %s", self.name, e)
         logger.debug("[%s] closed", self.name)
 
 
@@ -195,6 +133,32 @@ def child_process_code(child_end):
     child_end.close()
 
 
+def _echo_child(child_end):
+    """Benchmark child: sends every message back until it gets None."""
+    while True:
+        msg = child_end.recv()
+        if msg is None:
+            break
+        child_end.send(msg)
+    child_end.close()
+
+
+def _stream_child(child_end, chunk_bytes):
+    """Benchmark child: on (count, interval) streams count chunks like a synthesis worker, stamped with their send time."""
+    audio = b"\0" * chunk_bytes
+    while True:
+        msg = child_end.recv()
+        if msg is None:
+            break
+        count, interval = msg
+        for _ in range(count):
+            child_end.send(("chunk_bytes", time.perf_counter(), audio))
+            if interval:
+                time.sleep(interval)
+        child_end.send(("finished", time.perf_counter(), ""))
+    child_end.close()
+
+
 if __name__ == "__main__":
     parent_pipe, child_pipe = SafePipe()
 
@@ -242,4 +206,129 @@ if __name__ == "__main__":
     # Signal shutdown to any polling threads, then close the pipe.
     stop_polling_event.set()
     parent_pipe.close()
-    p.join()
\ No newline at end of file
+    p.join()
+
+    # Benchmarks, used the way SynthesisPool uses the pipe: a reader thread loops poll(0.01) / recv() while
+    # other threads send requests. Compares the previous ParentPipe, which ran every call on a worker thread
+    # and answered through a new queue per call, with the direct one.
+    class _QueuedParentPipe:
+        """The previous ParentPipe: every call is a request to one worker thread, answered through its own queue."""
+        def __init__(self, pipe):
+            self._pipe = pipe
+            self._requests = queue.Queue()
+            self._thread = threading.Thread(target=self._worker, daemon=True)
+            self._thread.start()
+
+        def _worker(self):
+            while True:
+                try:
+                    kind, arg, result = self._requests.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if kind == "CLOSE":
+                    break
+                try:
+                    if kind == "SEND":
+                        self._pipe.send(arg)
+                        result.put(None)
+                    elif kind == "RECV":
+                        result.put(self._pipe.recv())
+                    else:
+                        result.put(self._pipe.poll(arg))
+                except (EOFError, OSError):
+                    result.put(None)
+                    break
+            self._pipe.close()
+
+        def _call(self, kind, arg=None, timeout=None):
+            result = queue.Queue()
+            self._requests.put((kind, arg, result))
+            try:
+                return result.get(timeout=timeout)
+            except queue.Empty:
+                return False
+
+        def send(self, data):
+            self._call("SEND", data)
+
+        def recv(self):
+            return self._call("RECV")
+
+        def poll(self, timeout=0.05):
+            return self._call("POLL", timeout, timeout + 0.05)
+
+        def close(self):
+            self._requests.put(("CLOSE", None, None))
+            self._thread.join()
+
+    def _start(wrapper, target, *args):
+        parent_end, child_end = mp.Pipe()
+        process = mp.Process(target=target, args=(child_end, *args), daemon=True)
+        process.start()
+        return wrapper(parent_end), process
+
+    def _reader(pipe, on_message, stop):
+        while not stop.is_set():
+            if pipe.poll(0.01):
+                message = pipe.recv()
+                if message is None:
+                    break
+                on_message(message)
+
+    def _ms(values):
+        values = sorted(values)
+        return (f"mean {sum(values) / len(values) * 1000:6.3f} ms, p50 {values[len(values) // 2] * 1000:6.3f} ms, "
+                f"p99 {values[int(len(values) * 0.99)] * 1000:6.3f} ms")
+
+    def _bench_ping_pong(wrapper, rounds=500):
+        """Round trip of a small request sent while the reader thread polls."""
+        pipe, process = _start(wrapper, _echo_child)
+        answered, stop = threading.Event(), threading.Event()
+        reader = threading.Thread(target=_reader, args=(pipe, lambda _: answered.set(), stop), daemon=True)
+        reader.start()
+        times = []
+        for i in range(rounds):
+            answered.clear()
+            start = time.perf_counter()
+            pipe.send({"command": "ping", "data": i})
+            answered.wait()
+            times.append(time.perf_counter() - start)
+            time.sleep(0.002)  # let the reader go back to polling an idle pipe, as between jobs
+        pipe.send(None)
+        stop.set()
+        reader.join()
+        pipe.close()
+        process.join()
+        return times
+
+    def _bench_stream(wrapper, count, interval, chunk_bytes=9600):
+        """Send-to-receive latency of each chunk, and the time the whole stream took."""
+        pipe, process = _start(wrapper, _stream_child, chunk_bytes)
+        latencies, done, stop = [], threading.Event(), threading.Event()
+
+        def on_message(message):
+            latencies.append(time.perf_counter() - message[1])
+            if message[0] == "finished":
+                done.set()
+
+        reader = threading.Thread(target=_reader, args=(pipe, on_message, stop), daemon=True)
+        reader.start()
+        start = time.perf_counter()
+        pipe.send((count, interval))
+        done.wait()
+        elapsed = time.perf_counter() - start
+        pipe.send(None)
+        stop.set()
+        reader.join()
+        pipe.close()
+        process.join()
+        return latencies, elapsed
+
+    print()
+    for name, wrapper in (("queued ParentPipe", _QueuedParentPipe), ("direct ParentPipe", ParentPipe)):
+        print(f"{name:>17}: ping-pong        {_ms(_bench_ping_pong(wrapper))}")
+        latencies, _ = _bench_stream(wrapper, 400, 0.005)
+        print(f"{name:>17}: paced chunks     {_ms(latencies)} send -> received")
+        latencies, elapsed = _bench_stream(wrapper, 4000, 0)
+        print(f"{name:>17}: chunk burst      {len(latencies) / elapsed:8.0f} chunks/s of 9600 bytes, "
+              f"{_ms(latencies)} send -> received")
@@ -0,0 +1,282 @@
+"""
+Shared-memory audio ring buffer between a synthesis worker process and the parent.
+
+The worker (single producer) copies each synthesized chunk into the ring and sends only a
+small (position, nbytes) descriptor over the control pipe. The parent (single consumer) copies
+the chunk out and releases the space. Both sides keep a monotonically increasing byte counter
+in a small header at the start of the shared block:
+    - write_pos: total bytes written by the producer
+    - read_pos: total bytes released by the consumer
+so the ring needs no lock: each counter has exactly one writer.
+
+Running this module directly benchmarks the ring against pickling chunks through mp.Pipe, and the
+sample format conversion paths (allocations per chunk, CPU per second of audio).
+"""
+
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+import sys
+import time
+
+HEADER_BYTES = 16  # write_pos, read_pos as uint64
+
+
+class SharedAudioRing:
+    """
+    Single-producer / single-consumer byte ring living in a SharedMemory block.
+
+    Internal States:
+    - capacity: number of data bytes the ring can hold
+    - shm: the SharedMemory block (header + data)
+    - _counters: uint64 view on the header (write_pos, read_pos)
+    - _data: uint8 view on the data area
+    - _owner: whether this side created (and must unlink) the block
+    """
+    def __init__(self, shm: shared_memory.SharedMemory, capacity: int, owner: bool):
+        self.shm = shm
+        self.capacity = capacity
+        self._owner = owner
+        self._counters = np.ndarray((2,), dtype=np.uint64, buffer=shm.buf[:HEADER_BYTES])
+        self._data = np.ndarray((capacity,), dtype=np.uint8, buffer=shm.buf[HEADER_BYTES:HEADER_BYTES + capacity])
+
+    @classmethod
+    def create(cls, capacity: int = 8 * 1024 * 1024) -> "SharedAudioRing":
+        """Create a new ring (parent side)."""
+        shm = shared_memory.SharedMemory(create=True, size=HEADER_BYTES + capacity)
+        ring = cls(shm, capacity, owner=True)
+        ring._counters[:] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name: str, capacity: int) -> "SharedAudioRing":
+        """Attach to an existing ring by name (worker side)."""
+        if sys.version_info >= (3, 13):
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            # Before 3.13 attaching registers the block with the resource tracker. A worker started by this
+            # module's processes shares the parent's tracker, which holds the name once however often it is
+            # registered, so the parent's unlink() clears it (and a crashed parent still gets it unlinked).
+            shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, capacity, owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def free_bytes(self) -> int:
+        """Bytes the producer can write without overwriting unread data."""
+        return self.capacity - int(self._counters[0] - self._counters[1])
+
+    def write(self, data, timeout: float = 5.0, should_abort=None):
+        """
+        Copy data (bytes-like or ndarray) into the ring, waiting for space if needed.
+
+        Args:
+            data: chunk to write.
+            timeout (float): seconds to wait for the consumer to free space.
+            should_abort (Callable, optional): polled while waiting; returning True gives up.
+
+        Returns:
+            tuple: (position, nbytes) descriptor to send to the consumer, or None if the
+                   chunk could not be written (too large, timeout or aborted).
+        """
+        if isinstance(data, np.ndarray):
+            src = np.ascontiguousarray(data).reshape(-1).view(np.uint8)
+        else:
+            src = np.frombuffer(data, dtype=np.uint8)
+        nbytes = src.nbytes
+        if nbytes > self.capacity:
+            return None
+
+        start = time.time()
+        while self.free_bytes() < nbytes:
+            if should_abort is not None and should_abort():
+                return None
+            if time.time() - start > timeout:
+                return None
+            time.sleep(0.001)
+
+        position = int(self._counters[0])
+        offset = position % self.capacity
+        first = min(nbytes, self.capacity - offset)
+        self._data[offset:offset + first] = src[:first]
+        if first < nbytes:
+            self._data[:nbytes - first] = src[first:]
+        # publish only after the data is in place
+        self._counters[0] = position + nbytes
+        return position, nbytes
+
+    def read(self, position: int, nbytes: int) -> bytes:
+        """Copy a chunk described by (position, nbytes) out of the ring (does not release it)."""
+        offset = position % self.capacity
+        first = min(nbytes, self.capacity - offset)
+        if first == nbytes:
+            return self._data[offset:offset + nbytes].tobytes()
+        return self._data[offset:offset + first].tobytes() + self._data[:nbytes - first].tobytes()
+
+    def release(self, nbytes: int):
+        """Give nbytes of already consumed data back to the producer."""
+        self._counters[1] = int(self._counters[1]) + nbytes
+
+    def close(self):
+        """Detach from the shared block; the creating side also unlinks it."""
+        self._counters = None
+        self._data = None
+        try:
+            self.shm.close()
+        except Exception:
+            pass
+        if self._owner:
+            try:
+                self.shm.unlink()
+            except Exception:
+                pass
+
+
+class WireFormatConverter:
+    """
+    Converts float32 model output to the wire sample format inside the worker.
+    For int16 the samples are scaled, clipped and rounded into buffers that are reused for every chunk,
+    so the conversion allocates nothing once the largest chunk size was seen.
+
+    Internal States:
+    - sample_format: "float32" or "int16"
+    - _scratch: float32 work buffer
+    - _out: int16 output buffer, the returned arrays are views of it
+    """
+    def __init__(self, sample_format: str):
+        if sample_format not in ("float32", "int16"):
+            raise ValueError(f"Unsupported sample format: {sample_format}")
+        self.sample_format = sample_format
+        self._scratch = np.empty(0, dtype=np.float32)
+        self._out = np.empty(0, dtype=np.int16)
+
+    def convert(self, audio) -> np.ndarray:
+        """
+        Convert one chunk. The int16 result is only valid until the next call, so it has to be
+        copied out (e.g. into the ring) before converting the next chunk.
+        """
+        audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+        if self.sample_format == "float32":
+            return audio
+        n = audio.size
+        if self._scratch.size < n:
+            size = max(n, 2 * self._scratch.size)
+            self._scratch = np.empty(size, dtype=np.float32)
+            self._out = np.empty(size, dtype=np.int16)
+        scratch, out = self._scratch[:n], self._out[:n]
+        np.multiply(audio, 32767.0, out=scratch)
+        np.clip(scratch, -32768.0, 32767.0, out=scratch)
+        np.rint(scratch, out=scratch)
+        np.copyto(out, scratch, casting="unsafe")
+        return out
+
+
+def _bench_producer(conn, ring_name, capacity, use_ring, n_chunks, chunk_samples, sample_format):
+    """Benchmark worker: emits n_chunks of synthetic audio either via the ring or pickled through the pipe."""
+    ring = SharedAudioRing.attach(ring_name, capacity) if use_ring else None
+    audio = WireFormatConverter(sample_format).convert(np.random.uniform(-0.5, 0.5, chunk_samples).astype(np.float32)).copy()
+    conn.recv()  # go
+    for _ in range(n_chunks):
+        if use_ring:
+            conn.send(("chunk", ring.write(audio)))
+        else:
+            conn.send(("chunk", audio.tobytes()))
+    conn.send(("finished", ""))
+    if ring:
+        ring.close()
+
+
+def _bench(use_ring, n_chunks, chunk_samples, sample_format):
+    parent, child = mp.Pipe()
+    capacity = 4 * 1024 * 1024
+    ring = SharedAudioRing.create(capacity)
+    p = mp.Process(target=_bench_producer, args=(child, ring.name, capacity, use_ring, n_chunks, chunk_samples, sample_format))
+    p.start()
+    parent.send("go")
+    start = time.perf_counter()
+    total = 0
+    while True:
+        status, result = parent.recv()
+        if status == "finished":
+            break
+        if use_ring:
+            position, nbytes = result
+            chunk = ring.read(position, nbytes)
+            ring.release(nbytes)
+        else:
+            chunk = result
+        total += len(chunk)
+    elapsed = time.perf_counter() - start
+    p.join()
+    ring.close()
+    return total / elapsed / 1e6, n_chunks / elapsed
+
+
+def _bench_conversion(n_chunks, chunk_samples, rate=24000):
+    """
+    Worker conversion + ring round trip + parent conversion to the int16 the player wants, in one process:
+    bytes allocated per chunk (tracemalloc peak above the steady state) and CPU per second of audio.
+    """
+    import tracemalloc
+
+    def old_float32(ring, audio):
+        # float32 on the wire, the parent converts every chunk (TextToAudioStream._on_audio_chunk before)
+        position, nbytes = ring.write(audio.astype(np.float32, copy=False))
+        chunk = ring.read(position, nbytes)
+        ring.release(nbytes)
+        return np.int16(np.frombuffer(chunk, dtype=np.float32) * 32767).tobytes()
+
+    def old_int16(ring, audio):
+        # int16 on the wire through the allocating conversion
+        position, nbytes = ring.write((np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16))
+        chunk = ring.read(position, nbytes)
+        ring.release(nbytes)
+        return chunk
+
+    converter = WireFormatConverter("int16")
+
+    def new_int16(ring, audio):
+        position, nbytes = ring.write(converter.convert(audio))
+        chunk = ring.read(position, nbytes)
+        ring.release(nbytes)
+        return chunk
+
+    audio = np.random.uniform(-1.2, 1.2, (1, chunk_samples)).astype(np.float32)
+    audio_seconds = n_chunks * chunk_samples / rate
+    for name, path in (("float32 wire, parent converts", old_float32),
+                       ("int16 wire, allocating", old_int16),
+                       ("int16 wire, preallocated", new_int16)):
+        ring = SharedAudioRing.create(4 * 1024 * 1024)
+        path(ring, audio)  # warm up (the converter sizes its buffers here)
+        tracemalloc.start()
+        base, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        path(ring, audio)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        # the bytes handed to the player are needed either way, everything above that is overhead
+        overhead = peak - base - chunk_samples * 2
+
+        start = time.process_time()
+        for _ in range(n_chunks):
+            path(ring, audio)
+        cpu = time.process_time() - start
+        ring.close()
+        print(f"{name:>30}: {overhead / 1024:7.1f} KiB extra allocated per chunk, "
+              f"{cpu / audio_seconds * 1000:6.2f} ms CPU per second of audio")
+
+
+if __name__ == "__main__":
+    mp.set_start_method("spawn", force=True)
+    n_chunks = 2000
+    chunk_samples = 24000 // 5  # 200 ms at 24 kHz
+    print(f"{n_chunks} chunks of {chunk_samples} samples")
+    for sample_format in ("float32", "int16"):
+        for use_ring in (False, True):
+            mb_s, chunks_s = _bench(use_ring, n_chunks, chunk_samples, sample_format)
+            path = "shared ring" if use_ring else "mp.Pipe    "
+            print(f"{path} {sample_format:>7}: {mb_s:8.1f} MB/s  {chunks_s:9.0f} chunks/s")
+    print()
+    _bench_conversion(n_chunks, chunk_samples)
@@ -0,0 +1,251 @@
+"""
+Chunk-wise post-processing of synthesized speech, run in the synthesis worker before the wire format conversion.
+
+Per generation (one sentence) the StreamingPostProcessor
+    - trims leading silence from the first chunks (bounded, so a deliberate pause is not eaten),
+    - holds back trailing quiet samples so silence at the end of the sentence can be dropped,
+    - fades in after a trim and out at the trimmed end, with ramps computed once,
+    - scales the sentence to a common loudness per cloning reference, so emotion references recorded at
+      different levels come out equally loud.
+Every step works on the chunk at hand in a buffer reused from chunk to chunk: nothing is proportional to the clip.
+
+Running this module directly compares it with trimming and fading the complete clip the way BaseEngine does.
+"""
+
+from typing import Dict, Optional
+import numpy as np
+
+
+def first_above(audio: np.ndarray, threshold: float, block: int = 2048) -> Optional[int]:
+    """Index of the first sample louder than threshold, scanning block by block from the start."""
+    for start in range(0, len(audio), block):
+        hits = np.flatnonzero(np.abs(audio[start:start + block]) > threshold)
+        if len(hits):
+            return start + int(hits[0])
+    return None
+
+
+def last_above(audio: np.ndarray, threshold: float, block: int = 2048) -> Optional[int]:
+    """Index of the last sample louder than threshold, scanning block by block from the end."""
+    for end in range(len(audio), 0, -block):
+        start = max(0, end - block)
+        hits = np.flatnonzero(np.abs(audio[start:end]) > threshold)
+        if len(hits):
+            return start + int(hits[-1])
+    return None
+
+
+_ramps: Dict[int, np.ndarray] = {}
+
+
+def fade_ramp(n: int) -> np.ndarray:
+    """Cached linear 0 -> 1 ramp of n samples (read only, reverse it for a fade-out)."""
+    ramp = _ramps.get(n)
+    if ramp is None:
+        ramp = np.linspace(0.0, 1.0, n, dtype=np.float32)
+        ramp.flags.writeable = False
+        _ramps[n] = ramp
+    return ramp
+
+
+class StreamingPostProcessor:
+    """
+    Streaming trim / fade / loudness stage for one worker.
+
+    Internal States:
+    - sample_rate: sample rate of the model output
+    - silence_threshold: absolute level below which a sample counts as silence
+    - fade_samples: length of the fade-in after a leading trim and of the fade-out at the end
+    - max_leading_trim: most samples trimmed from the start of a sentence
+    - keep_tail: quiet samples kept after the last loud one
+    - hold_capacity: most trailing quiet samples held back; older ones are released unchanged
+    - target_rms: level every reference is scaled to, None disables loudness normalisation
+    - min_gain / max_gain: bounds of the normalisation gain
+    - smoothing: weight of the newest sentence in a reference's level
+    - levels: reference id -> smoothed rms of its speech
+    - gain: gain applied to the current generation
+    - _ramp: fade ramp of fade_samples
+    - _out: output buffer, the returned arrays are views of it
+    - _hold / _held: buffer of trailing quiet samples held back and how many it holds
+    - _leading: whether leading silence is still being trimmed
+    - _lead_trimmed: samples trimmed so far at the start
+    - _fade_pos: progress of the fade-in, fade_samples when there is none
+    - _reference_id: reference of the current generation
+    - _sum_sq / _count: energy and length of the current generation's loud part
+    """
+    def __init__(self, sample_rate: int = 24000, silence_threshold: float = 0.01, fade_ms: float = 10,
+                 max_leading_trim_ms: float = 500, keep_tail_ms: float = 60, max_hold_ms: float = 1000,
+                 target_rms: Optional[float] = 0.08, min_gain: float = 0.5, max_gain: float = 3.0, smoothing: float = 0.3):
+        self.sample_rate = sample_rate
+        self.silence_threshold = silence_threshold
+        self.fade_samples = max(1, int(sample_rate * fade_ms / 1000))
+        self.max_leading_trim = int(sample_rate * max_leading_trim_ms / 1000)
+        self.keep_tail = int(sample_rate * keep_tail_ms / 1000)
+        self.hold_capacity = max(self.keep_tail, int(sample_rate * max_hold_ms / 1000))
+        self.target_rms = target_rms
+        self.min_gain = min_gain
+        self.max_gain = max_gain
+        self.smoothing = smoothing
+        self.levels: Dict[str, float] = {}
+        self.gain = 1.0
+        self._ramp = fade_ramp(self.fade_samples)
+        self._out = np.empty(0, dtype=np.float32)
+        self._hold = np.empty(self.hold_capacity, dtype=np.float32)
+        self._held = 0
+        self._leading = True
+        self._lead_trimmed = 0
+        self._fade_pos = self.fade_samples
+        self._reference_id = None
+        self._sum_sq = 0.0
+        self._count = 0
+
+    def begin(self, reference_id: str):
+        """Start a new generation rendered with reference_id."""
+        self._reference_id = reference_id
+        self._held = 0
+        self._leading = True
+        self._lead_trimmed = 0
+        self._fade_pos = self.fade_samples
+        self._sum_sq = 0.0
+        self._count = 0
+        self.gain = 1.0
+        level = self.levels.get(reference_id)
+        if self.target_rms and level:
+            self.gain = float(min(self.max_gain, max(self.min_gain, self.target_rms / level)))
+
+    def _output(self, n: int) -> np.ndarray:
+        if self._out.size < n:
+            self._out = np.empty(max(n, 2 * self._out.size), dtype=np.float32)
+        return self._out[:n]
+
+    def _finish_output(self, out: np.ndarray) -> np.ndarray:
+        """Apply gain and the running fade-in to out in place."""
+        if self.gain != 1.0:
+            np.multiply(out, self.gain, out=out)
+        if self._fade_pos < self.fade_samples and len(out):
+            k = min(len(out), self.fade_samples - self._fade_pos)
+            out[:k] *= self._ramp[self._fade_pos:self._fade_pos + k]
+            self._fade_pos += k
+        return out
+
+    def process(self, chunk) -> np.ndarray:
+        """
+        Process one streamed chunk (float32, any shape). Returns the samples to send now, possibly none;
+        the result is only valid until the next call.
+        """
+        audio = np.asarray(chunk, dtype=np.float32).reshape(-1)
+
+        if self._leading:
+            budget = self.max_leading_trim - self._lead_trimmed
+            first = first_above(audio[:budget], self.silence_threshold) if budget > 0 else 0
+            if first is None:
+                first = min(len(audio), budget)
+                if first == len(audio):  # all quiet and still within the trim budget
+                    self._lead_trimmed += first
+                    return self._output(0)
+            self._lead_trimmed += first
+            self._leading = False
+            if self._lead_trimmed > 0:
+                self._fade_pos = 0
+            audio = audio[first:]
+
+        last = last_above(audio, self.silence_threshold)
+        if last is None:
+            # quiet: keep holding it back, release what no longer fits
+            overflow = max(0, self._held + len(audio) - self.hold_capacity)
+            out = self._output(overflow)
+            if overflow:
+                from_hold = min(overflow, self._held)
+                out[:from_hold] = self._hold[:from_hold]
+                out[from_hold:] = audio[:overflow - from_hold]
+                self._hold[:self._held - from_hold] = self._hold[from_hold:self._held]
+                self._held -= from_hold
+                audio = audio[overflow - from_hold:]
+            self._hold[self._held:self._held + len(audio)] = audio
+            self._held += len(audio)
+            return self._finish_output(out)
+
+        loud = audio[:last + 1]
+        self._sum_sq += float(np.dot(loud, loud))
+        self._count += len(loud)
+        tail = audio[last + 1:]
+        # a quiet stretch longer than the hold buffer inside one chunk is a pause, not the end: pass it on
+        pass_tail = len(tail) > self.hold_capacity
+        held = self._held
+        out = self._output(held + len(loud) + (len(tail) if pass_tail else 0))
+        out[:held] = self._hold[:held]
+        out[held:held + len(loud)] = loud
+        if pass_tail:
+            out[held + len(loud):] = tail
+            self._held = 0
+        else:
+            self._hold[:len(tail)] = tail
+            self._held = len(tail)
+        return self._finish_output(out)
+
+    def finish(self) -> np.ndarray:
+        """End of the generation: the kept part of the held tail, faded out. Also updates the reference level."""
+        if self._count and self._reference_id is not None:
+            rms = (self._sum_sq / self._count) ** 0.5
+            previous = self.levels.get(self._reference_id)
+            self.levels[self._reference_id] = rms if previous is None else (1 - self.smoothing) * previous + self.smoothing * rms
+        n = min(self._held, self.keep_tail)
+        trimmed = self._held > n
+        out = self._output(n)
+        out[:] = self._hold[:n]
+        self._held = 0
+        self._finish_output(out)
+        k = min(n, self.fade_samples)
+        if trimmed and k:
+            out[n - k:] *= self._ramp[::-1][self.fade_samples - k:]
+        return out
+
+
+if __name__ == "__main__":
+    import time
+    import tracemalloc
+    from .base_engine import BaseEngine
+
+    rate = 24000
+    rng = np.random.default_rng(1)
+
+    def sentence(seconds):
+        t = np.arange(int(rate * seconds), dtype=np.float32) / rate
+        speech = (0.2 * np.sin(2 * np.pi * 180 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t))).astype(np.float32)
+        lead = (rng.standard_normal(int(rate * 0.3)) * 0.002).astype(np.float32)
+        tail = (rng.standard_normal(int(rate * 0.4)) * 0.002).astype(np.float32)
+        return np.concatenate((lead, speech, tail))
+
+    clips = [sentence(s) for s in (1.5, 3.0, 6.0)]
+    chunk = rate // 2
+
+    class _Engine(BaseEngine):
+        def get_stream_info(self):
+            return None, 1, rate
+
+    engine = _Engine.__new__(_Engine)
+    post = StreamingPostProcessor(rate, target_rms=None)
+
+    def whole_clip(clip):
+        # BaseEngine style: wait for the complete clip, then trim and fade it
+        return engine._trim_silence(clip, rate, silence_threshold=0.01)
+
+    def streaming(clip):
+        post.begin("ref")
+        n = 0
+        for start in range(0, len(clip), chunk):
+            n += len(post.process(clip[start:start + chunk]))
+        return n + len(post.finish())
+
+    for name, fn in (("whole clip (BaseEngine)", whole_clip), ("streaming", streaming)):
+        for clip in clips:
+            fn(clip)  # warm up
+            tracemalloc.start()
+            fn(clip)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            start = time.process_time()
+            for _ in range(50):
+                fn(clip)
+            cpu = (time.process_time() - start) / 50
+            print(f"{name:>24} {len(clip) / rate:4.1f}s clip: peak {peak / 1024:7.1f} KiB, {cpu * 1e6:7.0f} us")
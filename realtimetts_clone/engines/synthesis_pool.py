@@ -0,0 +1,474 @@
+"""
+Pool of synthesis worker processes for engines that run their model out of process.
+
+Each worker owns a control pipe and a shared-memory audio ring. Requests are submitted as
+SynthesisJob objects; a reader thread per worker moves the worker's chunks out of its ring
+into the job's own queue as soon as they arrive, so a worker can render sentence N+1 while
+sentence N is still being played. The engine consumes jobs in submission order, which keeps
+the audio ordered no matter which worker rendered it.
+
+Several engines (one per conversation) can share a pool: each opens a session slot, and its jobs are
+cancelled through that slot's counter only, so stopping one conversation leaves the others rendering.
+Generation ids are handed out by the pool and unique across sessions. Idle workers serve the sessions
+round-robin: the next job is the oldest one of the session served longest ago among those with nothing
+rendering, so one conversation's prefetched sentences do not delay another's first sentence.
+
+Messages a worker sends back are (status, generation, payload):
+    - ("chunk", generation, (position, nbytes)): audio in the worker's ring
+    - ("chunk_bytes", generation, bytes): audio that did not fit the ring
+    - ("finished" | "cancelled", generation, ""): end of the generation
+
+A watchdog thread keeps the pool serving when a worker dies (e.g. after a CUDA error) or hangs.
+Messages are the worker's heartbeat while it renders: a worker that exited, closed its pipe, or sent
+nothing for hang_timeout seconds while busy is killed. Its job is handed to the next worker if none of
+its audio was delivered yet, otherwise it ends as ("failed", None). The slot is filled by the warm standby
+worker at once if there is one, else by a newly spawned worker once its model loaded; a new standby is
+spawned in the background. Every failover is recorded in SynthesisPool.failovers, and the time until
+the slot serves again is the recovery bound on top of hang_timeout.
+"""
+
+import collections
+import logging
+import queue
+import threading
+import time
+import multiprocessing as mp
+from .safepipe import SafePipe
+from .shm_ring import SharedAudioRing
+
+
+class SynthesisJob:
+    """
+    One synthesize request.
+
+    Internal States:
+    - generation: unique, increasing id of the request
+    - text: text to synthesize
+    - reference_id: cloning reference the text is rendered with
+    - session: session slot of the engine that submitted the job
+    - chunks: queue of ("chunk", bytes) items followed by one ("finished" | "cancelled", None)
+    - worker: the WorkerHandle rendering this job (None while pending)
+    - from_cache: True if the chunks were served by the engine's phrase cache instead of a worker
+    - started_at / finished_at: when a worker picked the job up and sent its end marker
+    - attempts: times the job was handed to a worker (a job is retried once after a worker failure)
+    - delivered: audio chunks put into the queue so far
+    """
+    def __init__(self, generation, text, reference_id, session=0):
+        self.generation = generation
+        self.text = text
+        self.reference_id = reference_id
+        self.session = session
+        self.chunks = queue.Queue()
+        self.worker = None
+        self.from_cache = False
+        self.started_at = None
+        self.finished_at = None
+        self.attempts = 0
+        self.delivered = 0
+
+    def synthesis_seconds(self):
+        """Worker time spent on this job, None until it finished."""
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+
+class WorkerHandle:
+    """
+    Parent-side handle of one worker process.
+
+    Internal States:
+    - index: position of the worker in the pool
+    - pipe: thread-safe parent end of the control pipe
+    - ring: shared-memory ring the worker writes audio into
+    - process: the worker process
+    - ready_event: set by the worker once its model is loaded
+    - registered_references: reference ids whose prompt features the worker has cached
+    - job: job currently being rendered, None when idle
+    - last_beat: time of the last sign of life (a message, or the dispatch of a job)
+    - failed: set once the watchdog gave up on the worker
+    """
+    def __init__(self, index, pipe, ring, process, ready_event, registered_references):
+        self.index = index
+        self.pipe = pipe
+        self.ring = ring
+        self.process = process
+        self.ready_event = ready_event
+        self.registered_references = set(registered_references)
+        self.job = None
+        self.reader_thread = None
+        self.last_beat = time.time()
+        self.failed = False
+
+
+class SynthesisPool:
+    """
+    N worker processes behind one submit() call, with FIFO dispatch to idle workers.
+
+    Internal States:
+    - target: worker function, called as target(conn, ready_event, *worker_args, ring_name, ring_capacity, cancel_generation)
+    - worker_args: engine specific arguments for the worker function
+    - initial_references: reference ids every worker registers before it reports ready
+    - num_workers: number of worker processes
+    - ring_capacity: size in bytes of each worker's audio ring
+    - cancel_generation: shared array of one counter per session slot, workers abandon every job of session s
+      whose generation id is <= cancel_generation[s]
+    - reference_payload: callable(reference_id) -> dict sent along with the first job a worker renders for that reference
+    - hang_timeout: seconds a busy worker may stay silent before it is considered hung
+    - startup_timeout: seconds a worker may take to load its model before it is given up
+    - use_standby: whether an extra worker is kept loaded to take over a failed one at once
+    - failovers: dicts (worker, reason, silent_seconds, recovery_seconds, standby) of the handled failures
+    - _standby: the loaded standby WorkerHandle, None while there is none
+    - _vacancies: (slot index, detected at, reason, silent seconds) of failed workers not replaced yet
+    - _respawning: replacement workers being spawned
+    - _sessions: session slots in use
+    - _last_generation: last generation id handed out
+    - _served_at: session slot -> when a worker last took one of its jobs
+    """
+    def __init__(self, target, worker_args, initial_references, num_workers, ring_capacity, cancel_generation, reference_payload,
+                 hang_timeout=10.0, startup_timeout=300.0, standby=False):
+        self.target = target
+        self.worker_args = worker_args
+        self.initial_references = set(initial_references)
+        self.num_workers = max(1, int(num_workers))
+        self.ring_capacity = ring_capacity
+        self.cancel_generation = cancel_generation
+        self.reference_payload = reference_payload
+        self.workers = []
+        self._pending = collections.deque()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.hang_timeout = hang_timeout
+        self.startup_timeout = startup_timeout
+        self.use_standby = standby
+        self.failovers = []
+        self._standby = None
+        self._vacancies = collections.deque()
+        self._respawning = 0
+        self._watchdog_thread = None
+        self._sessions = set()
+        self._last_generation = 0
+        self._served_at = {}
+
+    def start(self):
+        """Spawn all workers (and the standby) at once and wait until every model is loaded."""
+        for index in range(self.num_workers):
+            self.workers.append(self._spawn_worker(index))
+        if self.use_standby:
+            self._standby = self._spawn_worker(-1)
+        started = time.time()
+        for worker in self.workers:
+            if not self._wait_ready(worker, started):
+                exitcode = worker.process.exitcode
+                self.shutdown()
+                raise RuntimeError(f"synthesis worker {worker.index} did not load its model "
+                                   f"(exit code {exitcode}, startup_timeout={self.startup_timeout}s)")
+            worker.last_beat = time.time()
+            self._start_reader(worker)
+        if self._standby is not None and not self._wait_ready(self._standby, started):
+            logging.warning(f"synthesis standby worker did not come up (exit code {self._standby.process.exitcode})")
+            self._discard(self._standby)
+            self._standby = None  # the watchdog spawns another one
+        self._watchdog_thread = threading.Thread(target=self._watchdog_loop, name="SynthesisPoolWatchdog", daemon=True)
+        self._watchdog_thread.start()
+
+    def _wait_ready(self, worker, started):
+        """Wait until the worker loaded its model; False if it died, the pool stopped or startup_timeout passed."""
+        while not worker.ready_event.wait(0.1):
+            if self._stop_event.is_set() or not worker.process.is_alive() \
+                    or time.time() - started > self.startup_timeout:
+                return False
+        return True
+
+    def _spawn_worker(self, index):
+        pipe, child_pipe = SafePipe()
+        ready_event = mp.Event()
+        # audio travels through shared memory, the pipe only carries (position, nbytes) descriptors
+        ring = SharedAudioRing.create(self.ring_capacity)
+        process = mp.Process(
+            target=self.target,
+            args=(child_pipe, ready_event, *self.worker_args,
+                  ring.name, self.ring_capacity, self.cancel_generation),
+            daemon=True,
+        )
+        process.start()
+        return WorkerHandle(index, pipe, ring, process, ready_event, self.initial_references)
+
+    def _start_reader(self, worker):
+        worker.reader_thread = threading.Thread(
+            target=self._reader_loop, args=(worker,),
+            name=f"SynthesisPoolReader_{worker.index}", daemon=True
+        )
+        worker.reader_thread.start()
+
+    def open_session(self):
+        """Reserve a session slot (an index of cancel_generation) for one engine."""
+        with self._lock:
+            for slot in range(len(self.cancel_generation)):
+                if slot not in self._sessions:
+                    self._sessions.add(slot)
+                    return slot
+        raise RuntimeError(f"all {len(self.cancel_generation)} synthesis sessions are in use")
+
+    def close_session(self, slot):
+        """Free a session slot; its pending jobs end as cancelled."""
+        self.drop_pending(slot)
+        with self._lock:
+            self._sessions.discard(slot)
+            self._served_at.pop(slot, None)
+
+    def next_generation(self):
+        """A new generation id, unique across the sessions of the pool."""
+        with self._lock:
+            self._last_generation += 1
+            return self._last_generation
+
+    def submit(self, job: SynthesisJob):
+        """Queue a job; it starts as soon as a worker is idle."""
+        with self._lock:
+            self._pending.append(job)
+            self._dispatch_locked()
+
+    def _next_job_locked(self):
+        """Oldest pending job of the session served longest ago, preferring sessions with nothing rendering."""
+        if len(self._sessions) <= 1:
+            return self._pending.popleft()
+        busy = {worker.job.session for worker in self.workers if worker.job is not None}
+        candidates = [job for job in self._pending if job.session not in busy] or list(self._pending)
+        job = min(candidates, key=lambda j: self._served_at.get(j.session, 0.0))  # min keeps the oldest on ties
+        self._pending.remove(job)
+        self._served_at[job.session] = time.time()
+        return job
+
+    def _dispatch_locked(self):
+        """Hand pending jobs to idle workers (caller holds _lock)."""
+        for worker in self.workers:
+            if not self._pending:
+                return
+            if worker.job is not None:
+                continue
+            job = self._next_job_locked()
+            data = {
+                "text": job.text,
+                "reference_id": job.reference_id,
+                "generation": job.generation,
+                "session": job.session,
+            }
+            if job.reference_id not in worker.registered_references:
+                data["reference"] = self.reference_payload(job.reference_id)
+                worker.registered_references.add(job.reference_id)
+            job.worker = worker
+            job.started_at = time.time()
+            job.attempts += 1
+            worker.job = job
+            worker.last_beat = job.started_at
+            worker.pipe.send({"command": "synthesize", "data": data})
+
+    def _reader_loop(self, worker):
+        """Route a worker's messages into the queue of the job it is rendering."""
+        while not self._stop_event.is_set() and not worker.failed:
+            try:
+                # the poll only bounds how late the stop event is seen; sends do not wait for it
+                if not worker.pipe.poll(0.1):
+                    continue
+                message = worker.pipe.recv()
+            except (EOFError, OSError):
+                message = None
+            if message is None:  # pipe closed: the worker is gone
+                self._fail_worker(worker, "pipe closed")
+                break
+            worker.last_beat = time.time()
+            status, generation, payload = message
+            job = worker.job
+            if job is None or job.generation != generation:
+                # leftover of a job the pool no longer tracks
+                if status == "chunk":
+                    worker.ring.release(payload[1])
+                continue
+
+            if status == "chunk":
+                position, nbytes = payload
+                job.chunks.put(("chunk", worker.ring.read(position, nbytes)))
+                worker.ring.release(nbytes)
+                job.delivered += 1
+            elif status == "chunk_bytes":
+                job.chunks.put(("chunk", payload))
+                job.delivered += 1
+            else:
+                with self._lock:
+                    if worker.job is not job:  # the watchdog gave up on the worker meanwhile
+                        continue
+                    job.finished_at = time.time()
+                    job.chunks.put((status, None))
+                    worker.job = None
+                    self._dispatch_locked()
+
+    def _watchdog_loop(self):
+        """Fail workers that exited or stopped making progress, and keep a standby loaded."""
+        interval = min(0.25, self.hang_timeout / 4)
+        while not self._stop_event.wait(interval):
+            now = time.time()
+            with self._lock:
+                workers = list(self.workers)
+                standby = self._standby
+            for worker in workers:
+                if not worker.process.is_alive():
+                    self._fail_worker(worker, f"exited with code {worker.process.exitcode}")
+                elif worker.job is not None and now - worker.last_beat > self.hang_timeout:
+                    self._fail_worker(worker, f"no progress for {now - worker.last_beat:.1f}s")
+            if standby is not None and not standby.process.is_alive():
+                with self._lock:
+                    if self._standby is standby:
+                        self._standby = None
+                logging.warning(f"synthesis standby worker exited with code {standby.process.exitcode}")
+                self._discard(standby)
+            self._respawn_if_needed()
+
+    def _fail_worker(self, worker, reason):
+        """Give up on a worker: retry or fail its job, hand its slot to the standby, clean it up."""
+        with self._lock:
+            if worker.failed or self._stop_event.is_set():
+                return
+            worker.failed = True
+            detected_at = time.time()
+            silent = detected_at - worker.last_beat
+            self.workers.remove(worker)
+            job = worker.job
+            worker.job = None
+            outcome = "was idle"
+            if job is not None:
+                if self.cancel_generation[job.session] >= job.generation:
+                    job.chunks.put(("cancelled", None))
+                    outcome = f"job {job.generation} was cancelled"
+                elif job.delivered == 0 and job.attempts < 2:
+                    # nothing was heard of it yet: the next worker renders it as if nothing happened
+                    job.worker = None
+                    job.started_at = None
+                    self._pending.appendleft(job)
+                    outcome = f"job {job.generation} is retried"
+                else:
+                    job.finished_at = detected_at
+                    job.chunks.put(("failed", None))
+                    outcome = f"job {job.generation} failed"
+            self._vacancies.append((worker.index, detected_at, reason, silent))
+            if self._standby is not None:
+                standby, self._standby = self._standby, None
+                self._install_locked(standby, standby=True)
+            self._dispatch_locked()
+        logging.warning(f"synthesis worker {worker.index} failed ({reason}), {outcome}")
+        self._discard(worker)
+        self._respawn_if_needed()
+
+    def _install_locked(self, worker, standby=False):
+        """Put a loaded worker into the oldest vacant slot and record the failover (caller holds _lock)."""
+        index, detected_at, reason, silent = self._vacancies.popleft()
+        worker.index = index
+        worker.last_beat = time.time()
+        self.workers.insert(min(index, len(self.workers)), worker)
+        self._start_reader(worker)
+        recovery = worker.last_beat - detected_at
+        self.failovers.append({"worker": index, "reason": reason, "silent_seconds": silent,
+                               "recovery_seconds": recovery, "standby": standby})
+        logging.warning(f"synthesis worker {index} replaced by a {'standby' if standby else 'new'} worker "
+                        f"{recovery * 1000:.0f} ms after the failure was detected")
+
+    def _respawn_if_needed(self):
+        """Start replacement workers for the vacant slots and the missing standby."""
+        with self._lock:
+            if self._stop_event.is_set():
+                return
+            missing = len(self._vacancies) + (1 if self.use_standby and self._standby is None else 0)
+            count = missing - self._respawning
+            self._respawning += max(0, count)
+        for _ in range(count):
+            threading.Thread(target=self._respawn, name="SynthesisPoolRespawn", daemon=True).start()
+
+    def _respawn(self):
+        """Spawn a worker; once loaded it fills a vacant slot, or becomes the standby."""
+        worker = None
+        try:
+            worker = self._spawn_worker(-1)
+            if not self._wait_ready(worker, time.time()):
+                logging.warning(f"synthesis replacement worker did not come up "
+                                f"(exit code {worker.process.exitcode})")
+                self._discard(worker)
+                return
+            with self._lock:
+                if not self._stop_event.is_set():
+                    if self._vacancies:
+                        self._install_locked(worker)
+                        self._dispatch_locked()
+                        worker = None
+                    elif self.use_standby and self._standby is None:
+                        self._standby = worker
+                        worker = None
+            if worker is not None:
+                self._discard(worker)
+        except Exception:
+            logging.exception("spawning a synthesis worker failed")
+            if worker is not None:
+                self._discard(worker)
+        finally:
+            with self._lock:
+                self._respawning -= 1
+        # a failed attempt is retried by the watchdog's next round
+
+    def _discard(self, worker):
+        """Kill a worker process and free its pipe and ring."""
+        worker.failed = True
+        try:
+            worker.process.kill()  # a process stuck in a CUDA call may ignore SIGTERM
+            worker.process.join(timeout=5)
+        except Exception:
+            pass
+        if worker.reader_thread is not None and worker.reader_thread is not threading.current_thread():
+            worker.reader_thread.join(timeout=1)
+        try:
+            worker.pipe.close()
+        except Exception:
+            pass
+        worker.ring.close()
+
+    def drop_pending(self, session=None):
+        """Forget jobs (of one session, or all) that were never dispatched, ending them as cancelled."""
+        with self._lock:
+            kept = collections.deque()
+            while self._pending:
+                job = self._pending.popleft()
+                if session is None or job.session == session:
+                    job.chunks.put(("cancelled", None))
+                else:
+                    kept.append(job)
+            self._pending = kept
+
+    def shutdown(self):
+        """Stop all workers and free their rings."""
+        self.drop_pending()
+        with self._lock:
+            self._stop_event.set()
+            workers = list(self.workers)
+            if self._standby is not None:
+                workers.append(self._standby)
+                self._standby = None
+        if self._watchdog_thread is not None:
+            self._watchdog_thread.join(timeout=1)
+        for worker in workers:
+            try:
+                worker.pipe.send({"command": "shutdown"})
+            except Exception:
+                pass
+        for worker in workers:
+            try:
+                worker.process.join(timeout=5)
+                if worker.process.is_alive():
+                    worker.process.terminate()
+            except Exception:
+                pass
+            if worker.reader_thread is not None:
+                worker.reader_thread.join(timeout=1)
+            try:
+                worker.pipe.close()
+            except Exception:
+                pass
+            worker.ring.close()
+        logging.debug("synthesis pool shut down")
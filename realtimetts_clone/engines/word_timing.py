@@ -0,0 +1,123 @@
+"""
+Word timings for engines that do not report any (CosyVoice streams audio without token durations).
+
+Every word gets a share of the sentence's audio proportional to its weight: its letters plus a pause after
+punctuation. While the sentence streams in, the audio it will end up with is estimated from the learned seconds
+per weight unit; a word is released as soon as the audio received so far reaches its estimated start, so its
+timing is known before the chunk it begins in is played. Once the sentence is complete the words still held back
+are spread over the audio that is actually left, and the seconds per unit are learned from the real length.
+"""
+
+import re
+import string
+from typing import List, Tuple
+from .base_engine import TimingInfo
+
+_WORD = re.compile(r"\S+")
+_STRIP = string.punctuation + "…“”‘’«»„—–"
+
+
+class WordTimingEstimator:
+    """
+    Streaming word timing estimate for one engine, one sentence at a time.
+
+    Internal States:
+    - seconds_per_unit: smoothed audio seconds per weight unit (one letter)
+    - comma_pause / sentence_pause: weight units of the pause after mid-sentence / sentence-ending punctuation
+    - smoothing: weight of the newest sentence in seconds_per_unit
+    - _words: (word, start weight, speech weight) of the current sentence's words
+    - _total: total weight of the current sentence
+    - _offset: engine audio position (seconds) at which the current sentence starts
+    - _received: audio seconds of the current sentence received so far
+    - _next: index of the first word not released yet
+    - _anchor_weight / _anchor_time: weight and time of the last released word's start
+    """
+    def __init__(self, seconds_per_unit: float = 0.06, comma_pause: float = 3.0, sentence_pause: float = 5.0,
+                 smoothing: float = 0.3):
+        self.seconds_per_unit = seconds_per_unit
+        self.comma_pause = comma_pause
+        self.sentence_pause = sentence_pause
+        self.smoothing = smoothing
+        self._words: List[Tuple[str, float, float]] = []
+        self._total = 0.0
+        self._offset = 0.0
+        self._received = 0.0
+        self._next = 0
+        self._anchor_weight = 0.0
+        self._anchor_time = 0.0
+
+    def _pause(self, token: str) -> float:
+        tail = token.rstrip("”’\"')]}»")
+        if not tail:
+            return 0.0
+        if tail[-1] in ".!?…。":
+            return self.sentence_pause
+        if tail[-1] in ",;:—–-":
+            return self.comma_pause
+        return 0.0
+
+    def begin(self, text: str, offset: float = 0.0):
+        """Start a sentence whose audio begins at offset seconds of the engine's output."""
+        self._words = []
+        weight = 0.0
+        for token in _WORD.findall(text):
+            word = token.strip(_STRIP)
+            if word:
+                speech = float(len(word))
+                self._words.append((word, weight, speech))
+                weight += speech
+            weight += self._pause(token)  # a lone dash or ellipsis only adds its pause
+        self._total = weight
+        self._offset = offset
+        self._received = 0.0
+        self._next = 0
+        self._anchor_weight = 0.0
+        self._anchor_time = 0.0
+
+    def _release(self, expected: float, final: bool) -> List[TimingInfo]:
+        """Timings of the words starting within the received audio (every word left if final)."""
+        released = []
+        while self._next < len(self._words):
+            word, start_weight, speech = self._words[self._next]
+            remaining_weight = self._total - self._anchor_weight
+            scale = max(0.0, expected - self._anchor_time) / remaining_weight if remaining_weight > 0 else 0.0
+            start = self._anchor_time + (start_weight - self._anchor_weight) * scale
+            if not final and start >= self._received:
+                break
+            end = min(start + speech * scale, expected)
+            released.append(TimingInfo(self._offset + start, self._offset + end, word))
+            self._anchor_weight = start_weight
+            self._anchor_time = start
+            self._next += 1
+        return released
+
+    def on_audio(self, seconds: float) -> List[TimingInfo]:
+        """seconds of the sentence's audio arrived; returns the words that start within it."""
+        self._received += seconds
+        expected = max(self._received, self._total * self.seconds_per_unit)
+        return self._release(expected, final=False)
+
+    def finish(self) -> List[TimingInfo]:
+        """All audio of the sentence arrived: place the remaining words and learn the speaking rate."""
+        released = self._release(self._received, final=True)
+        if self._total > 0 and self._received > 0:
+            a = self.smoothing
+            self.seconds_per_unit = (1 - a) * self.seconds_per_unit + a * self._received / self._total
+        self._words = []
+        return released
+
+
+if __name__ == "__main__":
+    estimator = WordTimingEstimator()
+    text = "Well, I told you already: the valve on the left is closed. Open the right one!"
+    # a 4.2 s sentence streamed in 0.6 s chunks, spoken a bit slower than the estimator expects
+    estimator.begin(text, offset=1.0)
+    received = 0.0
+    while received < 4.2:
+        seconds = min(0.6, 4.2 - received)
+        received += seconds
+        for timing in estimator.on_audio(seconds):
+            print(f"after {received:.1f}s of audio: {timing}")
+    for timing in estimator.finish():
+        print(f"at the end: {timing}")
+    print(f"learned {estimator.seconds_per_unit * 1000:.1f} ms per letter")
@@ -0,0 +1,191 @@
+"""
+Stateful polyphase resampler for streamed PCM chunks.
+
+A rate pair in -> out is reduced to up / down factors L / M. The low-pass prototype filter (L * taps_per_phase
+taps, Kaiser windowed sinc) is designed once per (L, M, taps_per_phase) and kept in a module cache, split into its
+L phases. Each chunk is filtered together with the last taps_per_phase - 1 input samples of the previous chunk and
+the output phase carries over, so resampling a stream in chunks gives exactly the samples resampling it in one
+piece would: no clicks at chunk edges. All work buffers are reused from chunk to chunk.
+
+Running this module directly checks chunked against one-piece output (continuity) and measures throughput.
+"""
+
+from math import gcd
+from typing import Dict, Tuple
+import numpy as np
+
+_filters: Dict[Tuple[int, int, int], np.ndarray] = {}
+
+
+def polyphase_filter(up: int, down: int, taps_per_phase: int = 16, rolloff: float = 0.9, beta: float = 8.0) -> np.ndarray:
+    """
+    (taps_per_phase, up) table of the low-pass filter for resampling by up / down, cached per arguments.
+    Column p holds the taps of phase p, row k the tap applied to the k-th most recent input sample.
+    """
+    key = (up, down, taps_per_phase)
+    table = _filters.get(key)
+    if table is None:
+        n = up * taps_per_phase
+        cutoff = 0.5 * rolloff / max(up, down)  # cycles per sample of the upsampled signal
+        m = np.arange(n, dtype=np.float64) - (n - 1) / 2
+        h = 2 * cutoff * np.sinc(2 * cutoff * m) * np.kaiser(n, beta) * up
+        table = np.ascontiguousarray(h.reshape(taps_per_phase, up)).astype(np.float32)
+        table.flags.writeable = False
+        _filters[key] = table
+    return table
+
+
+class PolyphaseResampler:
+    """
+    Mono streaming resampler from in_rate to out_rate for int16 or float32 samples.
+
+    Internal States:
+    - in_rate / out_rate: sample rates
+    - up / down: reduced resampling factors (out_rate / in_rate = up / down)
+    - taps: taps per phase, also the number of input samples each output depends on
+    - dtype: sample type of input and output (int16 or float32)
+    - table: (taps, up) polyphase filter table, shared between resamplers of the same rate pair
+    - _t: position of the next output in 1/up input samples, relative to the first sample of the next chunk
+    - _x: float32 input buffer: taps - 1 history samples followed by the current chunk
+    - _steps: down * j for every output j of a chunk, precomputed
+    - _index / _phase / _acc / _tap / _coef: work buffers of the filter loop
+    - _out: output buffer of the final sample type, the returned arrays are views of it
+    """
+    def __init__(self, in_rate: int, out_rate: int, dtype=np.int16, taps_per_phase: int = 16):
+        g = gcd(int(in_rate), int(out_rate))
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.up = out_rate // g
+        self.down = in_rate // g
+        self.taps = taps_per_phase
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.dtype(np.int16), np.dtype(np.float32)):
+            raise ValueError(f"Unsupported sample type: {self.dtype}")
+        self.table = polyphase_filter(self.up, self.down, taps_per_phase)
+        self._t = 0
+        self._x = np.zeros(taps_per_phase - 1, dtype=np.float32)
+        self._steps = np.empty(0, dtype=np.int64)
+        self._index = np.empty(0, dtype=np.int64)
+        self._phase = np.empty(0, dtype=np.int64)
+        self._acc = np.empty(0, dtype=np.float32)
+        self._tap = np.empty(0, dtype=np.float32)
+        self._coef = np.empty(0, dtype=np.float32)
+        self._out = np.empty(0, dtype=self.dtype)
+
+    def reset(self):
+        """Forget the history, e.g. before an unrelated stream."""
+        self._t = 0
+        self._x[:self.taps - 1] = 0
+
+    def _reserve(self, n_in: int, n_out: int):
+        history = self.taps - 1
+        if self._x.size < history + n_in:
+            x = np.zeros(max(history + n_in, 2 * self._x.size), dtype=np.float32)
+            x[:history] = self._x[:history]
+            self._x = x
+        if self._acc.size < n_out:
+            size = max(n_out, 2 * self._acc.size)
+            self._steps = np.arange(size, dtype=np.int64) * self.down
+            self._index = np.empty(size, dtype=np.int64)
+            self._phase = np.empty(size, dtype=np.int64)
+            self._acc = np.empty(size, dtype=np.float32)
+            self._tap = np.empty(size, dtype=np.float32)
+            self._coef = np.empty(size, dtype=np.float32)
+            self._out = np.empty(size, dtype=self.dtype)
+
+    def process(self, chunk) -> np.ndarray:
+        """Resample one chunk (bytes or ndarray of dtype); the result is only valid until the next call."""
+        samples = np.frombuffer(chunk, dtype=self.dtype) if not isinstance(chunk, np.ndarray) else chunk.reshape(-1)
+        n = len(samples)
+        history = self.taps - 1
+        up = self.up
+        last = n * up - 1  # last position that still falls on an input of this chunk
+        count = (last - self._t) // self.down + 1 if n and self._t <= last else 0
+        self._reserve(n, count)
+
+        x = self._x
+        if self.dtype == np.int16:
+            np.multiply(samples, 1.0 / 32768, out=x[history:history + n], casting="unsafe")
+        else:
+            x[history:history + n] = samples
+
+        if count:
+            index, phase = self._index[:count], self._phase[:count]
+            acc, tap, coef = self._acc[:count], self._tap[:count], self._coef[:count]
+            # ts = t + down * j; index = ts // up (+ history offset into x), phase = ts % up
+            np.add(self._steps[:count], self._t, out=index)
+            np.remainder(index, up, out=phase)
+            np.floor_divide(index, up, out=index)
+            index += history
+            acc[:] = 0
+            for k in range(self.taps):
+                np.take(x, index, out=tap)
+                np.take(self.table[k], phase, out=coef)
+                tap *= coef
+                acc += tap
+                index -= 1  # tap k + 1 uses the input sample before
+
+        # carry the output phase and the last taps - 1 inputs over to the next chunk
+        self._t += count * self.down - n * up
+        if n:
+            x[:history] = x[n:n + history]
+
+        out = self._out[:count]
+        if count:
+            if self.dtype == np.int16:
+                np.multiply(acc, 32768.0, out=acc)
+                np.clip(acc, -32768.0, 32767.0, out=acc)
+                np.rint(acc, out=acc)
+                np.copyto(out, acc, casting="unsafe")
+            else:
+                out[:] = acc
+        return out
+
+
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(7)
+    in_rate = 24000
+    t = np.arange(in_rate * 2, dtype=np.float32) / in_rate
+    tone = (0.5 * np.sin(2 * np.pi * 440 * t) * 32767).astype(np.int16)
+
+    # continuity: any chunking must give the samples of one-piece resampling
+    for out_rate in (48000, 44100, 16000):
+        whole = PolyphaseResampler(in_rate, out_rate).process(tone).copy()
+        resampler = PolyphaseResampler(in_rate, out_rate)
+        pieces, start = [], 0
+        while start < len(tone):
+            size = int(rng.integers(1, 4000))
+            pieces.append(resampler.process(tone[start:start + size]).copy())
+            start += size
+        chunked = np.concatenate(pieces)
+        assert len(chunked) == len(whole), (len(chunked), len(whole))
+        assert np.array_equal(chunked, whole), np.abs(chunked.astype(int) - whole).max()
+        # largest step between neighbouring samples, chunked vs restarting the resampler for every chunk
+        restarted = np.concatenate([PolyphaseResampler(in_rate, out_rate).process(tone[i:i + 2400]).copy()
+                                    for i in range(0, len(tone), 2400)])
+        print(f"{in_rate} -> {out_rate}: chunked == one piece ({len(chunked)} samples); max step "
+              f"{np.abs(np.diff(chunked[100:].astype(int))).max()} streaming vs "
+              f"{np.abs(np.diff(restarted[100:].astype(int))).max()} restarted per chunk")
+
+    # throughput on 200 ms chunks
+    chunk = tone[:in_rate // 5]
+    for out_rate in (48000, 44100):
+        resampler = PolyphaseResampler(in_rate, out_rate)
+        resampler.process(chunk)
+        start = time.perf_counter()
+        for _ in range(200):
+            resampler.process(chunk)
+        seconds = time.perf_counter() - start
+        line = f"polyphase {in_rate} -> {out_rate}: {200 * 0.2 / seconds:7.0f}x realtime"
+        try:
+            import resampy
+            audio = chunk.astype(np.float32) / 32768.0
+            start = time.perf_counter()
+            for _ in range(20):
+                (resampy.resample(audio, in_rate, out_rate) * 32768.0).astype(np.int16).tobytes()
+            line += f", resampy per chunk {20 * 0.2 / (time.perf_counter() - start):7.0f}x realtime"
+        except ImportError:
+            pass
+        print(line)
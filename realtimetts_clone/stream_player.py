@@ -10,21 +10,23 @@ This module provides classes to handle audio streaming using PyAudio. It covers:
 Key Components:
   1. AudioConfiguration: Sets up audio parameters (format, channels, sample rate, device).
   2. AudioStream: Manages opening, starting, stopping, and closing streams, and adapts to device capabilities.
+     PCM streams run in PortAudio callback mode, fed from a CallbackOutputStream ring.
   3. AudioBufferManager: Buffers audio data in a queue and tracks sample counts.
   4. StreamPlayer: Orchestrates playback, handles events, and supports callbacks.
 
 Designed for flexible, real-time audio playback and streaming, with error handling for unsupported configurations.
 """
-from pydub import AudioSegment
 try:
     import pyaudio._portaudio as pa
 except ImportError:
     print("Could not import the PyAudio C module 'pyaudio._portaudio'.")
     raise
+from .callback_output import CallbackOutputStream
+from .resampler import PolyphaseResampler
 import numpy as np
 import subprocess
+import collections
 import threading
-import resampy
 import pyaudio
 import logging
 import shutil
@@ -81,6 +83,8 @@ class AudioStream:
         """
         self.config = config
         self.stream = None
+        self.output = None
+        self.resampler = None
         self.pyaudio_instance = pyaudio.PyAudio()
         self.actual_sample_rate = 0
         self.mpv_process = None
@@ -221,6 +225,13 @@ class AudioStream:
             best_rate = self._get_best_sample_rate(pyOutput_device_index, desired_rate)
             self.actual_sample_rate = best_rate
 
+            # A device that cannot play the engine rate gets a resampler that keeps its state across chunks
+            self.resampler = None
+            if best_rate != desired_rate and desired_rate > 0 and pyChannels == 1:
+                dtype = {pyaudio.paInt16: np.int16, pyaudio.paCustomFormat: np.int16, pyaudio.paFloat32: np.float32}.get(self.config.format)
+                if dtype is not None:
+                    self.resampler = PolyphaseResampler(desired_rate, best_rate, dtype)
+
             if self.config.format == pyaudio.paCustomFormat:
                 pyFormat = self.pyaudio_instance.get_format_from_width(2)
                 logging.debug(
@@ -235,15 +246,12 @@ class AudioStream:
                     f"pyFormat: {pyFormat}, pyChannels: {pyChannels}, "
                     f"pySampleRate: {best_rate}"
                 )
+            frames_per_buffer = self.config.frames_per_buffer
+            if frames_per_buffer == pa.paFramesPerBufferUnspecified:
+                frames_per_buffer = best_rate // 50  # 20 ms periods
             try:
-                self.stream = self.pyaudio_instance.open(
-                    format=pyFormat,
-                    channels=pyChannels,
-                    rate=best_rate,
-                    output_device_index=pyOutput_device_index,
-                    frames_per_buffer=self.config.frames_per_buffer,
-                    output=True,
-                )
+                self.output = CallbackOutputStream(pyFormat, pyChannels, best_rate, frames_per_buffer=frames_per_buffer)
+                self.stream = self.output.open(self.pyaudio_instance, pyOutput_device_index, start=False)
             except Exception as e:
                 print(
                     "Error opening stream with parameters:"
@@ -274,16 +282,19 @@ class AudioStream:
             self.stream.start_stream()
 
     def stop_stream(self):
-        """Stops the audio stream."""
+        """Stops the audio stream once the audio queued on it was played."""
         if self.stream and self.stream.is_active():
+            if self.output:
+                self.output.drain(timeout=1.0)
             self.stream.stop_stream()
 
     def close_stream(self):
         """Closes the audio stream."""
         if self.stream:
             self.stop_stream()
-            self.stream.close()
+            self.output.close()
             self.stream = None
+            self.output = None
         elif self.mpv_process:
             if self.mpv_process.stdin:
                 self.mpv_process.stdin.close()
@@ -435,7 +446,7 @@ class StreamPlayer:
         """
         self.buffer_manager = AudioBufferManager(audio_buffer, timings, config)
         self.timings = timings
-        self.timings_list = []
+        self.timings_list = collections.deque()
         self.audio_stream = AudioStream(config)
         self.playback_active = False
         self.immediate_stop = threading.Event()
@@ -479,6 +490,7 @@ class StreamPlayer:
 
     def _play_wav_chunk(self, chunk):
         if self.audio_stream.config.format == pyaudio.paCustomFormat:
+            from pydub import AudioSegment  # only needed for mp3 engines, slow to import
             segment = AudioSegment.from_file(io.BytesIO(chunk), format="mp3")
             chunk = segment.raw_data
             sample_width = segment.sample_width
@@ -487,7 +499,11 @@ class StreamPlayer:
             sample_width = self.audio_stream.pyaudio_instance.get_sample_size(self.audio_stream.config.format)
             channels = self.audio_stream.config.channels
 
-        if self.audio_stream.config.rate != self.audio_stream.actual_sample_rate and self.audio_stream.actual_sample_rate > 0:
+        if self.audio_stream.resampler is not None:
+            chunk = self.audio_stream.resampler.process(chunk).tobytes()
+        elif self.audio_stream.config.rate != self.audio_stream.actual_sample_rate and self.audio_stream.actual_sample_rate > 0:
+            # multichannel or unusual formats still go through resampy, one chunk at a time
+            import resampy  # pulls in numba, only imported when the device forces resampling
             if self.audio_stream.config.format == pyaudio.paFloat32:
                 audio_data = np.frombuffer(chunk, dtype=np.float32)
                 resampled_data = resampy.resample(audio_data, self.audio_stream.config.rate, self.audio_stream.actual_sample_rate)
@@ -515,27 +531,10 @@ class StreamPlayer:
 
             if not self.muted:
                 try:
-                    import time
-
-                    # Define the timeout duration in seconds
-                    timeout = 0.1
-
-                    # Record the start time
-                    start_time = time.time()
-
-                    frames_in_sub_chunk = len(sub_chunk) // (sample_width * channels)
-
-                    # Wait until there's space in the buffer or the timeout is reached
-                    while self.audio_stream.stream.get_write_available() < frames_in_sub_chunk:
-                        if time.time() - start_time > timeout:
-                            print(f"Wait aborted: Timeout of {timeout}s exceeded. "
-                                f"Buffer availability: {self.audio_stream.stream.get_write_available()}, "
-                                f"Frames in sub-chunk: {frames_in_sub_chunk}")
-                            break
-                        time.sleep(0.001)  # Small sleep to let the stream process audio
-
-                    self.audio_stream.stream.write(sub_chunk)
-                    self.seconds_played += len(sub_chunk) / (self.audio_stream.config.rate * sample_width * channels)
+                    # queued on the callback stream's ring; blocks only while enough audio is queued ahead
+                    self.audio_stream.output.write(sub_chunk, should_stop=self.immediate_stop.is_set)
+                    # sample-accurate: what the device has actually been given, not what was queued
+                    self.seconds_played = self.audio_stream.output.played_seconds()
                     while (True):
                         try:
                             timing = self.timings.get_nowait()
@@ -543,12 +542,11 @@ class StreamPlayer:
                         except queue.Empty:
                             break
 
-                    for timing in self.timings_list:
-                        if timing.start_time <= self.seconds_played:
-                            if self.on_word_spoken:
-                                self.on_word_spoken(timing)
-                            self.timings_list.remove(timing)
-                            break
+                    # timings arrive in order: every due word is at the front
+                    while self.timings_list and self.timings_list[0].start_time <= self.seconds_played:
+                        timing = self.timings_list.popleft()
+                        if self.on_word_spoken:
+                            self.on_word_spoken(timing)
                 except Exception as e:
                     print(f"RealtimeTTS error sending audio data: {e}")
 
@@ -594,6 +592,8 @@ class StreamPlayer:
 
             if self.immediate_stop.is_set():
                 logging.info("Immediate stop requested, aborting playback")
+                if self.audio_stream.output:
+                    self.audio_stream.output.flush()
                 break
 
         if self.on_playback_stop:
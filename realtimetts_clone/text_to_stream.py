@@ -13,6 +13,7 @@ Converts text into real-time audio using one or more TTS engines. Key features i
 
 
 from .threadsafe_generators import CharIterator, AccumulatingThreadSafeGenerator
+from .segmenter import segment_sentences
 from .stream_player import StreamPlayer, AudioConfiguration
 from typing import Union, Iterator, List
 from .engines.base_engine import BaseEngine
@@ -21,7 +22,6 @@ try:
 except ImportError:
     print("Could not import the PyAudio C module 'pyaudio._portaudio'.")
     raise
-import stream2sentence as s2s
 import numpy as np
 import threading
 import traceback
@@ -32,6 +32,15 @@ import time
 import wave
 import re
 
+# fragment checks of _synthesis_chunk_generator, run on every fragment
+_PUNCT_RUN = re.compile(r"[\.\?\!;:,\u2026]+")
+_CLOSING_TRAILER = re.compile(r"[\"'”’\)\]\}]+")
+_ENDS_WITH_PUNCT = re.compile(r"[\.\?\!;:,\u2026]$")
+_STARTS_WITH_PUNCT_RUN = re.compile(r"^\s*[\.\?\!;:,\u2026]+")
+# take() results of _synthesis_chunk_generator: nothing arrived yet / the sentence generator ended
+_NOTHING = object()
+_END = object()
+
 class TextToAudioStream:
     def __init__(
         self,
@@ -44,12 +53,13 @@ class TextToAudioStream:
         on_character=None,
         on_word=None,
         output_device_index=None,
-        tokenizer: str = "nltk",
+        tokenizer: str = "segmenter",
         language: str = "en",
         muted: bool = False,
         frames_per_buffer: int = pa.paFramesPerBufferUnspecified,
         playout_chunk_size: int = -1,
         level=logging.WARNING,
+        buffer_depth=None,
     ):
         """
         Initializes the TextToAudioStream.
@@ -94,8 +104,9 @@ class TextToAudioStream:
                 A callback function triggered when a word is spoken. This can be
                 useful for tracking word-level progress or highlighting spoken
                 words in a text display.
-                Currently only works for AzureEngine and KokoroEngine, since
-                the other engines don't provide word-level timings.
+                Currently only works for AzureEngine and KokoroEngine, which
+                provide word-level timings, and for CosyvoiceEngine created with
+                word_timings=True, which estimates them.
 
             output_device_index (int, optional):
                 The index of the audio output device to use for playback.
@@ -106,10 +117,13 @@ class TextToAudioStream:
             tokenizer (str, optional):
                 Specifies the tokenizer used to split input text into sentences
                 or smaller chunks for synthesis. Supported options are:
-                - "nltk": Uses the Natural Language Toolkit (NLTK) tokenizer.
-                - "stanza": Uses the Stanza library for advanced sentence
-                  splitting.
-                Defaults to "nltk".
+                - "segmenter": Incremental SentenceSegmenter (segmenter.py),
+                  works on the token chunks as they arrive.
+                - "nltk": stream2sentence with the Natural Language Toolkit
+                  (NLTK) tokenizer.
+                - "stanza": stream2sentence with the Stanza library for
+                  advanced (multilingual) sentence splitting.
+                Defaults to "segmenter".
                 
             language (str, optional):
                 Language code (e.g., "en" for English, "de" for German) used for
@@ -142,6 +156,15 @@ class TextToAudioStream:
                 The logging level to use for internal logging. Accepts standard
                 Python logging levels, such as `logging.DEBUG`, `logging.INFO`,
                 `logging.WARNING`, etc. Defaults to `logging.WARNING`.
+
+            buffer_depth (callable, optional):
+                Returns the seconds of synthesized audio still queued for
+                playback. `buffer_threshold_seconds` of play() compares it to
+                decide whether fragments are merged into larger synthesis
+                calls. Muted streams whose audio is played elsewhere (through
+                on_audio_chunk) should pass the depth of that output, the
+                internal player never holds their audio. Defaults to the
+                internal player's buffer.
         """
         self.log_characters = log_characters
         self.on_text_stream_start = on_text_stream_start
@@ -154,26 +177,48 @@ class TextToAudioStream:
         self.chunk_callback = None
         self.wf = None
         self.abort_events = []
+        # feed() and the end of a play session decide under this condition, so fed text is never left unread;
+        # it is notified when text is fed and when a sentence was synthesized
+        self._feed_cond = threading.Condition()
+        # passes that continued a play session with text fed while it ran / player restarts for text fed
+        # while it drained at the end
+        self.session_passes = 0
+        self.session_restarts = 0
         self.tokenizer = tokenizer
         self.language = language
         self.global_muted = muted
         self.frames_per_buffer = frames_per_buffer
         self.playout_chunk_size = playout_chunk_size
+        self.buffer_depth = buffer_depth
         self.player = None
+        self.stream_info = None
+        self._silence_cache = {}
         self.play_lock = threading.Lock()
-        self.is_playing_flag = False
+        # notified whenever is_playing() may have changed, see wait_until_stopped()
+        self._play_state = threading.Condition()
+        self._is_playing_flag = False
+        self._stream_running = False
+        # optional probe (see lib/latencyprobe.py) that is told when text enters the splitter,
+        # leaves it as a sentence and reaches the engine
+        self.latency_probe = None
+        # how often a chunk kept back by buffer_threshold_seconds re-checks the buffer while no text arrives
+        self.buffer_poll_interval = 0.05
+        # how long a pass waits at its end for the thread reading the sentence generator to leave the text iterator
+        self.pump_join_timeout = 1.0
 
         self._create_iterators()
 
-        logging.info(f"Initializing tokenizer {tokenizer} " f"for language {language}")
-        s2s.init_tokenizer(tokenizer, language)
+        if tokenizer != "segmenter":
+            logging.info(f"Initializing tokenizer {tokenizer} " f"for language {language}")
+            import stream2sentence as s2s  # only needed for the nltk / stanza tokenizers
+            s2s.init_tokenizer(tokenizer, language)
 
         # Initialize the play_thread attribute
         # (used for playing audio in a separate thread)
         self.play_thread = None
 
-        # Initialize an attribute to store generated text
-        self.generated_text = ""
+        # Initialize an attribute to store generated text (kept as chunks, see the generated_text property)
+        self._generated_parts = []
 
         # A flag to indicate if the audio stream is currently running or not
         self.stream_running = False
@@ -202,8 +247,9 @@ class TextToAudioStream:
         # Store the engine instance (responsible for text-to-audio conversion)
         self.engine = engine
 
-        # Extract stream information (format, channels, rate) from the engine
-        format, channels, rate = self.engine.get_stream_info()
+        # Extract stream information (format, channels, rate) from the engine, once per engine
+        self.stream_info = self.engine.get_stream_info()
+        format, channels, rate = self.stream_info
 
         # Check if the engine doesn't support consuming generators directly
         config = AudioConfiguration(
@@ -236,7 +282,9 @@ class TextToAudioStream:
         Returns:
             Self instance.
         """
-        self.char_iter.add(text_or_iterator)
+        with self._feed_cond:
+            self.char_iter.add(text_or_iterator)
+            self._feed_cond.notify_all()
         return self
 
     def play_async(
@@ -317,7 +365,7 @@ class TextToAudioStream:
         on_sentence_synthesized=None,
         before_sentence_synthesized=None,
         on_audio_chunk=None,
-        tokenizer: str = "nltk",
+        tokenizer: str = "segmenter",
         tokenize_sentences=None,
         language: str = "en",
         context_size: int = 12,
@@ -351,10 +399,10 @@ class TextToAudioStream:
         - on_sentence_synthesized: Callback function that gets called after hen a single sentence fragment was synthesized.
         - before_sentence_synthesized: Callback function that gets called before a single sentence fragment gets synthesized.
         - on_audio_chunk: Callback function that gets called when a single audio chunk is ready.
-        - tokenizer: Tokenizer to use for sentence splitting (currently "nltk" and "stanza" are supported).
+        - tokenizer: Tokenizer to use for sentence splitting ("segmenter", "nltk" and "stanza" are supported).
         - tokenize_sentences (Callable): A function that tokenizes sentences from the input text. You can write your own lightweight tokenizer here if you are unhappy with nltk and stanza. Defaults to None. Takes text as string and should return splitted sentences as list of strings.
         - language: Language to use for sentence splitting.
-        - context_size: The number of characters used to establish context for sentence boundary detection. A larger context improves the accuracy of detecting sentence boundaries. Default is 12 characters.
+        - context_size: The number of characters used to establish context for sentence boundary detection. A larger context improves the accuracy of detecting sentence boundaries. Default is 12 characters. Not used by the "segmenter" tokenizer, which decides on the first character after a delimiter run.
         - context_size_look_overhead: The number of characters to look ahead when determining sentence boundaries. This helps in identifying the end of a sentence more accurately. Default is 12 characters.
         - comma_silence_duration: The duration of silence to insert after a comma in seconds. Default is 0.0 seconds.
         - sentence_silence_duration: The duration of silence to insert after a sentence in seconds. Default is 0.0 seconds.
@@ -461,207 +509,233 @@ class TextToAudioStream:
                     self.is_playing_flag = False
                     self.play_lock.release()
         else:
-            try:
-                # Start the audio player to handle playback
-                if self.player:
-                    self.player.start()
-                    self.player.on_audio_chunk = self._on_audio_chunk
+            sentence_queue = queue.Queue()
 
-                # Generate sentences from the characters
-                generate_sentences = s2s.generate_sentences(
-                    self.thread_safe_char_iter,
-                    context_size=context_size,
-                    context_size_look_overhead=context_size_look_overhead,
-                    minimum_sentence_length=minimum_sentence_length,
-                    minimum_first_fragment_length=minimum_first_fragment_length,
-                    quick_yield_single_sentence_fragment=fast_sentence_fragment,
-                    quick_yield_for_all_sentences=fast_sentence_fragment_allsentences,
-                    quick_yield_every_fragment=fast_sentence_fragment_allsentences_multiple,
-                    cleanup_text_links=True,
-                    cleanup_text_emojis=True,
-                    tokenize_sentences=tokenize_sentences,
-                    tokenizer=tokenizer,
-                    language=language,
-                    log_characters=self.log_characters,
-                    sentence_fragment_delimiters=sentence_fragment_delimiters,
-                    force_first_fragment_after_words=force_first_fragment_after_words,
-                    # debug=debug,
-                )
-
-                # Create the synthesis chunk generator with the given sentences
-                chunk_generator = self._synthesis_chunk_generator(
-                    generate_sentences, buffer_threshold_seconds, log_synthesized_text
-                )
-
-                sentence_queue = queue.Queue()
-                sentence_count = 0
-
-                def synthesize_worker():
-                    nonlocal sentence_count
-                    while not abort_event.is_set():
-                        sentence = sentence_queue.get()
-                        if sentence is None:  # Sentinel value to stop the worker
-                            break
-
-                        sentence_count += 1
-
-                        synthesis_successful = False
-                        if log_synthesized_text:
-                            logging.debug(f"\033[96m\033[1m⚡ synthesizing\033[0m \033[37m→ \033[2m'\033[22m{sentence}\033[2m'\033[0m")
-
-                        while not synthesis_successful:
-                            try:
-                                if abort_event.is_set():
-                                    break
-
-                                if before_sentence_synthesized:
-                                    before_sentence_synthesized(sentence)
-
-                                success = self.engine.synthesize(sentence)
-
-                                # insert potential silence
-                                stream_format, _, sample_rate = self.engine.get_stream_info()
-
-                                end_sentence_delimeters = ".!?…。¡¿"
-                                mid_sentence_delimeters = ";:,\n()[]{}-“”„”—/|《》"
-
-                                text_stripped = sentence.strip()
-                                if text_stripped and text_stripped[-1] in end_sentence_delimeters:
-                                    silence_duration = sentence_silence_duration
-                                elif text_stripped and text_stripped[-1] in mid_sentence_delimeters:
-                                    silence_duration = comma_silence_duration
-                                else:
-                                    silence_duration = default_silence_duration
-
-                                if silence_duration > 0:
-                                    silent_samples = int(sample_rate * silence_duration)
-                                    if stream_format==pyaudio.paInt16:
-                                        silent_chunk = np.zeros(silent_samples, dtype=np.int16)
-                                    else:
-                                        silent_chunk = np.zeros(silent_samples, dtype=np.float32)
-                                    self.engine.queue.put(silent_chunk.tobytes())
-
-
-                                if success:
-                                    if on_sentence_synthesized:
-                                        on_sentence_synthesized(sentence)
-                                    synthesis_successful = True
-                                else:
-                                    logging.warning(
-                                        f'engine {self.engine.engine_name} failed to synthesize sentence "{sentence}", unknown error'
-                                    )
-
-                            except Exception as e:
-                                logging.warning(
-                                    f'engine {self.engine.engine_name} failed to synthesize sentence "{sentence}" with error: {e}'
-                                )
-                                tb_str = traceback.format_exc()
-                                print(f"Traceback: {tb_str}")
-                                print(f"Error: {e}")
-
-                            if not synthesis_successful:
-                                if len(self.engines) == 1:
-                                    time.sleep(0.2)
-                                    logging.warning(
-                                        f"engine {self.engine.engine_name} is the only engine available, can't switch to another engine"
-                                    )
-                                    break
-                                else:
-                                    logging.warning(
-                                        "fallback engine(s) available, switching to next engine"
-                                    )
-                                    self.engine_index = (self.engine_index + 1) % len(
-                                        self.engines
-                                    )
-
-                                    self.player.stop()
-                                    self.load_engine(self.engines[self.engine_index])
-                                    self.player.start()
-                                    self.player.on_audio_chunk = self._on_audio_chunk
-
-                        sentence_queue.task_done()
-
-                worker_thread = threading.Thread(target=synthesize_worker)
-                worker_thread.daemon = True
-                worker_thread.start()
-
-                # Iterate through the synthesized chunks and feed them to the engine for audio synthesis
-                for sentence in chunk_generator:
-                    if abort_event.is_set():
+            def synthesize_worker():
+                while not abort_event.is_set():
+                    item = sentence_queue.get()
+                    if item is None:  # Sentinel value to stop the worker
                         break
-                    if sentence.strip():
-                        sentence_queue.put(sentence)
-                    else:
-                        continue  # Skip empty sentences
+                    sentence, text_position = item
+                    if self.latency_probe is not None:
+                        self.latency_probe.mark("synthesis_start", text_position)
 
-                # Signal to the worker to stop
-                sentence_queue.put(None)
-                worker_thread.join()
+                    synthesis_successful = False
+                    if log_synthesized_text:
+                        logging.debug(f"\033[96m\033[1m⚡ synthesizing\033[0m \033[37m→ \033[2m'\033[22m{sentence}\033[2m'\033[0m")
 
-            except Exception as e:
-                self.error_flag = True
-                logging.warning(
-                    f"error in play() with engine {self.engine.engine_name}: {e}"
-                )
-                tb_str = traceback.format_exc()
-                print(f"Traceback: {tb_str}")
-                print(f"Error: {e}")
+                    while not synthesis_successful:
+                        try:
+                            if abort_event.is_set():
+                                break
 
-            finally:
+                            if before_sentence_synthesized:
+                                before_sentence_synthesized(sentence)
+
+                            success = self.engine.synthesize(sentence)
+
+                            # insert potential silence
+                            stream_format, _, sample_rate = self.stream_info
+
+                            end_sentence_delimeters = ".!?…。¡¿"
+                            mid_sentence_delimeters = ";:,\n()[]{}-“”„”—/|《》"
+
+                            text_stripped = sentence.strip()
+                            if text_stripped and text_stripped[-1] in end_sentence_delimeters:
+                                silence_duration = sentence_silence_duration
+                            elif text_stripped and text_stripped[-1] in mid_sentence_delimeters:
+                                silence_duration = comma_silence_duration
+                            else:
+                                silence_duration = default_silence_duration
+
+                            if silence_duration > 0:
+                                silent_samples = int(sample_rate * silence_duration)
+                                self.engine.queue.put(self._silence(stream_format, silent_samples))
+                                self.engine.audio_duration += silent_samples / sample_rate  # keeps word timings aligned
+
+
+                            if success:
+                                if on_sentence_synthesized:
+                                    on_sentence_synthesized(sentence)
+                                synthesis_successful = True
+                            else:
+                                logging.warning(
+                                    f'engine {self.engine.engine_name} failed to synthesize sentence "{sentence}", unknown error'
+                                )
+
+                        except Exception as e:
+                            logging.warning(
+                                f'engine {self.engine.engine_name} failed to synthesize sentence "{sentence}" with error: {e}'
+                            )
+                            tb_str = traceback.format_exc()
+                            print(f"Traceback: {tb_str}")
+                            print(f"Error: {e}")
+
+                        if not synthesis_successful:
+                            if len(self.engines) == 1:
+                                time.sleep(0.2)
+                                logging.warning(
+                                    f"engine {self.engine.engine_name} is the only engine available, can't switch to another engine"
+                                )
+                                break
+                            else:
+                                logging.warning(
+                                    "fallback engine(s) available, switching to next engine"
+                                )
+                                self.engine_index = (self.engine_index + 1) % len(
+                                    self.engines
+                                )
+
+                                self.player.stop()
+                                self.load_engine(self.engines[self.engine_index])
+                                self.player.start()
+                                self.player.on_audio_chunk = self._on_audio_chunk
+
+                    sentence_queue.task_done()
+                    with self._feed_cond:
+                        self._feed_cond.notify_all()
+
+            # The play session: the player and the synthesis worker stay up while passes over the fed text run.
+            # A pass ends when the text iterator runs out; text fed before the worker synthesized everything
+            # queued is read by another pass at once (and can be prefetched while earlier sentences render).
+            # Only text fed while the player drains at the very end starts the player again.
+            while True:
+                worker_thread = None
                 try:
+                    # Start the audio player to handle playback
+                    if self.player:
+                        self.player.start()
+                        self.player.on_audio_chunk = self._on_audio_chunk
+
+                    worker_thread = threading.Thread(target=synthesize_worker)
+                    worker_thread.daemon = True
+                    worker_thread.start()
+
+                    while True:
+                        self._play_pass(
+                            sentence_queue, abort_event, tokenizer, tokenize_sentences, language,
+                            context_size, context_size_look_overhead, minimum_sentence_length,
+                            minimum_first_fragment_length, fast_sentence_fragment,
+                            fast_sentence_fragment_allsentences, fast_sentence_fragment_allsentences_multiple,
+                            sentence_fragment_delimiters, force_first_fragment_after_words,
+                            buffer_threshold_seconds, log_synthesized_text,
+                        )
+                        # feed(), the worker's task_done() and stop() notify _feed_cond, so no timeout is needed
+                        with self._feed_cond:
+                            while not (self._session_continues(abort_event)
+                                       or sentence_queue.unfinished_tasks == 0
+                                       or abort_event.is_set()
+                                       or self.char_iter.immediate_stop.is_set()):
+                                self._feed_cond.wait()
+                            if not self._session_continues(abort_event):
+                                break
+                        self.session_passes += 1
+                        logging.info("text fed while playing, continuing the play session")
+
+                except Exception as e:
+                    self.error_flag = True
+                    logging.warning(
+                        f"error in play() with engine {self.engine.engine_name}: {e}"
+                    )
+                    tb_str = traceback.format_exc()
+                    print(f"Traceback: {tb_str}")
+                    print(f"Error: {e}")
+
+                finally:
+                    if worker_thread is not None:
+                        # Signal to the worker to stop
+                        sentence_queue.put(None)
+                        worker_thread.join()
                     if self.player:
                         self.player.stop()
 
-                    self.abort_events.remove(abort_event)
+                with self._feed_cond:
+                    # decided together with feed(): text fed after this sees is_playing() False
+                    if self._session_continues(abort_event):
+                        self.session_restarts += 1
+                        logging.info("text fed while the player drained, restarting the player")
+                        continue
                     self.stream_running = False
-                    logging.info("stream stop")
-
+                    self.abort_events.remove(abort_event)
                     self.output_wavfile = None
                     self.chunk_callback = None
-
-                finally:
                     if output_wavfile and self.wf:
                         self.wf.close()
                         self.wf = None
+                    logging.info("stream stop")
+                    if is_external_call:
+                        self.is_playing_flag = False
+                        self.play_lock.release()
+                break
 
-            if (not self.error_flag
-                and len(self.char_iter.items) > 1
-                and self.char_iter.iterated_text == ""
-                and not self.char_iter.immediate_stop.is_set()
+            if is_external_call and self.on_audio_stream_stop:
+                self.on_audio_stream_stop()
+
+    def _session_continues(self, abort_event: threading.Event) -> bool:
+        """Whether the play session has text left to read: fed after the last pass's iterator ran out."""
+        return (not self.error_flag
                 and not abort_event.is_set()
-                and not (sentence_count == 0 and not is_external_call)
-            ):
-
-                logging.info(f"{len(self.char_iter.items)} unprocessed characters left, recursively calling play()")
-
-                # new text was feeded while playing audio but after the last character was processed
-                # we need to start another play() call (!recursively!)
-                self.play(
-                    fast_sentence_fragment=fast_sentence_fragment,
-                    buffer_threshold_seconds=buffer_threshold_seconds,
-                    minimum_sentence_length=minimum_sentence_length,
-                    minimum_first_fragment_length=minimum_first_fragment_length,
-                    log_synthesized_text=log_synthesized_text,
-                    reset_generated_text=False,
-                    output_wavfile=output_wavfile,
-                    on_sentence_synthesized=on_sentence_synthesized,
-                    on_audio_chunk=on_audio_chunk,
-                    tokenizer=tokenizer,
-                    language=language,
-                    context_size=context_size,
-                    muted=muted,
-                    sentence_fragment_delimiters=sentence_fragment_delimiters,
-                    force_first_fragment_after_words=force_first_fragment_after_words,
-                    is_external_call=False,
-                    debug=debug,
-                )
-
-            if is_external_call:
-                if self.on_audio_stream_stop:
-                    self.on_audio_stream_stop()
-
-                self.is_playing_flag = False
-                self.play_lock.release()
+                and not self.char_iter.immediate_stop.is_set()
+                and self.char_iter.has_pending())
+
+    def _play_pass(self, sentence_queue, abort_event, tokenizer, tokenize_sentences, language, context_size,
+                   context_size_look_overhead, minimum_sentence_length, minimum_first_fragment_length,
+                   fast_sentence_fragment, fast_sentence_fragment_allsentences,
+                   fast_sentence_fragment_allsentences_multiple, sentence_fragment_delimiters,
+                   force_first_fragment_after_words, buffer_threshold_seconds, log_synthesized_text):
+        """One pass of a play session: split the text of the current iterator and queue it for synthesis."""
+        # Generate sentences from the text chunks
+        if tokenizer == "segmenter" and tokenize_sentences is None:
+            generate_sentences = segment_sentences(
+                self.thread_safe_char_iter,
+                minimum_sentence_length=minimum_sentence_length,
+                minimum_first_fragment_length=minimum_first_fragment_length,
+                quick_yield_single_sentence_fragment=fast_sentence_fragment,
+                quick_yield_for_all_sentences=fast_sentence_fragment_allsentences,
+                quick_yield_every_fragment=fast_sentence_fragment_allsentences_multiple,
+                cleanup_text_links=True,
+                cleanup_text_emojis=True,
+                sentence_fragment_delimiters=sentence_fragment_delimiters,
+                force_first_fragment_after_words=force_first_fragment_after_words,
+            )
+        else:
+            import stream2sentence as s2s
+            generate_sentences = s2s.generate_sentences(
+                self.thread_safe_char_iter,
+                context_size=context_size,
+                context_size_look_overhead=context_size_look_overhead,
+                minimum_sentence_length=minimum_sentence_length,
+                minimum_first_fragment_length=minimum_first_fragment_length,
+                quick_yield_single_sentence_fragment=fast_sentence_fragment,
+                quick_yield_for_all_sentences=fast_sentence_fragment_allsentences,
+                quick_yield_every_fragment=fast_sentence_fragment_allsentences_multiple,
+                cleanup_text_links=True,
+                cleanup_text_emojis=True,
+                tokenize_sentences=tokenize_sentences,
+                tokenizer=tokenizer,
+                language=language,
+                log_characters=self.log_characters,
+                sentence_fragment_delimiters=sentence_fragment_delimiters,
+                force_first_fragment_after_words=force_first_fragment_after_words,
+            )
+
+        # Create the synthesis chunk generator with the given sentences
+        chunk_generator = self._synthesis_chunk_generator(
+            generate_sentences, buffer_threshold_seconds, log_synthesized_text
+        )
+
+        # Iterate through the synthesized chunks and feed them to the engine for audio synthesis
+        for sentence in chunk_generator:
+            if abort_event.is_set():
+                break
+            if sentence.strip():
+                # let engines with spare workers start rendering while earlier sentences play
+                self.engine.prefetch(sentence)
+                text_position = 0
+                if self.latency_probe is not None:
+                    text_position = self.latency_probe.position("segmenter_in")
+                    self.latency_probe.mark("segmented", text_position)
+                sentence_queue.put((sentence, text_position))
 
     def pause(self):
         """
@@ -696,6 +770,10 @@ class TextToAudioStream:
             self.player.stop(immediate=True)
             self.stream_running = False
 
+        # a play session waiting for its synthesis worker or for more text sees the abort at once
+        with self._feed_cond:
+            self._feed_cond.notify_all()
+
         if self.play_thread is not None:
             if self.play_thread.is_alive():
                 self.play_thread.join()
@@ -723,6 +801,42 @@ class TextToAudioStream:
         """
         return self.stream_running or self.is_playing_flag
 
+    @property
+    def is_playing_flag(self) -> bool:
+        return self._is_playing_flag
+
+    @is_playing_flag.setter
+    def is_playing_flag(self, value: bool):
+        with self._play_state:
+            self._is_playing_flag = value
+            self._play_state.notify_all()
+
+    @property
+    def stream_running(self) -> bool:
+        return self._stream_running
+
+    @stream_running.setter
+    def stream_running(self, value: bool):
+        with self._play_state:
+            self._stream_running = value
+            self._play_state.notify_all()
+
+    def wait_until_stopped(self, should_stop=None, timeout=None) -> bool:
+        """
+        Block until the stream stopped playing; returns False instead if should_stop() became true or timeout
+        seconds passed first. Whoever makes should_stop() true has to call wake_waiters() for the wait to notice.
+        """
+        with self._play_state:
+            self._play_state.wait_for(
+                lambda: not self.is_playing() or (should_stop is not None and should_stop()), timeout
+            )
+            return not self.is_playing()
+
+    def wake_waiters(self):
+        """Wake the threads blocked in wait_until_stopped(), e.g. so they can notice a stop request."""
+        with self._play_state:
+            self._play_state.notify_all()
+
     def _on_audio_stream_start(self):
         """
         Handles the start of the audio stream.
@@ -744,21 +858,29 @@ class TextToAudioStream:
         if self.on_word_spoken:
             self.on_word_spoken(word)
 
+    def _silence(self, stream_format, samples: int) -> bytes:
+        """Silent chunk of samples samples, built once per length and shared (bytes are immutable)."""
+        key = (stream_format, samples)
+        chunk = self._silence_cache.get(key)
+        if chunk is None:
+            width = 2 if stream_format == pyaudio.paInt16 else 4
+            chunk = bytes(samples * width)  # all zero bytes is silence in both int16 and float32
+            self._silence_cache[key] = chunk
+        return chunk
+
     def _on_audio_chunk(self, chunk):
         """
         Postprocessing of single chunks of audio data.
-        This method is called for each chunk of audio data processed. It first determines the audio stream format.
-        If the format is `pyaudio.paFloat32`, we convert to paInt16.
+        This method is called for each chunk of audio data processed.
+        int16 chunks are passed on as they are; if the format is `pyaudio.paFloat32`, we convert to paInt16.
+        Engines that can should produce int16 themselves so this stays a no-op.
 
         Args:
             chunk (bytes): The audio data chunk to be processed.
         """
-        format, channels, sample_rate = self.engine.get_stream_info()
-
-        if format == pyaudio.paFloat32:
-            audio_data = np.frombuffer(chunk, dtype=np.float32)
-            audio_data = np.int16(audio_data * 32767)
-            chunk = audio_data.tobytes()
+        if self.stream_info[0] == pyaudio.paFloat32:
+            audio_data = np.clip(np.frombuffer(chunk, dtype=np.float32), -1.0, 1.0) * 32767
+            chunk = np.rint(audio_data, out=audio_data).astype(np.int16).tobytes()
 
         if self.output_wavfile and self.wf:
             if self._is_engine_mpeg():
@@ -783,7 +905,11 @@ class TextToAudioStream:
         if self.log_characters:
             print()
 
-        self._create_iterators()
+        with self._feed_cond:
+            # text fed after the iterator ran out of items is carried over; the play session reads it next
+            unread = self.char_iter.unread_items()
+            self._create_iterators()
+            self.char_iter.items.extend(unread)
 
     def _create_iterators(self):
         """
@@ -810,17 +936,29 @@ class TextToAudioStream:
 
     def _on_character(self, char: str):
         """
-        This method is called for each character that is processed in the text stream.
-        It accumulates the characters and invokes a callback.
+        This method is called for each text fragment that is processed in the text stream.
+        It accumulates the text and invokes a callback.
 
         Args:
-            char (str): The character currently being processed.
+            char (str): The fragment currently being processed.
         """
         # If an on_character callback is defined, invoke it for the current character
         if self.on_character:
             self.on_character(char)
 
-        self.generated_text += char
+        if self.latency_probe is not None:
+            self.latency_probe.record("segmenter_in", len(char))
+
+        self._generated_parts.append(char)
+
+    @property
+    def generated_text(self) -> str:
+        """The text passed to synthesis so far."""
+        return "".join(self._generated_parts)
+
+    @generated_text.setter
+    def generated_text(self, text: str):
+        self._generated_parts = [text] if text else []
 
     def _is_engine_mpeg(self):
         """
@@ -829,9 +967,17 @@ class TextToAudioStream:
         Returns:
             Boolean indicating if the engine is an MPEG engine.
         """
-        format, channel, rate = self.engine.get_stream_info()
+        format, channel, rate = self.stream_info
         return format == pyaudio.paCustomFormat and channel == -1 and rate == -1
 
+    def _buffered_seconds(self) -> float:
+        """Seconds of audio queued for playback: from buffer_depth if given, else from the internal player."""
+        if self.buffer_depth is not None:
+            return self.buffer_depth()
+        if self.player:
+            return self.player.get_buffered_seconds()
+        return 0.0
+
     def _synthesis_chunk_generator(
         self,
         generator: Iterator[str],
@@ -842,7 +988,8 @@ class TextToAudioStream:
         Generates synthesis chunks based on buffered audio length.
 
         The function buffers chunks of synthesis until the buffered audio seconds fall below the provided threshold.
-        Once the threshold is crossed, the buffered synthesis chunk is yielded.
+        Once the threshold is crossed, the buffered synthesis chunk is yielded, also while no new chunk arrives.
+        The buffered seconds come from _buffered_seconds() (the buffer_depth given to the stream, if any).
 
         Args:
             generator: Input iterator that provides chunks for synthesis.
@@ -854,86 +1001,204 @@ class TextToAudioStream:
         """
         def is_punct_run(s: str) -> bool:
             # Includes unicode ellipsis \u2026
-            return re.fullmatch(r"[\.\?\!;:,\u2026]+", s.strip()) is not None
-
+            return _PUNCT_RUN.fullmatch(s.strip()) is not None
 
         def is_closing_trailer(s: str) -> bool:
             # Closing quotes/brackets that often follow punctuation
-            return re.fullmatch(r"[\"'”’\)\]\}]+", s.strip()) is not None
+            return _CLOSING_TRAILER.fullmatch(s.strip()) is not None
 
         def endswith_punct(s: str) -> bool:
-            return re.search(r"[\.\?\!;:,\u2026]$", s.strip()) is not None
+            return _ENDS_WITH_PUNCT.search(s.strip()) is not None
 
         def starts_with_punct_run(s: str) -> bool:
-            return re.match(r"^\s*[\.\?\!;:,\u2026]+", s) is not None
+            return _STARTS_WITH_PUNCT_RUN.match(s) is not None
 
-        synthesis_chunk = ""
-        it = iter(generator)
-        lookahead = None
+        items = queue.Queue()
 
-        while True:
-            chunk = lookahead if lookahead is not None else next(it, None)
-            if chunk is None:
-                break
+        def pump():
+            # the sentence generator blocks until the llm writes more text; on its own thread it cannot hold up
+            # the look at the next chunk, and a chunk kept back is released as soon as the queued audio runs low
+            try:
+                for item in generator:
+                    items.put(item)
+            except Exception as e:
+                items.put(e)
+            items.put(_END)
+
+        char_iter = self.char_iter
+        pump_thread = threading.Thread(target=pump, daemon=True)
+        pump_thread.start()
+        ended = False
+
+        def take(timeout=None):
+            """Next chunk; None once the generator ended, _NOTHING if none arrived within timeout (0: no wait)."""
+            nonlocal ended
+            if ended:
+                return None
+            try:
+                item = items.get_nowait() if timeout == 0 else items.get(timeout=timeout)
+            except queue.Empty:
+                return _NOTHING
+            if item is _END:
+                ended = True
+                return None
+            if isinstance(item, Exception):
+                raise item
+            return item
+
+        try:
+            synthesis_chunk = ""
             lookahead = None
+            buffered_audio_seconds = 0.0
 
-            # Accumulate text or punctuation (and attach closing quotes/brackets after punctuation)
-            if is_punct_run(chunk) and synthesis_chunk:
-                synthesis_chunk = synthesis_chunk.rstrip() + chunk + " "
-            elif is_closing_trailer(chunk) and synthesis_chunk and endswith_punct(synthesis_chunk):
-                synthesis_chunk = synthesis_chunk.rstrip() + chunk + " "
-            else:
-                if synthesis_chunk and not synthesis_chunk.endswith(" ") and not chunk.startswith(" "):
-                    synthesis_chunk += " "
-                synthesis_chunk += chunk
+            while True:
+                if lookahead is not None:
+                    chunk, lookahead = lookahead, None
+                else:
+                    # while a merged chunk is kept back, wake up now and then to see whether the buffer ran low
+                    chunk = take(self.buffer_poll_interval if synthesis_chunk else None)
+                    if chunk is _NOTHING:
+                        buffered_audio_seconds = self._buffered_seconds() if buffer_threshold_seconds > 0 else 0.0
+                        if buffered_audio_seconds < buffer_threshold_seconds or buffer_threshold_seconds <= 0:
+                            if log_synthesis_chunks:
+                                logging.info(f'-- ["{synthesis_chunk}"], buffered {buffered_audio_seconds:1f}s')
+                            if not is_punct_run(synthesis_chunk):
+                                yield synthesis_chunk.rstrip().lower()
+                            synthesis_chunk = ""
+                        continue
+                    if chunk is None:
+                        break
 
-            # Determine buffered seconds
-            if self.player:
-                buffered_audio_seconds = self.player.get_buffered_seconds()
-            else:
-                buffered_audio_seconds = 0
-
-            # Yield policy (immediate when threshold <= 0)
-            if (
-                buffered_audio_seconds < buffer_threshold_seconds
-                or buffer_threshold_seconds <= 0
-            ):
-                # Peek ahead one chunk; if it's punctuation-only, starts with a punctuation run,
-                # or is a closing trailer right after punctuation, merge and continue
-                nxt = next(it, None)
-                if nxt is not None and (
-                    is_punct_run(nxt)
-                    or starts_with_punct_run(nxt)
-                    or (is_closing_trailer(nxt) and endswith_punct(synthesis_chunk))
-                ):
-                    synthesis_chunk = synthesis_chunk.rstrip() + nxt + " "
-                    # Do not yield yet; continue accumulating
-                    continue
+                # Accumulate text or punctuation (and attach closing quotes/brackets after punctuation)
+                if is_punct_run(chunk) and synthesis_chunk:
+                    synthesis_chunk = synthesis_chunk.rstrip() + chunk + " "
+                elif is_closing_trailer(chunk) and synthesis_chunk and endswith_punct(synthesis_chunk):
+                    synthesis_chunk = synthesis_chunk.rstrip() + chunk + " "
                 else:
-                    if nxt is not None:
-                        lookahead = nxt
-                    if log_synthesis_chunks:
-                        logging.info(
-                            f'-- ["{synthesis_chunk}"], buffered {buffered_audio_seconds:1f}s'
-                        )
-                    # Avoid yielding punctuation-only as a standalone chunk
-                    if is_punct_run(synthesis_chunk):
-                        synthesis_chunk = ""
+                    if synthesis_chunk and not synthesis_chunk.endswith(" ") and not chunk.startswith(" "):
+                        synthesis_chunk += " "
+                    synthesis_chunk += chunk
+
+                # Determine buffered seconds
+                buffered_audio_seconds = self._buffered_seconds() if buffer_threshold_seconds > 0 else 0.0
+
+                # Yield policy (immediate when threshold <= 0)
+                if (
+                    buffered_audio_seconds < buffer_threshold_seconds
+                    or buffer_threshold_seconds <= 0
+                ):
+                    # Peek at the chunk after it if it already arrived; if it's punctuation-only, starts with a
+                    # punctuation run, or is a closing trailer right after punctuation, merge and continue
+                    nxt = take(0)
+                    if nxt is not None and nxt is not _NOTHING and (
+                        is_punct_run(nxt)
+                        or starts_with_punct_run(nxt)
+                        or (is_closing_trailer(nxt) and endswith_punct(synthesis_chunk))
+                    ):
+                        synthesis_chunk = synthesis_chunk.rstrip() + nxt + " "
+                        # Do not yield yet; continue accumulating
                         continue
-                    yield synthesis_chunk.rstrip().lower()
-                    synthesis_chunk = ""
-            else:
-                logging.info(
-                    f"summing up chunks because buffer {buffered_audio_seconds:.1f} > threshold ({buffer_threshold_seconds:.1f}s)"
-                )
-
-        # After iterating over all chunks, check if there's any remaining data in synthesis_chunk
-        if synthesis_chunk:
-            # If the log_synthesis_chunks flag is True, log the remaining synthesis_chunk
-            if log_synthesis_chunks and not is_punct_run(synthesis_chunk):
-                logging.info(
-                    f'-- ["{synthesis_chunk}"], buffered {buffered_audio_seconds:.1f}s'
-                )
-
-            # Yield the remaining synthesis_chunk, stripping only trailing spaces
-            yield synthesis_chunk.rstrip()
\ No newline at end of file
+                    else:
+                        if nxt is not None and nxt is not _NOTHING:
+                            lookahead = nxt
+                        if log_synthesis_chunks:
+                            logging.info(
+                                f'-- ["{synthesis_chunk}"], buffered {buffered_audio_seconds:1f}s'
+                            )
+                        # Avoid yielding punctuation-only as a standalone chunk
+                        if is_punct_run(synthesis_chunk):
+                            synthesis_chunk = ""
+                            continue
+                        yield synthesis_chunk.rstrip().lower()
+                        synthesis_chunk = ""
+                else:
+                    logging.info(
+                        f"summing up chunks because buffer {buffered_audio_seconds:.1f} > threshold ({buffer_threshold_seconds:.1f}s)"
+                    )
+
+            # After iterating over all chunks, check if there's any remaining data in synthesis_chunk
+            if synthesis_chunk:
+                # If the log_synthesis_chunks flag is True, log the remaining synthesis_chunk
+                if log_synthesis_chunks and not is_punct_run(synthesis_chunk):
+                    logging.info(
+                        f'-- ["{synthesis_chunk}"], buffered {buffered_audio_seconds:.1f}s'
+                    )
+
+                # Yield the remaining synthesis_chunk, stripping only trailing spaces
+                yield synthesis_chunk.rstrip()
+        finally:
+            if not ended:
+                # the pass was abandoned (aborted, or the consumer closed this generator): end the text iteration
+                # so the pump leaves the llm iterator at its next token instead of running the text callbacks
+                # alongside the next pass
+                char_iter.stop()
+            pump_thread.join(timeout=self.pump_join_timeout)
+            if pump_thread.is_alive():
+                logging.warning("sentence pump still blocked in the text iterator after the pass ended")
+
+
+if __name__ == "__main__":
+    # Latency of text fed to a stream that is already playing (run with python -m realtimetts_clone.text_to_stream).
+    # The engine needs 0.25 s per sentence and a sentence is fed every 0.15 s, so every feed lands while earlier
+    # sentences are still being synthesized: the play session reads it in another pass at once. For comparison,
+    # the same sentences each get a play() of their own once the previous one ended, which is what the old
+    # recursive play() did for text fed late (it re-entered play() only after the running one had finished).
+    class _BenchEngine(BaseEngine):
+        def post_init(self):
+            self.engine_name = "bench"
+            self.queued_at = {}
+
+        def get_stream_info(self):
+            return pyaudio.paInt16, 1, 24000
+
+        def prefetch(self, text):
+            self.queued_at.setdefault(text, time.perf_counter())
+            return False
+
+        def synthesize(self, text):
+            time.sleep(0.25)
+            self.queue.put(bytes(4800))
+            return True
+
+    sentences = [f"this is sentence number {i} of the reply." for i in range(12)]
+
+    def feed_while_playing():
+        engine = _BenchEngine()
+        stream = TextToAudioStream(engine, muted=True)
+        fed_at = {}
+        for i, sentence in enumerate(sentences):
+            fed_at[sentence] = time.perf_counter()
+            stream.feed(sentence + " ")
+            if i == 0:
+                stream.play_async(buffer_threshold_seconds=0.0)
+            time.sleep(0.15)
+        while stream.is_playing():
+            time.sleep(0.01)
+        delays = [engine.queued_at[s] - fed_at[s] for s in sentences if s in engine.queued_at]
+        return delays, stream
+
+    def play_per_sentence():
+        engine = _BenchEngine()
+        stream = TextToAudioStream(engine, muted=True)
+        start, delays = time.perf_counter(), []
+        for i, sentence in enumerate(sentences):
+            available_at = start + i * 0.15  # same schedule as above
+            time.sleep(max(0.0, available_at - time.perf_counter()))
+            while stream.is_playing():
+                time.sleep(0.001)
+            stream.feed(sentence + " ")
+            stream.play_async(buffer_threshold_seconds=0.0)
+            while sentence not in engine.queued_at:
+                time.sleep(0.0005)
+            delays.append(engine.queued_at[sentence] - available_at)
+        while stream.is_playing():
+            time.sleep(0.01)
+        return delays, stream
+
+    delays, stream = feed_while_playing()
+    print(f"fed while playing: {len(delays)}/{len(sentences)} sentences queued for synthesis, feed -> queued "
+          f"mean {sum(delays) / len(delays) * 1000:.2f} ms, max {max(delays) * 1000:.2f} ms; "
+          f"{stream.session_passes} more passes, {stream.session_restarts} player restarts, one play() call")
+    delays, stream = play_per_sentence()
+    print(f"play() per sentence: text available -> queued mean {sum(delays) / len(delays) * 1000:.0f} ms, "
+          f"max {max(delays) * 1000:.0f} ms (waits for the previous play to end)")
@@ -6,14 +6,17 @@ This module offers tools for safe, thread-friendly iteration over generators and
 Classes:
 
 1. CharIterator:
-   - Iterates over characters from strings or string iterators.
-   - Logs each character and triggers callbacks for the first and last text chunks.
+   - Iterates over the text of strings or string iterators in chunks: a token, or all strings fed back to back.
+   - Logs each chunk and triggers callbacks for the first and last text chunks.
    - Can be stopped instantly with a threading event.
 
 2. AccumulatingThreadSafeGenerator:
    - Wraps a generator for safe multi-threaded token consumption.
    - Accumulates tokens into a full text.
    - Uses locks to avoid race conditions and supports first/last token callbacks.
+
+Both keep the text they passed on as a list of chunks and only join it when it is asked for. Running this module
+directly measures the per-reply cost against the former per-character iteration.
 """
 
 
@@ -25,17 +28,19 @@ from dataclasses import dataclass, field
 @dataclass
 class CharIterator:
     """
-    An iterator that allows iteration over characters of strings or string iterators.
+    An iterator over the text of strings or string iterators.
+    It yields chunks rather than single characters: one item of a fed iterator (a token, passed on as soon as it
+    arrives), or all strings that were fed one after the other, joined. The sentence splitter consumes any chunking.
     
     Attributes:
         items (List[Union[str, Iterator[str]]]): The list of strings or string iterators.
         _index (int): Current index in the items list being iterated.
-        _char_index (Optional[int]): Current character index in the current string.
         _current_iterator (Optional[Iterator[str]]): Current iterator being consumed.
         immediate_stop (threading.Event): Event signaling to stop iteration.
-        iterated_text (str): Accumulates the characters that have been iterated over.
-        log_characters (bool): If True, logs processed characters.
-        on_character (Callable): Callback on each character processed.
+        iterated_text (str): The text that has been iterated over (joined from _parts when read).
+        _parts (list): The chunks iterated over.
+        log_characters (bool): If True, logs processed text.
+        on_character (Callable): Callback on each chunk processed.
         on_first_text_chunk (Callable): Callback on receiving the first text chunk.
         on_last_text_chunk (Callable): Callback on receiving the last text chunk.
         first_chunk_received (bool): Flag indicating if the first chunk was processed.
@@ -48,16 +53,27 @@ class CharIterator:
 
     items: list = field(default_factory=list)
     _index: int = 0
-    _char_index: Optional[int] = None
     _current_iterator: Optional[Iterator[str]] = None
     immediate_stop: threading.Event = field(default_factory=threading.Event)
-    iterated_text: str = ""
+    _parts: list = field(default_factory=list)
     first_chunk_received: bool = False
 
+    @property
+    def iterated_text(self) -> str:
+        return "".join(self._parts)
+
     def add(self, item: Union[str, Iterator[str]]) -> None:
         """Add a string or a string iterator to the list of items."""
         self.items.append(item)
 
+    def has_pending(self) -> bool:
+        """Whether items were added that were not (completely) iterated yet."""
+        return self._current_iterator is not None or self._index < len(self.items)
+
+    def unread_items(self) -> list:
+        """Items not started yet."""
+        return self.items[self._index + (1 if self._current_iterator is not None else 0):]
+
     def stop(self) -> None:
         """Signal the iterator to stop immediately during the next iteration."""
         self.immediate_stop.set()
@@ -66,64 +82,58 @@ class CharIterator:
         """Return the iterator object itself."""
         return self
 
-    def _log_and_trigger(self, char: str) -> None:
-        """Log character and trigger associated callbacks."""
-        self.iterated_text += char
+    def _log_and_trigger(self, text: str) -> None:
+        """Log text and trigger associated callbacks."""
+        self._parts.append(text)
         if self.log_characters:
-            print(char, end="", flush=True)
+            print(text, end="", flush=True)
         if self.on_character:
-            self.on_character(char)
+            self.on_character(text)
         if not self.first_chunk_received and self.on_first_text_chunk:
             self.on_first_text_chunk()
             self.first_chunk_received = True
 
     def __next__(self) -> str:
-        """Fetch the next character from the current string or string iterator."""
+        """Fetch the next chunk from the fed strings or the current string iterator."""
         if self.immediate_stop.is_set():
             raise StopIteration
 
-        while self._index < len(self.items):
-            item = self.items[self._index]
+        items = self.items
+        while self._index < len(items):
+            item = items[self._index]
 
             if isinstance(item, str):
-                if self._char_index is None:
-                    self._char_index = 0
-
-                if self._char_index < len(item):
-                    char = item[self._char_index]
-                    self._char_index += 1
-                    self._log_and_trigger(char)
-                    return char
-                else:
-                    self._char_index = None
-                    self._index += 1
+                # strings fed back to back go out as one chunk
+                end = self._index + 1
+                while end < len(items) and isinstance(items[end], str):
+                    end += 1
+                if end - self._index > 1:
+                    item = "".join(items[self._index:end])
+                self._index = end
+                if item:
+                    self._log_and_trigger(item)
+                    return item
 
             else:  # item is an iterator
                 if self._current_iterator is None:
                     self._current_iterator = iter(item)
 
-                if self._char_index is None:
-                    try:
-                        self._current_str = next(self._current_iterator)
-                        if hasattr(self._current_str, "choices"):
-                            self._current_str = str(self._current_str.choices[0].delta.content) or ""
-                    except StopIteration:
-                        self._char_index = None
-                        self._current_iterator = None
-                        self._index += 1
-                        continue
-
-                    self._char_index = 0
-
-                if self._char_index < len(self._current_str):
-                    char = self._current_str[self._char_index]
-                    self._char_index += 1
-                    self._log_and_trigger(char)
-                    return char
-                else:
-                    self._char_index = None
+                try:
+                    fragment = next(self._current_iterator)
+                    if not isinstance(fragment, str) and hasattr(fragment, "choices"):
+                        fragment = str(fragment.choices[0].delta.content) or ""
+                except StopIteration:
+                    self._current_iterator = None
+                    self._index += 1
+                    continue
+
+                if self.immediate_stop.is_set():
+                    raise StopIteration
+                if fragment:
+                    self._log_and_trigger(fragment)
+                    return fragment
 
-        if self.iterated_text and self.on_last_text_chunk:
+        if self._parts and self.on_last_text_chunk:
             self.on_last_text_chunk()
 
         raise StopIteration
@@ -146,7 +156,7 @@ class AccumulatingThreadSafeGenerator:
         self.lock = threading.Lock()
         self.generator = gen_func
         self.exhausted = False
-        self.iterated_text = ""
+        self._parts = []
         self.on_first_text_chunk = on_first_text_chunk
         self.on_last_text_chunk = on_last_text_chunk
         self.first_chunk_received = False
@@ -160,7 +170,7 @@ class AccumulatingThreadSafeGenerator:
         with self.lock:
             try:
                 token = next(self.generator)
-                self.iterated_text += str(token)
+                self._parts.append(token if isinstance(token, str) else str(token))
 
                 if not self.first_chunk_received and self.on_first_text_chunk:
                     self.on_first_text_chunk()
@@ -169,7 +179,7 @@ class AccumulatingThreadSafeGenerator:
                 return token
 
             except StopIteration:
-                if self.iterated_text and self.on_last_text_chunk:
+                if self._parts and self.on_last_text_chunk:
                     self.on_last_text_chunk()
                 self.exhausted = True
                 raise
@@ -182,4 +192,107 @@ class AccumulatingThreadSafeGenerator:
     def accumulated_text(self) -> str:
         """Retrieve the accumulated text from the iterated tokens."""
         with self.lock:
-            return self.iterated_text
\ No newline at end of file
+            if len(self._parts) > 1:
+                self._parts[:] = ["".join(self._parts)]
+            return self._parts[0] if self._parts else ""
+
+if __name__ == "__main__":
+    # Per-reply cost of the text iteration the stream does: a reply of LLM tokens (1 to 6 characters) fed as an
+    # iterator, or as the strings of finished sentences, runs through CharIterator and
+    # AccumulatingThreadSafeGenerator with a callback that accumulates the text like TextToAudioStream does.
+    # The former iteration passed on one character at a time and accumulated with string concatenation.
+    import random
+    import time
+
+    class _PerCharacterIterator:
+        """The former CharIterator: one character per next(), string accumulation."""
+
+        def __init__(self, on_character=None):
+            self.items, self._index, self._char_index = [], 0, None
+            self._current_iterator, self._current_str = None, ""
+            self.iterated_text, self.on_character = "", on_character
+            self.immediate_stop = threading.Event()
+
+        def add(self, item):
+            self.items.append(item)
+
+        def __iter__(self):
+            return self
+
+        def _log_and_trigger(self, char):
+            self.iterated_text += char
+            if self.on_character:
+                self.on_character(char)
+
+        def __next__(self):
+            if self.immediate_stop.is_set():
+                raise StopIteration
+            while self._index < len(self.items):
+                item = self.items[self._index]
+                if isinstance(item, str):
+                    if self._char_index is None:
+                        self._char_index = 0
+                    if self._char_index < len(item):
+                        char = item[self._char_index]
+                        self._char_index += 1
+                        self._log_and_trigger(char)
+                        return char
+                    self._char_index = None
+                    self._index += 1
+                else:
+                    if self._current_iterator is None:
+                        self._current_iterator = iter(item)
+                    if self._char_index is None:
+                        try:
+                            self._current_str = next(self._current_iterator)
+                            if hasattr(self._current_str, "choices"):
+                                self._current_str = str(self._current_str.choices[0].delta.content) or ""
+                        except StopIteration:
+                            self._char_index, self._current_iterator = None, None
+                            self._index += 1
+                            continue
+                        self._char_index = 0
+                    if self._char_index < len(self._current_str):
+                        char = self._current_str[self._char_index]
+                        self._char_index += 1
+                        self._log_and_trigger(char)
+                        return char
+                    self._char_index = None
+            raise StopIteration
+
+    class _StringAccumulator(AccumulatingThreadSafeGenerator):
+        """The former accumulator: str(token) concatenated under the lock."""
+
+        def __next__(self):
+            with self.lock:
+                token = next(self.generator)
+                self.iterated_text = getattr(self, "iterated_text", "") + str(token)
+                return token
+
+    rng = random.Random(3)
+    sentence = "Well, I suppose that is fine, but the doctor said the results were normal and I am still worried. "
+    reply = sentence * 6
+    tokens, i = [], 0
+    while i < len(reply):
+        n = rng.randint(1, 6)
+        tokens.append(reply[i:i + n])
+        i += n
+    sentences = [sentence] * 6
+
+    def run(iterator_class, accumulator_class, feed, repeats=300):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            generated = []
+            iterator = iterator_class(on_character=generated.append)
+            for item in feed():
+                iterator.add(item)
+            for _ in accumulator_class(iterator):
+                pass
+            "".join(generated)
+        return (time.perf_counter() - start) / repeats
+
+    for name, feed in (("token iterator", lambda: [iter(tokens)]), ("sentence strings", lambda: sentences)):
+        before = run(_PerCharacterIterator, _StringAccumulator, feed)
+        after = run(CharIterator, AccumulatingThreadSafeGenerator, feed)
+        print(f"{len(reply)} chars as {name:>16}: per character {before * 1e6:6.0f} us, "
+              f"chunks {after * 1e6:5.0f} us per reply ({before / after:.0f}x)")
@@ -0,0 +1,320 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import requests
+
+from main import Config, Main
+from llm_lmstudio.llm_handler import LLMHandler
+from lib.sharedstt import SharedTranscriber
+from lib.startuptimeline import StartupTimeline
+from tts_handler_cosyvoice import create_engine, warm_up_references
+
+
+class SharedModels:
+    """
+    The models every conversation of the process uses, loaded once: the whisper model, the CosyVoice worker pool
+    and the HTTP connection pool to LM Studio. A conversation (main.Main with shared=...) puts its own recorder,
+    TTS session and LLM handler in front of them.
+
+    Internal States:
+    - transcriber: SharedTranscriber with the faster-whisper model
+    - tts_engine: CosyvoiceEngine owning the worker pool, conversations render on its new_session() engines
+    - http_session: requests.Session the LLM handlers of all conversations send their requests through
+    - startup_timeline: StartupTimeline of the loads and warm-ups
+    - tts_config: the tts config the engine was created from (warm-up text and emotions)
+    - _warmed_voices: voice directories whose references were warmed up
+    - _warm_lock: serializes warm_up_voice()
+    """
+    def __init__(self, config: Config, stt_concurrency: int = 2):
+        with open(config.tts_config_file, 'r') as f:
+            tts_config = json.load(f)
+        self.transcriber = None
+        self.tts_engine = None
+        self.http_session = requests.Session()
+        self.startup_timeline = StartupTimeline()
+        self.tts_config = tts_config
+        self._warmed_voices = set()
+        self._warm_lock = threading.Lock()
+
+        def load_stt():
+            self.transcriber = SharedTranscriber(config.stt_model, config.stt_language, device=config.stt_device,
+                                                 compute_type=config.stt_compute_type, concurrency=stt_concurrency)
+
+        def load_tts():
+            self.tts_engine = create_engine(tts_config)
+            self.warm_up_voice(config.wavs_directory)
+
+        self.startup_timeline.run_parallel(
+            ("stt", load_stt),
+            ("tts", load_tts),
+            ("llm warm-up", LLMHandler(http_session=self.http_session).warm_up),
+        )
+
+    def warm_up_voice(self, wavs_directory: str):
+        """
+        Warm up the references of a voice the first time a conversation uses it, so its prompt features are not
+        extracted on the first sentence of each emotion (TTSHandler skips its warm-up on a shared engine).
+        """
+        voice = os.path.normpath(os.path.abspath(wavs_directory))
+        with self._warm_lock:
+            if voice in self._warmed_voices:
+                return
+            warm_up_references(self.tts_engine, wavs_directory, self.tts_config.get('warmup_text', "Hello world"),
+                               self.tts_config.get('warmup_all_emotions', True))
+            self._warmed_voices.add(voice)
+
+    def shutdown(self):
+        """Stop the TTS workers and close the HTTP connections."""
+        if self.tts_engine is not None:
+            self.tts_engine.shutdown()
+        self.http_session.close()
+
+
+class _Session:
+    """
+    One conversation served by the SessionManager.
+
+    Internal States:
+    - id: session id
+    - config: main.Config of the conversation
+    - main: the conversation's Main, None while the shared models (or its own handlers) load
+    - status: "loading", "ready" (waiting for start()), "running", "stopped" or "failed"
+    - start_event: set by start(), begins the conversation
+    - stop_requested: set by stop(), also before main exists
+    - done: set once the conversation's thread ended
+    - log_file: file the conversation's output goes to
+    - thread: thread running the conversation
+    """
+    def __init__(self, session_id: str, config: Config, log_file: str):
+        self.id = session_id
+        self.config = config
+        self.main = None
+        self.status = "loading"
+        self.start_event = threading.Event()
+        self.stop_requested = threading.Event()
+        self.done = threading.Event()
+        self.log_file = log_file
+        self.thread = None
+        self._log = open(log_file, "w", encoding="utf-8")
+        self._log_lock = threading.Lock()
+
+    def echo(self, *args, sep=" ", end="\n", flush=False):
+        """print() into the session's log."""
+        with self._log_lock:
+            if self._log.closed:
+                return
+            self._log.write(sep.join(str(arg) for arg in args) + end)
+            self._log.flush()
+
+    def close_log(self):
+        with self._log_lock:
+            self._log.close()
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile, None without values."""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(q / 100 * len(values))) - 1))]
+
+
+class SessionManager:
+    """
+    Serves several conversations at once in this process. The first launch loads the SharedModels, every
+    conversation then runs on its own thread with its own Conversation, barge-in controller and audio devices.
+
+    Internal States:
+    - max_sessions: number of conversations served at once, launch() refuses more
+    - stt_concurrency: number of utterances transcribed at once on the shared whisper model
+    - log_dir: directory of the session logs
+    - shared: the SharedModels, None until the first launch loaded them
+    - sessions: session id -> _Session of the conversations not ended yet (their logs stay in log_dir)
+    - _lock: lock around sessions
+    - _load_lock: serializes the loading of the shared models
+    """
+    def __init__(self, max_sessions: int = 4, stt_concurrency: int = 2, log_dir: str = "outputs"):
+        self.max_sessions = max_sessions
+        self.stt_concurrency = stt_concurrency
+        self.log_dir = log_dir
+        self.shared = None
+        self.sessions: Dict[str, _Session] = {}
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def launch(self, config: Config) -> str:
+        """Start loading a conversation and return its session id; it begins talking after start()."""
+        with self._lock:
+            live = [s for s in self.sessions.values() if not s.done.is_set()]
+            if len(live) >= self.max_sessions:
+                raise RuntimeError(f"already serving {len(live)} conversations (max_sessions={self.max_sessions})")
+            session_id = uuid.uuid4().hex[:8]
+            session = _Session(session_id, config, self._log_file(session_id))
+            self.sessions[session_id] = session
+        session.thread = threading.Thread(target=self._serve, args=(session,), name=f"Session_{session_id}", daemon=True)
+        session.thread.start()
+        return session_id
+
+    def _serve(self, session: _Session):
+        try:
+            with self._load_lock:
+                if self.shared is None:
+                    session.echo("Loading shared models")
+                    self.shared = SharedModels(session.config, self.stt_concurrency)
+                    session.echo(self.shared.startup_timeline.report())
+            self.shared.warm_up_voice(session.config.wavs_directory)
+            session.main = Main(session.config, shared=self.shared, echo=session.echo)
+            if session.stop_requested.is_set():
+                session.main.stop()
+            session.status = "ready"
+            session.main.run(start_event=session.start_event)
+            session.status = "stopped"
+        except Exception as e:
+            logging.exception(f"Session {session.id} failed")
+            session.echo(f"Session failed: {e}")
+            session.status = "failed"
+        finally:
+            session.done.set()
+            session.close_log()
+            with self._lock:
+                self.sessions.pop(session.id, None)
+
+    def _log_file(self, session_id: str) -> str:
+        return os.path.join(self.log_dir, f"session_{session_id}.log")
+
+    def _get(self, session_id: str) -> Optional[_Session]:
+        with self._lock:
+            return self.sessions.get(session_id)
+
+    def start(self, session_id: str) -> bool:
+        """Begin a launched conversation (what pressing Enter does for main.py)."""
+        session = self._get(session_id)
+        if session is None or session.done.is_set():
+            return False
+        session.start_event.set()
+        if session.status == "ready":
+            session.status = "running"
+        return True
+
+    def stop(self, session_id: str, timeout: float = 5.0) -> bool:
+        """Shut a conversation down; the shared models stay loaded. Returns whether its thread ended in time."""
+        session = self._get(session_id)
+        if session is None:
+            return True
+        session.stop_requested.set()
+        if session.main is not None:
+            session.main.stop()
+        return session.done.wait(timeout)
+
+    def status(self, session_id: str) -> Optional[str]:
+        session = self._get(session_id)
+        return session.status if session is not None else None
+
+    def log(self, session_id: str) -> str:
+        """Everything the conversation printed so far (also after it ended)."""
+        if not session_id or not session_id.isalnum():
+            return ""
+        try:
+            with open(self._log_file(session_id), "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return ""
+
+    def latency_report(self, session_ids: Optional[List[str]] = None) -> dict:
+        """
+        Per-session turn latencies, in seconds after the user's text arrived: p50/p95 of the first LLM token and
+        of the first audio played, p50 of the transcription, the utterances the Silero check dropped, plus the number
+        of conversations served right now. With session_ids only those sessions are reported (and counted).
+        """
+        with self._lock:
+            sessions = [s for s in self.sessions.values() if session_ids is None or s.id in session_ids]
+        report = {"running": sum(1 for s in sessions if not s.done.is_set()), "sessions": {}}
+        for session in sessions:
+            turns = list(session.main.turn_stats) if session.main is not None else []
+            entry = {"status": session.status, "turns": len(turns)}
+            for key in ("llm_first_token", "first_audio"):
+                values = [t[key] for t in turns if t[key] is not None and not t["cancelled"]]
+                entry[f"{key}_p50"] = _percentile(values, 50)
+                entry[f"{key}_p95"] = _percentile(values, 95)
+            entry["stt_p50"] = _percentile([t["stt"] for t in turns if t["stt"] is not None], 50)
+            entry["vad_rejected"] = getattr(session.main.recorder, "rejected", None) if session.main else None
+            report["sessions"][session.id] = entry
+        return report
+
+    def shutdown(self):
+        """Stop every conversation, then the shared models."""
+        with self._lock:
+            session_ids = list(self.sessions)
+        for session_id in session_ids:
+            self.stop(session_id)
+        if self.shared is not None:
+            self.shared.shutdown()
+            self.shared = None
+
+
+if __name__ == "__main__":
+    # Shared TTS pool under concurrent load: n conversations (each a new_session() engine) speak the same reply
+    # at the same time, on a fake model (rtf 0.5, see fake_cosyvoice) with 2 workers. Prints per conversation
+    # when its first audio came and how long its real-time playback stalled.
+    import queue
+    from realtimetts_clone.engines.cosyvoice_engine import CosyvoiceEngine
+
+    sentences = [
+        "I have been waiting here for over an hour and nobody has told me anything at all.",
+        "Where is my brother?",
+        "Please, just tell me the truth.",
+    ]
+
+    def converse(engine, results, index):
+        bytes_per_sample = 2 if engine.sample_format == "int16" else 4
+        rate = engine.get_stream_info()[2]
+        done = threading.Event()
+        timing = {"first": None, "stalled": 0.0}
+        start = time.time()
+
+        def player():
+            wait_start = None
+            while True:
+                try:
+                    chunk = engine.queue.get(timeout=0.05)
+                except queue.Empty:
+                    if done.is_set():
+                        return
+                    continue
+                if timing["first"] is None:
+                    timing["first"] = time.time() - start
+                elif wait_start is not None:
+                    timing["stalled"] += time.time() - wait_start
+                time.sleep(len(chunk) / bytes_per_sample / rate)
+                wait_start = time.time()
+
+        thread = threading.Thread(target=player, daemon=True)
+        thread.start()
+        for sentence in sentences:
+            engine.prefetch(sentence)
+        for sentence in sentences:
+            engine.synthesize(sentence)
+        done.set()
+        thread.join()
+        results[index] = timing
+
+    base = CosyvoiceEngine("fake:rtf=0.5", "wavs/reference_woman/Standard/neutral.wav", "", num_workers=2)
+    for count in (1, 2, 4):
+        engines = [base.new_session() for _ in range(count)]
+        results = [None] * count
+        threads = [threading.Thread(target=converse, args=(engine, results, i)) for i, engine in enumerate(engines)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        firsts = ", ".join(f"{r['first'] * 1000:.0f}" for r in results)
+        stalls = ", ".join(f"{r['stalled']:.2f}" for r in results)
+        print(f"{count} conversation(s) on 2 workers: first audio [{firsts}] ms, playback stalled [{stalls}] s")
+        for engine in engines:
+            engine.shutdown()
+    base.shutdown()
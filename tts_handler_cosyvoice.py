@@ -5,12 +5,59 @@ import threading
 import queue
 import time
 import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pyaudio
 from realtimetts_clone.text_to_stream import TextToAudioStream
+from realtimetts_clone.callback_output import CallbackOutputStream
 from lib.sentencequeue import ThreadSafeSentenceQueue, Sentence
-from lib.bufferstream import BufferStream
+from lib.bargecontroller import NotifyingEvent
+from lib.latencyprobe import LatencyProbe
+from lib.playbackwriter import PlaybackWriter
+from lib.fillerbank import FillerBank, crossfade
+from lib.jitterbuffer import AdaptivePrebuffer
+from lib.avatarsync import AvatarSyncEmitter
+from lib.voicereferences import list_emotions, load_reference
 from realtimetts_clone.engines.cosyvoice_engine import CosyvoiceEngine
 
+
+def create_engine(config: dict, word_timings: bool = False) -> CosyvoiceEngine:
+    """The CosyVoice engine (and its worker processes) described by a tts config."""
+    return CosyvoiceEngine(
+        model_path=config['cosyvoice_model_path'],
+        prompt_speech=config['cosyvoice_prompt_speech'],
+        prompt_text=config['cosyvoice_prompt_text'],
+        sample_format=config.get('cosyvoice_sample_format', 'int16'),
+        num_workers=config.get('cosyvoice_num_workers', 1),
+        phrase_cache_dir=config.get('phrase_cache_dir'),
+        phrase_cache_max_mb=config.get('phrase_cache_max_mb', 64),
+        phrase_cache_max_chars=config.get('phrase_cache_max_chars', 40),
+        postprocess=config.get('postprocess'),
+        word_timings=word_timings,
+        hang_timeout=config.get('cosyvoice_hang_timeout_ms', 10000) / 1000,
+        standby=config.get('cosyvoice_standby_worker', False),
+        max_sessions=config.get('cosyvoice_max_sessions', 8),
+    )
+
+
+def warm_up_references(engine: CosyvoiceEngine, references_folder: str, text: str = "Hello world",
+                       all_emotions: bool = True):
+    """
+    Render text once per emotion reference of a voice (only "neutral" without all_emotions), so each reference's
+    prompt features are extracted now instead of on the first sentence with that emotion.
+    """
+    emotions = list_emotions(references_folder) if all_emotions else ["neutral"]
+    references = [load_reference(references_folder, emotion) for emotion in emotions]
+    references = [(path, text) for path, text in references if os.path.exists(path)] or [(None, None)]
+
+    # one render per worker at a time, so every worker process gets warmed
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=engine.num_workers) as executor:
+        # past the phrase cache, which would answer every launch after the first without touching a worker
+        list(executor.map(lambda ref: engine.render_clip(text, *ref, use_cache=False), references))
+    print(f"TTS warm-up: {len(references)} reference(s) in {time.time() - start:.2f}s")
+
+
 class TTSHandler:
     """
     Class that handles TTS using Cosyvoice engine.
@@ -22,77 +69,186 @@ class TTSHandler:
     - config: json containing configuration parameters.
     - references_folder: folder that contains wav files for voice cloning.
     - dbg_log: whether to log debugging statements.
-    - stop_event: whether to stop TTS during user interruption.
+    - stop_event: whether to stop TTS during user interruption (a NotifyingEvent, setting it wakes the workers)
     - sentence_queue: queue that contains text to be read.
     - chunk_queue: queue that contains audio chunks to be played.
-    - chunk_lock: lock that controls access to chunk_queue.
+    - merge_threshold: seconds of queued audio above which the stream merges fragments into larger synthesis calls
+    - play_period_ms: target duration of one pyaudio write; smaller queued chunks are coalesced up to it
+    - playback_writer: PlaybackWriter of the current turn's play thread
     - pyFormat: format of pyaudio stream.
     - pyChannels: number of audio channels in pyaudio stream.
     - pySampleRate: sample rate of pyaudio stream
     - pyOutput_device_index: index of device to use to play audio.
+    - output_period_ms: device period of the callback output stream, also the stop latency
+    - output_buffer_ms: audio queued ahead of the device before a write blocks
     - pyaudio_instance: pyaudio instance
-    - pystream: pystream instantiated from the pyaudio instance.
+    - output: CallbackOutputStream of the current turn (ring buffer, played-frame counter, underruns)
+    - pystream: the pyaudio stream of output
     - tts_sentence_thread: sentence queuer thread
     - tts_play_thread: sentence player thread
-    - external_interrupt_event: an external interrupt if it arrived
+    - external_interrupt_event: an external interrupt if it arrived (a NotifyingEvent wakes the workers when set,
+      a plain Event is checked every interrupt_poll_timeout seconds)
+    - interrupt_poll_timeout: how often the workers check an interrupt event that cannot wake them
+    - _streaming_sentence: the sentence last fed to the stream while the llm was still writing it, woken by a stop
     - _stream_needs_reset: whether the TextToAudioStream needs to be re-built after a user interrupt
     - engine: the cosyvoice engine to synthesize audio with
     - stream: TextToAudioStream which uses the engine to create audio
+    - filler_bank: in-memory filler clips per emotion, None when fillers are disabled
+    - filler_thread: thread building the filler bank, None when fillers are disabled
+    - filler_delay: seconds without real audio at turn start before a filler is played
+    - filler_crossfade_samples: overlap between the filler and the first real chunk
+    - tts_idle_event: set while no ai turn is running (the filler bank only renders then)
+    - current_emotion: emotion of the sentence being spoken
+    - _turn_started_at: when the current ai turn started
+    - _turn_audio_started: whether real audio was written during the current turn
+    - first_audio_at: when the current turn's first real audio was written to the output, None until then
+    - _filler: remaining samples of the filler being played, None when no filler is playing
+    - _filler_played: whether a filler was already used this turn
+    - latency_probe: per-turn LatencyProbe of the text path (llm text -> sentence splitter -> synthesis)
+    - prebuffer: AdaptivePrebuffer deciding how much audio to queue before playback (re)starts, None when disabled
+    - last_turn_stats: played seconds, underruns and prebuffer holds of the last finished turn
+    - avatar_sync: AvatarSyncEmitter sending word and mouth envelope events to the avatar, None when disabled
+    - _avatar_base: output ring frame of the turn's first real audio, None until it was written
+    - _avatar_received: seconds of real audio received this turn (the avatar timeline)
+    - _avatar_play_offset: timeline position where the current play's engine audio (and its word timings) begins
+
+    With an engine given, the handler serves one more conversation in the process: it renders on that engine's
+    workers through engine.new_session() and skips the warm-up, which the engine's owner did already.
     """
-    def __init__(self, config_file='tts_config.json', wavs_directory: string = "wavs/reference_woman/Standard"):
+    def __init__(self, config_file='tts_config.json', wavs_directory: string = "wavs/reference_woman/Standard",
+                 engine: CosyvoiceEngine = None, output_device_index=None):
         with open(config_file, 'r') as f:
             self.config = json.load(f)
         
         self.references_folder = wavs_directory
         self.dbg_log = self.config['dbg_log']
-        self.stop_event = threading.Event()
+        self.stop_event = self._new_stop_event()
         self.sentence_queue = ThreadSafeSentenceQueue()
         self.chunk_queue = queue.Queue()
-        self.chunk_lock = threading.Lock()
+        self.play_period_ms = self.config.get('play_period_ms', 50)
+        self.merge_threshold = self.config.get('merge_buffer_threshold_ms', 2000) / 1000
+        self.output_period_ms = self.config.get('output_period_ms', 20)
+        self.output_buffer_ms = self.config.get('output_buffer_ms', 100)
+        self.playback_writer = None
         
         self.pyFormat = pyaudio.paInt16
         self.pyChannels = 1
         self.pySampleRate = 24000
-        self.pyOutput_device_index = None
+        self.pyOutput_device_index = output_device_index
         
         # handles to threads/streams for quick stop
         self.pyaudio_instance = None
+        self.output = None
         self.pystream = None
         self.tts_sentence_thread = None
         self.tts_play_thread = None
         self.external_interrupt_event = None
+        self.interrupt_poll_timeout = 0.05
+        self._streaming_sentence = None
         self._stream_needs_reset = False # Set to true when TextToAudioStream needs re-build after barge-in event
-
-        print("Loading TTS")
-        self.engine = CosyvoiceEngine(
-            model_path=self.config['cosyvoice_model_path'],
-            prompt_speech=self.config['cosyvoice_prompt_speech'],
-            prompt_text=self.config['cosyvoice_prompt_text']
-        )
+        self.current_emotion = "neutral"
+        self.tts_idle_event = threading.Event()
+        self.tts_idle_event.set()
+        self._turn_started_at = None
+        self._turn_audio_started = False
+        self.first_audio_at = None
+        self._filler = None
+        self._filler_played = False
+        self.latency_probe = LatencyProbe()
+        self.last_turn_stats = None
+        self.prebuffer = None
+        if self.config.get('prebuffer_enabled', True):
+            # keeps what it learned about the engine's speed from turn to turn
+            self.prebuffer = AdaptivePrebuffer(
+                margin=self.config.get('prebuffer_margin_ms', 100) / 1000,
+                max_prebuffer=self.config.get('prebuffer_max_ms', 3000) / 1000,
+            )
+        self.avatar_sync = None
+        self._avatar_base = None
+        self._avatar_received = 0.0
+        self._avatar_play_offset = 0.0
+        if self.config.get('avatar_sync_enabled', False):
+            self.avatar_sync = AvatarSyncEmitter(
+                port=self.config.get('avatar_sync_port', 5005),
+                host=self.config.get('avatar_sync_host', "127.0.0.1"),
+                rate=self.pySampleRate,
+                hop_ms=self.config.get('avatar_envelope_hop_ms', 10),
+                block_ms=self.config.get('avatar_envelope_block_ms', 50),
+            )
+            self.avatar_sync.start(self._avatar_playhead)
+
+        if engine is None:
+            print("Loading TTS")
+            self.engine = create_engine(self.config, word_timings=self.avatar_sync is not None)
+        else:
+            self.engine = engine.new_session(word_timings=self.avatar_sync is not None)
         
-        self.stream = TextToAudioStream(self.engine, muted=True)
+        self.stream = TextToAudioStream(self.engine, muted=True, buffer_depth=self._queued_audio_seconds)
 
-        if self.dbg_log:
-            print("Test Play TTS")
+        if engine is None:
+            if self.dbg_log:
+                print("Test Play TTS")
+            self.warm_up()
+
+        # Fillers are rendered in the background with every emotion reference of the voice
+        self.filler_bank = None
+        self.filler_thread = None
+        self.filler_delay = self.config.get('filler_delay_ms', 700) / 1000
+        self.filler_crossfade_samples = int(self.pySampleRate * self.config.get('filler_crossfade_ms', 60) / 1000)
+        if self.config.get('filler_enabled', True):
+            self.filler_bank = FillerBank(self.references_folder, self.config.get('filler_phrases'))
+            self.filler_thread = self.filler_bank.build_async(self.engine, self.tts_idle_event)
+
+    def warm_up(self):
+        """
+        Run the first syntheses before the conversation starts, so no turn pays for lazy initialisation.
+        Config keys:
+        - warmup_stream: feed a short text through the TextToAudioStream (sentence splitting, playback path)
+        - warmup_text: text rendered once per reference
+        - warmup_all_emotions: render with every emotion reference of the voice, so each reference's prompt
+          features are extracted now instead of on the first sentence with that emotion
+        """
+        if self.config.get('warmup_stream', True):
+            self.engine.use_phrase_cache = False  # a cached "Hi!" would not exercise the synthesis path
+            try:
+                self.stream.feed("Hi!")
+                self.stream.play(log_synthesized_text=True, muted=True)
+            finally:
+                self.engine.use_phrase_cache = True
 
-        # Small warm-up
-        self.stream.feed("Hi!")
-        self.stream.play(log_synthesized_text=True, muted=True)
-        self.engine.synthesize("Hello world")
+        warm_up_references(self.engine, self.references_folder, self.config.get('warmup_text', "Hello world"),
+                           self.config.get('warmup_all_emotions', True))
 
         # Clear queue to prevent warmup audio from playing
-        import queue as queue_module
         try:
             while not self.engine.queue.empty():
                 self.engine.queue.get_nowait()
-        except queue_module.Empty:
+        except queue.Empty:
             pass
 
     def initialize_pyaudio(self):
         """TTS initialized during each ai turn."""
-        self.stop_event = threading.Event()
-        self.sentence_queue = ThreadSafeSentenceQueue()
+        self.stop_event = self._new_stop_event()
+        self.latency_probe = LatencyProbe()
+        self.sentence_queue = ThreadSafeSentenceQueue(self.latency_probe)
         self.chunk_queue = queue.Queue()
+        self.tts_idle_event.clear()
+        self.current_emotion = "neutral"
+        self._turn_started_at = time.time()
+        self._turn_audio_started = False
+        self.first_audio_at = None
+        self._filler = None
+        self._filler_played = False
+        if self.prebuffer is not None:
+            self.prebuffer.reset_turn()
+        if self.avatar_sync is not None:
+            self.avatar_sync.clear(notify=False)
+            # words of a generation cancelled last turn must not land on this turn's timeline
+            while not self.engine.timings.empty():
+                self.engine.timings.get_nowait()
+        self._avatar_base = None
+        self._avatar_received = 0.0
+        self._avatar_play_offset = 0.0
 
         # Rebuild the stream after an interrupt (or if it's None)
         if getattr(self, "_stream_needs_reset", False) or self.stream is None:
@@ -100,55 +256,174 @@ class TTSHandler:
                 # If the old object had internal threads, just drop it on the floor.
                 pass
             finally:
-                self.stream = TextToAudioStream(self.engine, muted=True)
+                self.stream = TextToAudioStream(self.engine, muted=True, buffer_depth=self._queued_audio_seconds)
                 self._stream_needs_reset = False
+        self.stream.latency_probe = self.latency_probe
 
         self.pyaudio_instance = pyaudio.PyAudio()
-        self.pystream = self.pyaudio_instance.open(
+        self.output = CallbackOutputStream(
             format=self.pyFormat,
             channels=self.pyChannels,
             rate=self.pySampleRate,
-            output_device_index=self.pyOutput_device_index,
-            output=True)
-        self.pystream.start_stream()
+            frames_per_buffer=int(self.pySampleRate * self.output_period_ms / 1000),
+            max_buffered_seconds=self.output_buffer_ms / 1000,
+        )
+        self.pystream = self.output.open(self.pyaudio_instance, self.pyOutput_device_index)
 
     def set_interrupt_event(self, event):
         """Provide an external Event (eg, barge event) that should stop TTS immediately."""
         self.external_interrupt_event = event
+        if isinstance(event, NotifyingEvent):
+            event.add_listener(self._wake_waiters)
+
+    def _new_stop_event(self):
+        event = NotifyingEvent()
+        event.add_listener(self._wake_waiters)
+        return event
+
+    def _wake_waiters(self):
+        """Wake the sentence worker wherever it blocks, so it notices a stop or an interrupt at once."""
+        sentence_queue = getattr(self, "sentence_queue", None)
+        if sentence_queue is not None:
+            sentence_queue.wake()
+        stream = getattr(self, "stream", None)
+        if stream is not None:
+            stream.wake_waiters()
+        sentence = getattr(self, "_streaming_sentence", None)
+        if sentence is not None:
+            sentence.wake()
+
+    def _interrupt_wait(self):
+        """Timeout of the workers' blocking waits: none unless the interrupt event cannot wake them."""
+        event = self.external_interrupt_event
+        if event is None or isinstance(event, NotifyingEvent):
+            return None
+        return self.interrupt_poll_timeout
 
     def tts_play_worker_thread(self):
-        """The worker thread that processes queued text for synthesis."""
-        while not self.stop_event.is_set():
-            # abort if external interrupt is set
-            if self.external_interrupt_event is not None and self.external_interrupt_event.is_set():
-                self.stop_now()
-                break
-            if self.chunk_queue.empty():
-                time.sleep(0.001)
-                continue
-            with self.chunk_lock:
-                chunk = self.chunk_queue.get()
-            # guard: if we were stopped after get(), break early
-            if self.stop_event.is_set():
-                break
-            # one more guard just before write
-            if self.external_interrupt_event is not None and self.external_interrupt_event.is_set():
-                self.stop_now()
-                break
-            self.pystream.write(chunk)
+        """The worker thread that moves synthesized audio into the output ring, blocking until audio arrives."""
+        writer = PlaybackWriter(
+            self.chunk_queue,
+            self._write_output,
+            period_bytes=int(self.pySampleRate * self.play_period_ms / 1000) * 2,
+            frame_bytes=2,
+            should_stop=self._should_stop,
+            on_idle=self._next_filler_slice,
+            transform=self._blend_filler,
+            hold=self._hold_playback,
+        )
+        self.playback_writer = writer
+        writer.run()
+        # abort if external interrupt is set
+        if self.external_interrupt_event is not None and self.external_interrupt_event.is_set():
+            self.stop_now()
+        if self.dbg_log and writer.bytes_written:
+            audio_seconds = writer.bytes_written / (self.pySampleRate * 2)
+            logging.debug(f"play worker: {writer.writes} writes for {audio_seconds:.2f}s of audio")
+
+    def _hold_playback(self, pending_bytes):
+        """While the output is dry, keep collecting audio until the prebuffer expects synthesis to keep up."""
+        if self.prebuffer is None or self.output.buffered_frames() > 0:
+            return False
+        return self.prebuffer.should_hold(pending_bytes / (self.pySampleRate * 2))
+
+    def _write_output(self, data):
+        """Queue audio on the output; once a filler was written completely, silence after it is not an underrun."""
+        self.output.write(data, should_stop=self._should_stop)
+        if self._filler is None and not self._turn_audio_started:
+            self.output.end_of_audio()
+
+    def _blend_filler(self, chunk):
+        """Blend the rest of a playing filler into the first real chunk instead of cutting it off."""
+        if self._filler is not None:
+            incoming = np.frombuffer(chunk, dtype=np.int16)
+            chunk = crossfade(self._filler[:self.filler_crossfade_samples], incoming).tobytes()
+            self._filler = None
+        if not self._turn_audio_started:
+            # real audio is contiguous in the ring from here on: timeline second t plays at base + t * rate
+            self._avatar_base = self.playback_writer.stream_position() // 2
+            self.first_audio_at = time.time()
+        self._turn_audio_started = True
+        return chunk
+
+    def _avatar_playhead(self):
+        """Avatar timeline position being heard, None before the turn's first real audio was written."""
+        output, base = self.output, self._avatar_base
+        if output is None or base is None:
+            return None
+        return (output.playhead_frame() - base) / self.pySampleRate
+
+    def _avatar_collect_words(self):
+        """Move the engine's word timings (relative to the current play) onto the avatar timeline."""
+        while True:
+            try:
+                timing = self.engine.timings.get_nowait()
+            except queue.Empty:
+                return
+            timing.start_time += self._avatar_play_offset
+            timing.end_time += self._avatar_play_offset
+            self.avatar_sync.add_word(timing)
+
+    def _avatar_chunk(self, chunk):
+        """Schedule the mouth envelope of a chunk and the words known so far; chunks arrive in timeline order."""
+        self._avatar_collect_words()
+        self.avatar_sync.add_envelope(self._avatar_received, np.frombuffer(chunk, dtype=np.int16))
+        self._avatar_received += len(chunk) / (self.pySampleRate * 2)
+
+    def _next_filler_slice(self, slice_seconds=0.02):
+        """
+        While the first real chunk of a turn is late, play a filler clip in short slices so real audio can take over
+        at any slice boundary. Returns the slice to write, or None.
+        """
+        if self._turn_audio_started or self.filler_bank is None:
+            return None
+        if self._filler is None:
+            if self._filler_played or self._turn_started_at is None:
+                return None
+            if time.time() - self._turn_started_at < self.filler_delay:
+                return None
+            self._filler = self.filler_bank.pick(self.current_emotion)
+            if self._filler is None:
+                return None
+            self._filler_played = True
+            if self.dbg_log:
+                logging.debug(f"playing filler ({self.current_emotion}) after {time.time() - self._turn_started_at:.2f}s")
+        n = int(self.pySampleRate * slice_seconds)
+        piece, self._filler = self._filler[:n], self._filler[n:]
+        if len(self._filler) == 0:
+            self._filler = None
+        return piece.tobytes()
+
+    def _queued_audio_seconds(self):
+        """Seconds of synthesized audio not played yet: in the chunk queue, the play thread and the output ring."""
+        with self.chunk_queue.mutex:
+            queued = sum(len(chunk) for chunk in self.chunk_queue.queue if isinstance(chunk, bytes))
+        writer, output = self.playback_writer, self.output  # the turn may end meanwhile
+        if writer is not None:
+            queued += writer.pending_bytes()
+        seconds = queued / (self.pySampleRate * 2)
+        if output is not None:
+            seconds += output.buffered_seconds()
+        return seconds
 
     def start_tts(self):
         """The function that actually synthesizes the audio in cosyvoice."""
         def on_audio_chunk(chunk):
             """Function used as each audio chunk is synthesized, adding to audio queue."""
-            with self.chunk_lock:
-                self.chunk_queue.put(chunk)
-
+            if self.prebuffer is not None:
+                self.prebuffer.on_audio(len(chunk) / (self.pySampleRate * 2))
+            if self.avatar_sync is not None:
+                self._avatar_chunk(chunk)
+            self.chunk_queue.put(chunk)
+
+        # the engine's audio position (and with it its word timings) restarts at 0 with every play
+        self._avatar_play_offset = self._avatar_received
         self.stream.play_async(
             fast_sentence_fragment=True,
             log_synthesized_text=True,
             muted=True,
             on_audio_chunk=on_audio_chunk,
+            buffer_threshold_seconds=self.merge_threshold,
             minimum_sentence_length=10,
             minimum_first_fragment_length=10,
             context_size=5,
@@ -165,6 +440,8 @@ class TTSHandler:
             if self.dbg_log:
                 logging.debug(f"tts_play_sentence complete sentence found, playing {sentence_text}")
                 print(sentence_text)
+            if self.prebuffer is not None:
+                self.prebuffer.begin_sentence(len(sentence_text))
             self.stream.feed(sentence_text)
             if self.dbg_log:
                 logging.debug("tts_play_sentence [STARTPLAY]")
@@ -173,46 +450,42 @@ class TTSHandler:
         else:
             if self.dbg_log:
                 logging.debug(f"tts_play_sentence running sentence found, realtime playing")
-            buffer = BufferStream()
-            last_text = ""
-            if self.dbg_log:
                 logging.debug(f"ID: {sentence.id}")
                 logging.debug(f"EMOTION: {sentence.emotion}")
-
-            while not sentence.get_finished():
-                # early exit if stopped
-                if self.stop_event.is_set() or (self.external_interrupt_event is not None and self.external_interrupt_event.is_set()):
-                    self.stop_now()
-                    return
-                current_text = sentence.get_text()
-                if len(current_text) > len(last_text):
-                    new_text = current_text[len(last_text):]
-                    buffer.add(new_text)
-                    if not self.stream.is_playing():
-                        self.stream.feed(buffer.gen())
-                        self.start_tts()
-                last_text = current_text
-                time.sleep(0.002)
-
-            # flush any remaining tail that arrived right as the sentence finished
-            final_text = sentence.get_text()
-            if len(final_text) > len(last_text):
-                tail = final_text[len(last_text):]
-                buffer.add(tail)
-                # If we never started playback (short sentence, etc.), start now
-                if not self.stream.is_playing():
-                    self.stream.feed(buffer.gen())
-                    self.start_tts()
-            
+            if not self._wait_while_playing():
+                return
+            if self.prebuffer is not None:
+                # only the text written so far is known; the estimate of what is left grows with it
+                self.prebuffer.begin_sentence(len(sentence))
+            # the llm is still writing this sentence: the stream pulls from an iterator that blocks on the
+            # sentence and yields every fragment the moment it is appended (no polling, no diffing)
+            self._streaming_sentence = sentence
+            self.stream.feed(sentence.iter_text(should_stop=self._should_stop, timeout=self._interrupt_wait()))
+            self.start_tts()
             if self.dbg_log:
-                logging.debug(" - feed finished")
-            buffer.stop()
-        while self.stream.is_playing():
+                logging.debug(" - feed started")
+        if self._wait_while_playing():
+            # all of the sentence's audio is queued; a gap after it is a pause, not an underrun
+            self.chunk_queue.put(self.output.end_of_audio)
+            if self.prebuffer is not None:
+                self.prebuffer.end_sentence()
+            if self.avatar_sync is not None:
+                # words placed once the sentence was complete come after its last chunk
+                self._avatar_collect_words()
+
+    def _should_stop(self):
+        """Whether the turn was stopped or interrupted by the user."""
+        return self.stop_event.is_set() or (self.external_interrupt_event is not None and self.external_interrupt_event.is_set())
+
+    def _wait_while_playing(self):
+        """Wait until the stream finished playing; returns False (after stopping everything) if the turn was stopped."""
+        # the stream signals the end of playback, a stop or an interrupt wakes the wait as well (see _wake_waiters)
+        while not self.stream.wait_until_stopped(should_stop=self._should_stop, timeout=self._interrupt_wait()):
             # early exit during tail play if stopped
-            if self.stop_event.is_set() or (self.external_interrupt_event is not None and self.external_interrupt_event.is_set()):
+            if self._should_stop():
                 self.stop_now()
-                break
-            time.sleep(0.002)
+                return False
+        return True
 
     def tts_sentence_worker_thread(self):
         """Thread that parses incoming ai sentences, switching the voice clone example or enqueuing the text."""
@@ -221,13 +494,15 @@ class TTSHandler:
             if self.external_interrupt_event is not None and self.external_interrupt_event.is_set():
                 self.stop_now()
                 break
-            sentence = self.sentence_queue.get_sentence()
+            # blocks until a sentence is available, or a stop or an interrupt wakes it (see _wake_waiters)
+            sentence = self.sentence_queue.get_sentence(timeout=self._interrupt_wait(), should_stop=self._should_stop)
 
             if sentence:
                 # Get the path to the wav emotion file
                 emotion = sentence.emotion
                 if not emotion or emotion == "None":
                     emotion = "neutral"
+                self.current_emotion = emotion
                 emotion_file = emotion + ".wav"
                 path = os.path.join(self.references_folder, emotion_file)
 
@@ -286,8 +561,6 @@ class TTSHandler:
                     logging.debug(f" - popped: {sentence.popped}")
                     logging.debug(f" - id: {sentence.id}")
                 self.tts_play_sentence(sentence)
-            
-            time.sleep(0.002)
 
     def start_threads(self):
         """Starts the worker & player threads during the ai turn."""
@@ -318,69 +591,112 @@ class TTSHandler:
     def is_playing(self):
         """Checks if TextToAudio stream is playing"""
         return self.stream.is_playing()
+
+    def audio_pending(self):
+        """Checks if synthesized audio is still waiting to be played."""
+        if not self.chunk_queue.empty():
+            return True
+        if self.playback_writer is not None and not self.playback_writer.idle():
+            return True
+        return self.output is not None and self.output.buffered_frames() > 0
     
     def shutdown_pyaudio(self):
         """Shuts down pyaudio instances at end of ai turn."""
-        if self.pystream is not None:
-            try:
-                self.pystream.stop_stream()
-                self.pystream.close()
-            except Exception:
-                pass
+        if self.dbg_log:
+            stats = self.sentence_queue.handoff_stats()
+            logging.debug(f"sentence handoff: {stats['count']} sentences, mean {stats['mean'] * 1000:.2f} ms, max {stats['max'] * 1000:.2f} ms")
+            logging.debug(self.latency_probe.report())
+        self._turn_started_at = None
+        self._filler = None
+        self.tts_idle_event.set()
+        if self.avatar_sync is not None:
+            self.avatar_sync.clear(notify=False)
+        if self.output is not None:
+            self._report_turn()
+            self.output.close()
         if self.pyaudio_instance is not None:
             try:
                 self.pyaudio_instance.terminate()
             except Exception:
                 pass
+        self.output = None
         self.pystream = None
         self.pyaudio_instance = None
 
+    def _report_turn(self):
+        """Log the underruns of the turn that just ended (a warning if there were any)."""
+        self.last_turn_stats = {
+            "played_seconds": self.output.played_seconds(),
+            "underruns": self.output.underruns,
+            "underrun_seconds": self.output.underrun_frames / self.pySampleRate,
+            "prebuffer_holds": self.prebuffer.holds if self.prebuffer is not None else 0,
+            "prebuffer_seconds": self.prebuffer.held_seconds if self.prebuffer is not None else 0.0,
+        }
+        stats = self.last_turn_stats
+        if not stats["played_seconds"]:
+            return
+        message = (f"TTS turn: {stats['played_seconds']:.2f}s played, {stats['underruns']} underruns "
+                   f"({stats['underrun_seconds'] * 1000:.0f} ms of silence)")
+        if self.prebuffer is not None:
+            message += f"; {self.prebuffer.report()}"
+        if stats["underruns"]:
+            logging.warning(message)
+        else:
+            logging.info(message)
+
     def shutdown(self):
-        """Shuts down worker and player threads."""
+        """
+        Shuts down worker and player threads, the filler bank builder and the avatar sync, then the engine
+        (for an engine on a shared pool: its session slot, before another conversation can reuse it).
+        """
+        if self.filler_bank is not None:
+            self.filler_bank.stop()
         self.stop_event.set()
+        self.sentence_queue.wake()
         print("Waiting for sentence thread finished")
         if self.tts_sentence_thread is not None:
             self.tts_sentence_thread.join()
         print("Waiting for play thread finished")
         if self.tts_play_thread is not None:
             self.tts_play_thread.join()
+        if self.avatar_sync is not None:
+            self.avatar_sync.close()
+        if self.filler_thread is not None:
+            self.engine.stop()  # cancels a filler clip still rendering
+            self.filler_thread.join(timeout=5.0)
         self.engine.shutdown()
 
     def stop_now(self):
         """
         Panic stop for barge in event:
         - prevent more writes
-        - stop the pyaudio stream immediately
+        - drop the audio queued on the output (silent from the next device period on)
         - clear all pending audio/sentences so playback truly halts
         NOTE: does NOT kill worker threads; they continue for the next turn.
         """
         self.stop_event.set()  # tell workers to bail out of loops ASAP
 
-        # Stop the low-level audio stream if playing
+        # Silence the output within one callback period
+        if self.output is not None:
+            self.output.flush()
+        if self.avatar_sync is not None:
+            self.avatar_sync.clear()  # the avatar closes its mouth now, not when the events run out
+
+        # Flush any pending audio data
+        self._filler = None
         try:
-            if self.pystream is not None and self.pystream.is_active():
-                self.pystream.stop_stream()
+            while not self.chunk_queue.empty():
+                self.chunk_queue.get_nowait()
         except Exception:
             pass
-
-        # Flush any pending audio data
-        with self.chunk_lock:
-            try:
-                while not self.chunk_queue.empty():
-                    self.chunk_queue.get_nowait()
-            except Exception:
-                pass
+        if self.playback_writer is not None:
+            self.playback_writer.wake()
         
         # Flush any pending sentences (prevents tail playback resuming)
         try:
-            # ThreadSafeSentenceQueue has an internal Queue;
-            # drop current sentence and clear staged text.
-            # Here we do the safest thing: mark the current sentence finished and empty future ones.
+            # mark the current sentence finished and empty future ones (this also wakes the sentence worker)
             self.sentence_queue.finish_current_sentence()
-            # If the implementation exposes a .queue, clear it
-            if hasattr(self.sentence_queue, "queue"):
-                with self.sentence_queue.mutex:
-                    self.sentence_queue.queue.clear()
+            self.sentence_queue.clear()
         except Exception:
             pass
 